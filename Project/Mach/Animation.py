@@ -0,0 +1,249 @@
+import numpy as np
+import mach
+
+class AnimationClip:
+	"""
+	Keyframes for one animation, a sprite frame track, a transform track or both
+
+	Arguments:
+		duration - the length of the clip in seconds, defaults to the time of the last keyframe (float)
+		loop - whether players of this clip start over at the end by default (boolean)
+	"""
+	def __init__(self, duration=None, loop=True):
+		self.duration = duration
+		self.loop = loop
+
+		self.frame_times = None
+		self.frames = None
+
+		self.key_times = None
+		self.positions = None
+		self.rotations = None
+		self.scales = None
+
+	@classmethod
+	def from_frames(cls, frames, fps=12, loop=True):
+		" A clip showing the sprites in frames one after the other, fps times a second"
+		clip = cls(len(frames) / fps, loop)
+		clip.add_frame_track(frames, np.arange(len(frames)) / fps)
+		return clip
+
+	def add_frame_track(self, frames, times):
+		"""
+		Show frames[i] from times[i] until the next keyframe
+
+		Arguments:
+			frames - the sprite index of every keyframe (integer array)
+			times - the time of every keyframe in seconds, increasing (float array)
+		"""
+		self.frames = np.asarray(frames, dtype=np.int32)
+		self.frame_times = np.asarray(times, dtype=np.float64)
+		if self.duration is None:
+			self.duration = float(self.frame_times[-1])
+
+	def add_transform_track(self, times, positions=None, rotations=None, scales=None):
+		"""
+		Interpolate a transform between keyframes, positions and scales linearly and rotations spherically
+
+		Arguments:
+			times - the time of every keyframe in seconds, increasing (float array)
+			positions - the position at every keyframe (N by 3 array, optional)
+			rotations - the rotation at every keyframe as a quaternion (w, x, y, z) (N by 4 array, optional)
+			scales - the scale at every keyframe (N by 3 array, optional)
+		"""
+		times = np.asarray(times, dtype=np.float64)
+		count = len(times)
+
+		self.key_times = times
+		self.positions = np.zeros((count, 3), dtype=np.float32) if positions is None else np.asarray(positions, dtype=np.float32).reshape(count, 3)
+		self.rotations = np.tile(np.float32([1, 0, 0, 0]), (count, 1)) if rotations is None else np.asarray(rotations, dtype=np.float32).reshape(count, 4)
+		self.scales = np.ones((count, 3), dtype=np.float32) if scales is None else np.asarray(scales, dtype=np.float32).reshape(count, 3)
+		if self.duration is None:
+			self.duration = float(times[-1])
+
+class AnimationPool:
+	"""
+	Plays animation clips for many entities at once. Every entity has one player slot, update advances every
+	playing slot and samples its clip in one vectorized step.
+
+	The keyframes of all clips are concatenated on one global timeline, with every clip starting after the end of
+	the one before, so a single searchsorted finds the keyframes of every player.
+
+	After update, frames holds the sprite index of every slot (-1 when its clip has no frame track), ready for
+	SpriteBatch.submit_array, and positions, rotations and scales hold the sampled transforms, ready for
+	mach.ModelMatrices or SceneGraph.set_transforms
+
+	Arguments:
+		capacity - the number of player slots to preallocate room for, the pool grows if more are used (integer)
+	"""
+	def __init__(self, capacity=256):
+		self.clips = []
+		self.durations = np.zeros(0, dtype=np.float64)
+		self.offsets = np.zeros(0, dtype=np.float64)
+		self.clip_loops = np.zeros(0, dtype=np.bool_)
+		self.timeline_end = 0.0
+
+		# Keyframes of every clip on the global timeline, and the range of every clip's keyframes within them
+		self.frame_times = np.zeros(0, dtype=np.float64)
+		self.frame_values = np.zeros(0, dtype=np.int32)
+		self.frame_ranges = np.zeros((0, 2), dtype=np.int64)
+
+		self.key_times = np.zeros(0, dtype=np.float64)
+		self.key_positions = np.zeros((0, 3), dtype=np.float32)
+		self.key_rotations = np.zeros((0, 4), dtype=np.float32)
+		self.key_scales = np.zeros((0, 3), dtype=np.float32)
+		self.key_ranges = np.zeros((0, 2), dtype=np.int64)
+
+		self.capacity = 0
+		self.count = 0
+		self.reserve(capacity)
+
+	def reserve(self, capacity):
+		" Grow the player arrays so they can hold at least capacity slots"
+		if capacity <= self.capacity:
+			return
+
+		capacity = max(capacity, self.capacity * 2)
+		count = self.count
+
+		def grow(name, shape, dtype, fill=0):
+			new = np.full(shape, fill, dtype=dtype)
+			if count > 0: new[:count] = getattr(self, name)[:count]
+			setattr(self, name, new)
+
+		grow('player_clips', capacity, np.int32, -1)
+		grow('times', capacity, np.float64)
+		grow('speeds', capacity, np.float32, 1)
+		grow('loops', capacity, np.bool_, False)
+		grow('playing', capacity, np.bool_, False)
+		grow('frames', capacity, np.int32, -1)
+		grow('positions', (capacity, 3), np.float32)
+		grow('rotations', (capacity, 4), np.float32)
+		grow('scales', (capacity, 3), np.float32, 1)
+
+		self.rotations[count:, 0] = 1
+		self.capacity = capacity
+
+	def add_clip(self, clip):
+		" Add a clip to the pool's timeline, returns the clip id used with play"
+		offset = self.timeline_end
+
+		def key_range(keys, clip_keys):
+			return [-1, -1] if clip_keys is None else [len(keys), len(keys) + len(clip_keys)]
+
+		self.frame_ranges = np.append(self.frame_ranges, [key_range(self.frame_times, clip.frame_times)], axis=0)
+		self.key_ranges = np.append(self.key_ranges, [key_range(self.key_times, clip.key_times)], axis=0)
+
+		if clip.frame_times is not None:
+			self.frame_times = np.concatenate((self.frame_times, offset + clip.frame_times))
+			self.frame_values = np.concatenate((self.frame_values, clip.frames))
+		if clip.key_times is not None:
+			self.key_times = np.concatenate((self.key_times, offset + clip.key_times))
+			self.key_positions = np.concatenate((self.key_positions, clip.positions))
+			self.key_rotations = np.concatenate((self.key_rotations, clip.rotations))
+			self.key_scales = np.concatenate((self.key_scales, clip.scales))
+
+		self.clips.append(clip)
+		self.durations = np.append(self.durations, clip.duration)
+		self.offsets = np.append(self.offsets, offset)
+		self.clip_loops = np.append(self.clip_loops, bool(clip.loop))
+
+		# Leave a gap so the last keyframe of this clip and the first of the next never share a time
+		self.timeline_end = offset + clip.duration + 1
+		return len(self.clips) - 1
+
+	def play(self, slot, clip, speed=1, loop=None, start=0):
+		"""
+		Start playing a clip in a player slot, slots are usually one per entity
+
+		Arguments:
+			slot - the player slot (integer)
+			clip - the id returned from add_clip (integer)
+			speed - playback speed, 1 is normal speed (float)
+			loop - start over at the end, defaults to the clip's own setting (boolean)
+			start - the time into the clip to start at in seconds (float)
+		"""
+		if slot >= self.capacity:
+			self.reserve(slot + 1)
+		self.count = max(self.count, slot + 1)
+
+		self.player_clips[slot] = clip
+		self.times[slot] = start
+		self.speeds[slot] = speed
+		self.loops[slot] = self.clips[clip].loop if loop is None else loop
+		self.playing[slot] = True
+
+	def play_array(self, slots, clips, speeds=1, loops=None, starts=0):
+		" Start playing clips in many slots at once, see play for the meaning of each argument"
+		slots = np.asarray(slots)
+		if len(slots) == 0:
+			return
+		self.reserve(int(slots.max()) + 1)
+		self.count = max(self.count, int(slots.max()) + 1)
+
+		self.player_clips[slots] = clips
+		self.times[slots] = starts
+		self.speeds[slots] = speeds
+		self.loops[slots] = self.clip_loops[clips] if loops is None else loops
+		self.playing[slots] = True
+
+	def stop(self, slot):
+		" Stop a slot, its outputs keep the last sampled values"
+		self.playing[slot] = False
+
+	def update(self, delta_time):
+		" Advance every playing slot by delta_time seconds and sample its clip"
+		n = self.count
+		playing = np.flatnonzero(self.playing[:n] & (self.player_clips[:n] >= 0))
+		if len(playing) == 0:
+			return
+
+		clips = self.player_clips[playing]
+		durations = self.durations[clips]
+		times = self.times[playing] + delta_time * self.speeds[playing]
+
+		# Looping slots wrap around, the others stop at the end of their clip
+		loops = self.loops[playing]
+		safe = np.where(durations > 0, durations, 1)
+		times = np.where(loops, np.mod(times, safe), np.clip(times, 0, durations))
+		self.playing[playing[~loops & (times >= durations)]] = False
+		self.times[playing] = times
+
+		timeline = self.offsets[clips] + times
+		self.sample_frames(playing, clips, timeline)
+		self.sample_transforms(playing, clips, timeline)
+
+	def sample_frames(self, slots, clips, timeline):
+		" Look up the sprite index of the given slots at their position on the global timeline"
+		ranges = self.frame_ranges[clips]
+		has_track = ranges[:, 0] >= 0
+		self.frames[slots[~has_track]] = -1
+		slots, ranges, timeline = slots[has_track], ranges[has_track], timeline[has_track]
+
+		if len(slots) == 0:
+			return
+
+		keys = np.searchsorted(self.frame_times, timeline, side='right') - 1
+		keys = np.clip(keys, ranges[:, 0], ranges[:, 1] - 1)
+		self.frames[slots] = self.frame_values[keys]
+
+	def sample_transforms(self, slots, clips, timeline):
+		" Interpolate the transforms of the given slots at their position on the global timeline"
+		ranges = self.key_ranges[clips]
+		has_track = ranges[:, 0] >= 0
+		slots, ranges, timeline = slots[has_track], ranges[has_track], timeline[has_track]
+
+		if len(slots) == 0:
+			return
+
+		# Interpolate between the keyframe at or before the time and the one after it
+		first = np.clip(np.searchsorted(self.key_times, timeline, side='right') - 1, ranges[:, 0], ranges[:, 1] - 1)
+		second = np.minimum(first + 1, ranges[:, 1] - 1)
+
+		span = self.key_times[second] - self.key_times[first]
+		fraction = np.where(span > 0, (timeline - self.key_times[first]) / np.where(span > 0, span, 1), 0)
+		fraction = np.clip(fraction, 0, 1).astype(np.float32)[:, np.newaxis]
+
+		self.positions[slots] = self.key_positions[first] + (self.key_positions[second] - self.key_positions[first]) * fraction
+		self.scales[slots] = self.key_scales[first] + (self.key_scales[second] - self.key_scales[first]) * fraction
+		self.rotations[slots] = mach.quaternion_slerp_array(self.key_rotations[first], self.key_rotations[second], fraction[:, 0])
@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from OpenGL.GL import *
+import threading
+import time
+import mach
+import mach.TextureAtlas
+
+class AssetLoader:
+	"""
+	Loads assets on a pool of worker threads so the render thread only does the OpenGL work.
+
+	Images are decoded, atlas XML is parsed and shader files are read on the workers. Anything that needs OpenGL
+	(uploading a texture, compiling a shader) waits until the render thread calls update, which should be called
+	once per frame. Every load returns a concurrent.futures.Future
+
+	Arguments:
+		workers - the number of worker threads (integer)
+	"""
+	def __init__(self, workers=4):
+		self.executor = ThreadPoolExecutor(max_workers=workers)
+		self.lock = threading.Lock()
+
+		# Decoded results waiting for the render thread, as (decode future, function finishing the load, result future)
+		self.uploads = []
+
+		self.queued = 0
+		self.completed = 0
+		self.bytes_loaded = 0
+		self.start_time = None
+		self.busy_time = 0
+
+	def submit(self, func, *args):
+		" Run func(*args) on a worker thread, keeping track of how much was loaded and how long it took"
+		with self.lock:
+			self.queued += 1
+			if self.start_time is None:
+				self.start_time = time.perf_counter()
+
+		def run():
+			start = time.perf_counter()
+			try:
+				return func(*args)
+			finally:
+				with self.lock:
+					self.queued -= 1
+					self.completed += 1
+					self.busy_time += time.perf_counter() - start
+
+		return self.executor.submit(run)
+
+	def read_file(self, path, mode='r'):
+		" Read a whole file, counting the bytes read"
+		with open(path, mode) as f:
+			data = f.read()
+		with self.lock:
+			self.bytes_loaded += len(data)
+		return data
+
+	def decode_image(self, path, convert):
+		mat = mach.load_image(path, convert)
+		with self.lock:
+			self.bytes_loaded += mat.nbytes
+		return mat
+
+	def load_image(self, path, convert="RGBA"):
+		" Decode an image into a numpy array on a worker thread, returns a future of the array"
+		return self.submit(self.decode_image, path, convert)
+
+	def load_atlas(self, path):
+		" Parse a texture atlas on a worker thread, returns a future of the result of mach.TextureAtlas.parse"
+		return self.submit(mach.TextureAtlas.parse, path)
+
+	def load_text(self, path):
+		" Read a text file (shader source for example) on a worker thread, returns a future of the string"
+		return self.submit(self.read_file, path)
+
+	def after_load(self, future, finish):
+		" Queue finish(result) to run on the render thread once future is done, returns a future of what finish returns"
+		result = Future()
+		with self.lock:
+			self.uploads.append((future, finish, result))
+		return result
+
+	def load_texture(self, storage, name, path, active_texture=0, convert="RGBA", filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
+		"""
+		Decode an image on a worker thread and store it in a sampler2D object once update is called on the render thread.
+		Images already in mach.texture_cache are not decoded again. Returns a future of the texture id
+
+		Arguments:
+			storage - the Shader, MachObject or other ImageStorage the texture is stored in
+			(see ImageStorage.store_sampler2D_from_path for the other arguments)
+		"""
+		key = mach.texture_key(path, convert, filter, format, mipmaps, anisotropy)
+		if key in mach.texture_cache:
+			decoded = Future()
+			decoded.set_result(None)
+		else:
+			decoded = self.load_image(path, convert)
+
+		def finish(mat):
+			# The texture may have been evicted since, in which case it is decoded again on the render thread
+			load = (lambda: mat) if mat is not None else (lambda: mach.load_image(path, convert))
+			return storage.store_sampler2D_from_cache(name, key, load, active_texture, filter, format, mipmaps, anisotropy)
+
+		return self.after_load(decoded, finish)
+
+	def load_shader(self, vert, frag, geom=None):
+		"""
+		Read shader files on worker threads and compile them once update is called on the render thread.
+		Returns a future of the Shader
+
+		Arguments:
+			vert - the path to the vertex shader (string)
+			frag - the path to the fragment shader (string)
+			geom - the path to the geometry shader (string, optional)
+		"""
+		paths = [vert, frag] if geom is None else [vert, geom, frag]
+		sources = self.submit(lambda: [self.read_file(path) for path in paths])
+		return self.after_load(sources, lambda sources: mach.Shader(*sources, from_source=True))
+
+	def update(self, max_uploads=None):
+		"""
+		Finish loads whose worker part is done, must be called on the render thread. Returns the number finished
+
+		Arguments:
+			max_uploads - finish at most this many loads this frame to spread uploads over several frames (integer)
+		"""
+		with self.lock:
+			ready = [upload for upload in self.uploads if upload[0].done()]
+			if max_uploads is not None:
+				ready = ready[:max_uploads]
+			for upload in ready:
+				self.uploads.remove(upload)
+
+		for future, finish, result in ready:
+			try:
+				result.set_result(finish(future.result()))
+			except Exception as e:
+				result.set_exception(e)
+
+		return len(ready)
+
+	def queue_depth(self):
+		" The number of loads still waiting on a worker thread or on update"
+		with self.lock:
+			return self.queued + len([upload for upload in self.uploads if upload[0].done()])
+
+	def get_stats(self):
+		" Returns how much has been loaded and how fast"
+		with self.lock:
+			elapsed = 0 if self.start_time is None else time.perf_counter() - self.start_time
+			return {
+				'queued': self.queued,
+				'uploads_pending': len(self.uploads),
+				'completed': self.completed,
+				'bytes_loaded': self.bytes_loaded,
+				'bytes_per_second': self.bytes_loaded / elapsed if elapsed > 0 else 0,
+				'worker_seconds': self.busy_time
+			}
+
+	def shutdown(self, wait=True):
+		" Stop the worker threads"
+		self.executor.shutdown(wait=wait)
@@ -0,0 +1,239 @@
+from lxml import etree
+from PIL import Image
+import numpy as np
+import tempfile
+import hashlib
+import os
+import mach
+import mach.TextureAtlas
+
+# Bump this whenever the packing changes so old cached atlases are not reused
+ATLAS_CACHE_VERSION = 1
+
+class AtlasPage:
+	"""
+	One page of a packed texture atlas
+
+	Arguments:
+		image - the page as a numpy matrix with shape [height, width, 4], first row at the top (like PIL)
+		sprites - the sprite table in the same format as mach.TextureAtlas.parse returns
+		names - the index of every sprite in sprites by the file name it was packed from (dictionary)
+		path - the page image on disk, ready for store_sampler2D_from_path or SpriteBatch.add_atlas (string)
+	"""
+	def __init__(self, image, sprites, names, path=None):
+		self.image = image
+		self.sprites = sprites
+		self.names = names
+		self.path = path
+
+def next_power_of_two(n):
+	return 1 << max(int(n) - 1, 0).bit_length()
+
+def skyline_pack(sizes, width, height):
+	"""
+	Place rectangles on a width x height page with the bottom left skyline heuristic (with y growing downwards,
+	so rectangles are stacked from the top). Returns the (x, y) of every rectangle, or None for those that did not fit
+
+	Arguments:
+		sizes - the (width, height) of every rectangle, in the order they should be placed (list)
+		width - the width of the page (integer)
+		height - the height of the page (integer)
+	"""
+	# The skyline is a list of [x, y, width] segments covering the whole page width, ordered by x
+	skyline = [[0, 0, width]]
+	positions = []
+
+	for w, h in sizes:
+		best = None
+		for i in range(len(skyline)):
+			x = skyline[i][0]
+			if x + w > width:
+				break
+
+			# The rectangle rests on the highest segment it spans
+			y, j, covered = 0, i, 0
+			while covered < w:
+				y = max(y, skyline[j][1])
+				covered += skyline[j][2]
+				j += 1
+
+			if y + h <= height and (best is None or (y + h, x) < (best[1] + h, best[0])):
+				best = (x, y, i)
+
+		if best is None:
+			positions.append(None)
+			continue
+
+		x, y, i = best
+		positions.append((x, y))
+
+		# Cut the segments under the new rectangle away and put the rectangle's top in their place
+		right = x + w
+		j = i
+		while j < len(skyline) and skyline[j][0] < right:
+			j += 1
+		last = skyline[j - 1]
+		remainder = last[0] + last[2] - right
+		new = [[x, y + h, w]]
+		if remainder > 0:
+			new.append([right, last[1], remainder])
+		skyline[i:j] = new
+
+		# Merge neighbours of the same height so the skyline stays short
+		merged = [skyline[0]]
+		for segment in skyline[1:]:
+			if segment[1] == merged[-1][1]:
+				merged[-1][2] += segment[2]
+			else:
+				merged.append(segment)
+		skyline = merged
+
+	return positions
+
+def page_sizes(area, widest, tallest, max_size):
+	" Power of two page sizes from the smallest that could hold area up to max_size x max_size, smallest first"
+	sizes = []
+	size = next_power_of_two(max(widest, tallest))
+	while size <= max_size:
+		sizes.append((size, size))
+		if size * 2 <= max_size:
+			sizes.append((size * 2, size))
+		size *= 2
+	return [(w, h) for w, h in sizes if w * h >= area and w >= widest and h >= tallest] or [(max_size, max_size)]
+
+def find_images(images):
+	" The image files in a directory, or the list of paths itself"
+	if isinstance(images, str):
+		directory = images
+		return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tga'))]
+	return list(images)
+
+def atlas_cache_key(paths, max_size, padding):
+	" Hash of the content of every image and the packing settings, so the atlas is only repacked when the art changes"
+	key = hashlib.sha1(('%d %d %d' % (ATLAS_CACHE_VERSION, max_size, padding)).encode())
+	for path in paths:
+		key.update(os.path.basename(path).encode())
+		with open(path, 'rb') as f:
+			key.update(hashlib.sha1(f.read()).digest())
+	return key.hexdigest()
+
+def write_atlas_page(page, image_path, xml_path):
+	" Save a page as an image and TexturePacker style XML that mach.TextureAtlas.parse can read"
+	Image.fromarray(page.image).save(image_path)
+
+	height, width = page.image.shape[:2]
+	root = etree.Element('TextureAtlas', imagePath=os.path.basename(image_path), width=str(width), height=str(height))
+	for name, n in sorted(page.names.items(), key=lambda item: item[1]):
+		sprite = page.sprites[n]
+		etree.SubElement(root, 'sprite', n=name, x=str(sprite.px), y=str(sprite.py), w=str(sprite.pw), h=str(sprite.ph))
+	etree.ElementTree(root).write(xml_path, xml_declaration=True, encoding='UTF-8', pretty_print=True)
+
+def read_atlas_page(image_path, xml_path):
+	" Load a page saved by write_atlas_page"
+	names = {name: n for n, name in enumerate(etree.parse(xml_path).xpath('/TextureAtlas/sprite/@n'))}
+	image = np.array(Image.open(image_path).convert('RGBA'))
+	return AtlasPage(image, mach.TextureAtlas.parse(xml_path), names, image_path)
+
+def sprite_names(paths):
+	" The sprite name of every image, its file name without the extension, raises if two images would share a name"
+	names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+
+	seen = {}
+	for name, path in zip(names, paths):
+		if name in seen:
+			raise ValueError('%s and %s would both be packed as the sprite %s' % (seen[name], path, name))
+		seen[name] = path
+	return names
+
+def pack_images(paths, max_size=2048, padding=2):
+	" Pack images without caching, see pack_atlas"
+	names = sprite_names(paths)
+	mats = [np.array(Image.open(path).convert('RGBA')) for path in paths]
+
+	cells = [(mat.shape[1] + padding * 2, mat.shape[0] + padding * 2) for mat in mats]
+	for name, (w, h) in zip(names, cells):
+		if w > max_size or h > max_size:
+			raise ValueError('%s does not fit on a %dx%d atlas page' % (name, max_size, max_size))
+
+	# Tallest first keeps the skyline flat
+	remaining = sorted(range(len(mats)), key=lambda i: (cells[i][1], cells[i][0]), reverse=True)
+	pages = []
+
+	while remaining:
+		sizes = [cells[i] for i in remaining]
+		area = sum(w * h for w, h in sizes)
+		widest = max(w for w, h in sizes)
+		tallest = max(h for w, h in sizes)
+
+		# Use the smallest page that holds everything left, or fill a page of the largest size and carry on
+		for width, height in page_sizes(area, widest, tallest, max_size):
+			positions = skyline_pack(sizes, width, height)
+			if None not in positions:
+				break
+
+		image = np.zeros((height, width, 4), dtype=np.uint8)
+		sprites = {}
+		page_names = {}
+		left = []
+
+		for i, position in zip(remaining, positions):
+			if position is None:
+				left.append(i)
+				continue
+
+			mat = mats[i]
+			h, w = mat.shape[:2]
+			x, y = position
+			image[y:y + h + padding * 2, x:x + w + padding * 2] = np.pad(mat, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+
+			x += padding
+			y += padding
+			n = len(sprites)
+			sprites[n] = mach.TextureAtlas.Sprite(n, x / width, y / height, w / width, h / height, x, y, w, h, 0)
+			page_names[names[i]] = n
+
+		pages.append(AtlasPage(image, sprites, page_names))
+		remaining = left
+
+	return pages
+
+def pack_atlas(images, max_size=2048, padding=2, cache_dir=None):
+	"""
+	Pack loose images into as few power of two texture atlas pages as possible, returns a list of AtlasPage.
+
+	Every image is surrounded by padding pixels copied from its edge so filtering never picks up its neighbours.
+	The pages are saved in cache_dir under a hash of the images' content, so later calls with unchanged art load
+	the saved pages instead of packing again. Sprites are named after their file name without the extension, so
+	images that would share a name (a/guy.png and b/guy.png, or guy.png and guy.jpg) raise a ValueError
+
+	Arguments:
+		images - a list of image paths or the path of a directory of images (list or string)
+		max_size - the largest width and height a page may have (integer, power of two)
+		padding - the number of pixels around every image (integer)
+		cache_dir - where packed pages are saved, defaults to a directory in the system's temporary directory (string)
+	"""
+	paths = find_images(images)
+	if cache_dir is None:
+		cache_dir = os.path.join(tempfile.gettempdir(), 'mach_atlas_cache')
+
+	key = atlas_cache_key(paths, max_size, padding)
+	index_path = os.path.join(cache_dir, key + '.pages')
+	if os.path.exists(index_path):
+		with open(index_path) as f:
+			page_count = int(f.read())
+		base = os.path.join(cache_dir, key)
+		return [read_atlas_page('%s_%d.png' % (base, i), '%s_%d.xml' % (base, i)) for i in range(page_count)]
+
+	pages = pack_images(paths, max_size, padding)
+
+	os.makedirs(cache_dir, exist_ok=True)
+	base = os.path.join(cache_dir, key)
+	for i, page in enumerate(pages):
+		page.path = '%s_%d.png' % (base, i)
+		write_atlas_page(page, page.path, '%s_%d.xml' % (base, i))
+
+	# Written last, so a pack that was interrupted is never mistaken for a finished one
+	with open(index_path, 'w') as f:
+		f.write(str(len(pages)))
+
+	return pages
@@ -4,17 +4,38 @@ from OpenGL.GL import *
 class Attribute:
 	"""
 	Organizes the data necessary to upload attribute data into a shader
+
+	Arguments:
+		data - numpy array with one row per vertex (or per instance)
+		location - the layout location of the attribute in the shader, matrices take up one location per column
+		divisor - 0 for per vertex attributes, n to advance the attribute once every n instances
+		columns - 1 for a vector attribute, or the number of columns of a matrix attribute (3 for a mat3, 4 for a mat4),
+					each row then holds the matrix column by column
 	"""
-	def __init__(self, data, location, type=GL_FLOAT, normalized=GL_FALSE, stride=0):
+	def __init__(self, data, location, type=GL_FLOAT, normalized=GL_FALSE, stride=0, divisor=0, columns=1):
 		self.data = data.reshape(-1)
-		self.size = data.shape[1]
+		self.size = int(numpy.prod(data.shape[1:]))
 		self.location = location
 		self.type = type
 		self.normalized = normalized
 		self.stride = stride
+		self.divisor = divisor
 		self.bytes = self.data.nbytes
 
 		self.count = self.data.size // self.size
 
-	def set_offset(self, offset):
+		# Matrices are passed to the shader as one vector attribute per column
+		if columns < 1 or self.size % columns != 0 or self.size // columns > 4:
+			raise ValueError("Cannot split rows of %d values into %d columns of at most 4 values" % (self.size, columns))
+		self.columns = columns
+		self.column_size = self.size // self.columns
+		if self.columns > 1 and self.stride == 0:
+			self.stride = self.size * self.data.itemsize
+
+		# The stride to fall back to when the attribute is not interleaved with others
+		self.planar_stride = self.stride
+
+	def set_offset(self, offset, stride=None):
+		" Set where the attribute starts in its buffer and the distance between vertices (defaults to the planar stride)"
 		self.offset = offset
+		self.stride = self.planar_stride if stride is None else stride
@@ -7,6 +7,26 @@ import math
 # Define the up vector in world coordinates
 UP = glm.vec3(0, 1, 0)
 
+def screen_to_world(pos, window_size, projection, view=None, depth=0):
+	"""
+	Turn a position in window pixels into a world position, returns a numpy array (x, y, z)
+
+	Arguments:
+		pos - the position in pixels from the top left of the window, such as Window.get_mouse_pos (iterable of size 2)
+		window_size - the size of the window in pixels (iterable of size 2)
+		projection - the projection matrix, or a camera with a mat attribute
+		view - the view matrix, or a ViewMatrix (optional)
+		depth - the depth in normalized device coordinates, -1 is the near plane and 1 the far plane (float)
+	"""
+	matrix = np.array(getattr(projection, 'mat', projection), dtype=np.float64).reshape(4, 4)
+	if view is not None:
+		matrix = matrix @ np.array(getattr(view, 'mat', view), dtype=np.float64).reshape(4, 4)
+
+	x = 2 * pos[0] / window_size[0] - 1
+	y = 1 - 2 * pos[1] / window_size[1]
+	world = np.linalg.inv(matrix) @ np.array([x, y, depth, 1])
+	return world[:3] / world[3]
+
 class OrthographicCamera:
 	def __init__(self, width, height, aspect_ratio, near_clip, far_clip, zoom = 1):
 		"""
@@ -50,6 +70,10 @@ class OrthographicCamera:
 			aspect_ratio = self.aspect_ratio / (width * self.zoom)
 		self.mat = mach.OrthographicMatrix(-width * aspect_ratio, width * aspect_ratio, -height * aspect_ratio, height * aspect_ratio, self.near_clip, self.far_clip)
 
+	def screen_to_world(self, pos):
+		" Turn a position in window pixels (such as Window.get_mouse_pos) into a world position"
+		return screen_to_world(pos, (self.width, self.height), self.mat)
+
 class PerspectiveCamera:
 	def __init__(self, width, height, FOV=60, z_near=0.1, z_far=100):
 		self.FOV = math.radians(FOV)
@@ -0,0 +1,279 @@
+import numpy as np
+
+# Collider shapes
+SHAPE_AABB, SHAPE_CIRCLE, SHAPE_OBB = range(3)
+
+def expand_ranges(starts, ends):
+	" For index ranges [starts[i], ends[i]), returns (i, j) for every j in every range, without a Python loop"
+	lengths = np.maximum(ends - starts, 0)
+	total = int(lengths.sum())
+	owners = np.repeat(np.arange(len(starts)), lengths)
+	offsets = np.cumsum(lengths) - lengths
+	return owners, np.repeat(starts - offsets, lengths) + np.arange(total)
+
+def sweep_and_prune(mins, maxs):
+	"""
+	Find every pair of overlapping axis aligned boxes in one set, returns two index arrays (a, b) with a < b.
+
+	The boxes are sorted along x once, and every box is paired with the boxes that start within its x extent,
+	so only pairs overlapping along x are ever looked at
+
+	Arguments:
+		mins - the lower left corner of every box (N by 2 array)
+		maxs - the upper right corner of every box (N by 2 array)
+	"""
+	order = np.argsort(mins[:, 0], kind='stable')
+	start_x = mins[order, 0]
+
+	ends = np.searchsorted(start_x, maxs[order, 0], side='right')
+	first, second = expand_ranges(np.arange(1, len(order) + 1), ends)
+	a, b = order[first], order[second]
+
+	overlap = (mins[a, 1] <= maxs[b, 1]) & (mins[b, 1] <= maxs[a, 1])
+	a, b = a[overlap], b[overlap]
+	return np.minimum(a, b), np.maximum(a, b)
+
+def sweep_and_prune_between(mins_a, maxs_a, mins_b, maxs_b):
+	"""
+	Find every overlapping pair of a box from set a and a box from set b (hit boxes against hurt boxes for example),
+	returns two index arrays (a, b) into the sets
+
+	Arguments:
+		mins_a, maxs_a - the corners of the boxes in the first set (N by 2 arrays)
+		mins_b, maxs_b - the corners of the boxes in the second set (M by 2 arrays)
+	"""
+	order_a = np.argsort(mins_a[:, 0], kind='stable')
+	order_b = np.argsort(mins_b[:, 0], kind='stable')
+	start_a = mins_a[order_a, 0]
+	start_b = mins_b[order_b, 0]
+
+	# Two boxes overlap along x when either one starts within the other, counting a shared start only once
+	starts = np.searchsorted(start_b, start_a, side='left')
+	ends = np.searchsorted(start_b, maxs_a[order_a, 0], side='right')
+	first, second = expand_ranges(starts, ends)
+	a = [order_a[first]]
+	b = [order_b[second]]
+
+	starts = np.searchsorted(start_a, start_b, side='right')
+	ends = np.searchsorted(start_a, maxs_b[order_b, 0], side='right')
+	first, second = expand_ranges(starts, ends)
+	a.append(order_a[second])
+	b.append(order_b[first])
+
+	a, b = np.concatenate(a), np.concatenate(b)
+	overlap = (mins_a[a, 1] <= maxs_b[b, 1]) & (mins_b[b, 1] <= maxs_a[a, 1])
+	return a[overlap], b[overlap]
+
+def aabbs_overlap(centers_a, half_sizes_a, centers_b, half_sizes_b):
+	" Returns which pairs of axis aligned boxes overlap, every argument is an N by 2 array"
+	return (np.abs(centers_a - centers_b) <= half_sizes_a + half_sizes_b).all(axis=1)
+
+def circles_overlap(centers_a, radii_a, centers_b, radii_b):
+	" Returns which pairs of circles (N by 2 centers, N radii) overlap"
+	return ((centers_a - centers_b) ** 2).sum(axis=1) <= (radii_a + radii_b) ** 2
+
+def box_axes(angles):
+	" The local x and y axes of boxes rotated by angles (radians), two N by 2 arrays"
+	cos, sin = np.cos(angles), np.sin(angles)
+	return np.stack((cos, sin), axis=1), np.stack((-sin, cos), axis=1)
+
+def obbs_overlap(centers_a, half_sizes_a, angles_a, centers_b, half_sizes_b, angles_b):
+	"""
+	Returns which pairs of oriented boxes overlap, using the separating axis theorem on the four box axes
+
+	Arguments:
+		centers_a, centers_b - the centers of the boxes (N by 2 arrays)
+		half_sizes_a, half_sizes_b - half the width and height of the boxes (N by 2 arrays)
+		angles_a, angles_b - the rotation of the boxes in radians, counterclockwise (N arrays)
+	"""
+	ax, ay = box_axes(angles_a)
+	bx, by = box_axes(angles_b)
+	offset = centers_b - centers_a
+
+	def dot(u, v):
+		return (u * v).sum(axis=1)
+
+	separated = np.zeros(len(offset), dtype=np.bool_)
+	for axis in (ax, ay, bx, by):
+		reach_a = half_sizes_a[:, 0] * np.abs(dot(ax, axis)) + half_sizes_a[:, 1] * np.abs(dot(ay, axis))
+		reach_b = half_sizes_b[:, 0] * np.abs(dot(bx, axis)) + half_sizes_b[:, 1] * np.abs(dot(by, axis))
+		separated |= np.abs(dot(offset, axis)) > reach_a + reach_b
+	return ~separated
+
+def circles_obbs_overlap(centers, radii, box_centers, half_sizes, angles):
+	" Returns which pairs of a circle and an oriented (or axis aligned, with angle 0) box overlap"
+	ax, ay = box_axes(angles)
+	offset = centers - box_centers
+
+	# The circle's center in the box's own space, and the closest point of the box to it
+	local = np.stack(((offset * ax).sum(axis=1), (offset * ay).sum(axis=1)), axis=1)
+	closest = np.clip(local, -half_sizes, half_sizes)
+	return ((local - closest) ** 2).sum(axis=1) <= radii ** 2
+
+class Colliders:
+	"""
+	A set of 2D colliders kept in numpy arrays, one row per collider. Every collider is an axis aligned box, a circle
+	or an oriented box, and can be switched off without removing it (a hit box between attack frames for example)
+
+	Arguments:
+		capacity - the number of colliders to preallocate room for, the set grows if more are added (integer)
+	"""
+	def __init__(self, capacity=1024):
+		self.capacity = 0
+		self.count = 0
+		self.reserve(capacity)
+
+	def reserve(self, capacity):
+		" Grow the collider arrays so they can hold at least capacity colliders"
+		if capacity <= self.capacity:
+			return
+
+		capacity = max(capacity, self.capacity * 2)
+		count = self.count
+
+		def grow(name, shape, dtype, fill=0):
+			new = np.full(shape, fill, dtype=dtype)
+			if count > 0: new[:count] = getattr(self, name)[:count]
+			setattr(self, name, new)
+
+		grow('shapes', capacity, np.int8)
+		grow('centers', (capacity, 2), np.float32)
+		grow('half_sizes', (capacity, 2), np.float32)
+		grow('angles', capacity, np.float32)
+		grow('enabled', capacity, np.bool_, False)
+
+		self.capacity = capacity
+
+	def add(self, shape, centers, half_sizes, angles=None):
+		" Add colliders of one shape, returns their ids. Circles store their radius in both half sizes"
+		centers = np.asarray(centers, dtype=np.float32).reshape(-1, 2)
+		n = len(centers)
+		self.reserve(self.count + n)
+		ids = np.arange(self.count, self.count + n)
+		self.count += n
+
+		self.shapes[ids] = shape
+		self.centers[ids] = centers
+		self.half_sizes[ids] = np.asarray(half_sizes, dtype=np.float32).reshape(n, -1)
+		self.angles[ids] = 0 if angles is None else angles
+		self.enabled[ids] = True
+		return ids
+
+	def add_aabbs(self, mins, maxs):
+		" Add axis aligned boxes from their corners (N by 2 arrays), returns their ids"
+		mins = np.asarray(mins, dtype=np.float32).reshape(-1, 2)
+		maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 2)
+		return self.add(SHAPE_AABB, (mins + maxs) / 2, (maxs - mins) / 2)
+
+	def add_circles(self, centers, radii):
+		" Add circles (N by 2 centers, N radii), returns their ids"
+		return self.add(SHAPE_CIRCLE, centers, np.asarray(radii, dtype=np.float32).reshape(-1, 1))
+
+	def add_obbs(self, centers, half_sizes, angles):
+		" Add oriented boxes (N by 2 centers and half sizes, N angles in radians), returns their ids"
+		return self.add(SHAPE_OBB, centers, half_sizes, angles)
+
+	def move(self, ids, centers, angles=None):
+		" Move colliders to new centers, and turn oriented boxes to new angles"
+		self.centers[ids] = centers
+		if angles is not None: self.angles[ids] = angles
+
+	def set_enabled(self, ids, enabled):
+		" Switch colliders on or off, colliders that are off never collide"
+		self.enabled[ids] = enabled
+
+	def clear(self):
+		" Remove every collider"
+		self.count = 0
+		self.enabled[:] = False
+
+	def bounds(self):
+		" The axis aligned bounding box (mins, maxs) of every collider, for the broadphase"
+		n = self.count
+		shapes = self.shapes[:n]
+		half_sizes = self.half_sizes[:n]
+
+		# A rotated box reaches |cos| * w + |sin| * h along x and |sin| * w + |cos| * h along y
+		obb = shapes == SHAPE_OBB
+		if obb.any():
+			half_sizes = half_sizes.copy()
+			cos = np.abs(np.cos(self.angles[:n][obb]))
+			sin = np.abs(np.sin(self.angles[:n][obb]))
+			w, h = half_sizes[obb, 0].copy(), half_sizes[obb, 1].copy()
+			half_sizes[obb, 0] = cos * w + sin * h
+			half_sizes[obb, 1] = sin * w + cos * h
+
+		return self.centers[:n] - half_sizes, self.centers[:n] + half_sizes
+
+class CollisionDetector:
+	"""
+	Finds the overlapping pairs of colliders, either within one Colliders set or between two.
+
+	The sweep and prune broadphase finds the pairs whose bounding boxes overlap, and the narrowphase tests those
+	pairs exactly, each combination of shapes in one batched numpy operation. Pairs are returned as two index arrays.
+
+	Statistics for the last call to collide are kept in pairs_tested (pairs reaching the narrowphase) and
+	pairs_overlapping
+	"""
+	def __init__(self):
+		self.pairs_tested = 0
+		self.pairs_overlapping = 0
+
+	def collide(self, colliders, other=None):
+		"""
+		Returns the overlapping pairs as two index arrays (a, b), a into colliders and b into other
+		(or into colliders as well with a < b when other is not given)
+
+		Arguments:
+			colliders - the first set (Colliders)
+			other - the second set, such as hurt boxes when colliders holds hit boxes (Colliders, optional)
+		"""
+		mins_a, maxs_a = colliders.bounds()
+		enabled_a = np.flatnonzero(colliders.enabled[:colliders.count])
+
+		if other is None:
+			a, b = sweep_and_prune(mins_a[enabled_a], maxs_a[enabled_a])
+			a, b = enabled_a[a], enabled_a[b]
+			other = colliders
+		else:
+			mins_b, maxs_b = other.bounds()
+			enabled_b = np.flatnonzero(other.enabled[:other.count])
+			a, b = sweep_and_prune_between(mins_a[enabled_a], maxs_a[enabled_a], mins_b[enabled_b], maxs_b[enabled_b])
+			a, b = enabled_a[a], enabled_b[b]
+
+		self.pairs_tested = len(a)
+		overlap = self.narrowphase(colliders, a, other, b)
+		self.pairs_overlapping = int(overlap.sum())
+		return a[overlap], b[overlap]
+
+	def narrowphase(self, colliders, a, other, b):
+		" Test pairs exactly, returns which of them overlap"
+		shape_a, shape_b = colliders.shapes[a], other.shapes[b]
+		circle_a, circle_b = shape_a == SHAPE_CIRCLE, shape_b == SHAPE_CIRCLE
+
+		# Two axis aligned boxes overlap exactly when their bounds do, which the broadphase already tested
+		overlap = (shape_a == SHAPE_AABB) & (shape_b == SHAPE_AABB)
+
+		pairs = circle_a & circle_b
+		if pairs.any():
+			i, j = a[pairs], b[pairs]
+			overlap[pairs] = circles_overlap(colliders.centers[i], colliders.half_sizes[i, 0], other.centers[j], other.half_sizes[j, 0])
+
+		pairs = ~circle_a & ~circle_b & ((shape_a == SHAPE_OBB) | (shape_b == SHAPE_OBB))
+		if pairs.any():
+			i, j = a[pairs], b[pairs]
+			overlap[pairs] = obbs_overlap(
+				colliders.centers[i], colliders.half_sizes[i], colliders.angles[i],
+				other.centers[j], other.half_sizes[j], other.angles[j]
+			)
+
+		# Circles against boxes, with the circle on either side of the pair
+		for pairs, circles, circle_ids, boxes, box_ids in (
+			(circle_a & ~circle_b, colliders, a, other, b),
+			(~circle_a & circle_b, other, b, colliders, a)
+		):
+			if pairs.any():
+				i, j = circle_ids[pairs], box_ids[pairs]
+				overlap[pairs] = circles_obbs_overlap(circles.centers[i], circles.half_sizes[i, 0], boxes.centers[j], boxes.half_sizes[j], boxes.angles[j])
+
+		return overlap
@@ -0,0 +1,99 @@
+from ctypes import c_int, byref
+from OpenGL.GL import *
+from OpenGL.GL.shaders import *
+import numpy as np
+import sys
+
+import mach
+
+class ComputeShader(mach.StorageBufferStorage, mach.UniformStorage, mach.ImageStorage):
+	"""
+	Compiles and dispatches a compute shader, usually working on StorageBuffers (moving particles, culling instances)
+
+	Uniforms, textures and storage buffers are stored and bound the same way as with Shader
+
+	Arguments:
+		source - the path to the compute shader source (string)
+		from_source - source is the source code itself rather than a path to it (boolean)
+	"""
+	def __init__(self, source, from_source=False):
+		mach.StorageBufferStorage.__init__(self)
+		mach.UniformStorage.__init__(self)
+		mach.ImageStorage.__init__(self)
+
+		if not from_source:
+			source = open(source, 'r').read()
+
+		try:
+			COMPUTE_SHADER = compileShader(source, GL_COMPUTE_SHADER)
+
+			self.shader = glCreateProgram()
+			glAttachShader(self.shader, COMPUTE_SHADER)
+			self.link()
+
+		except ShaderCompilationError as e:
+			compile_failure_string = e.args[0].replace("b'", '\n')[:-1]
+			print(bytes(compile_failure_string, 'utf-8').decode('unicode_escape'), file=sys.stderr)
+			print(e.args[2], file=sys.stderr)
+			sys.exit(1)
+
+		self.uniform_locations = {}
+
+		# The local_size declared in the source, the number of invocations in one work group
+		local_size = np.zeros(3, dtype=np.int32)
+		glGetProgramiv(self.shader, GL_COMPUTE_WORK_GROUP_SIZE, local_size)
+		self.local_size = tuple(local_size.tolist())
+
+	def link(self):
+		" Link the program, printing the log if it fails"
+		glLinkProgram(self.shader)
+
+		temp = c_int(0)
+		glGetProgramiv(self.shader, GL_LINK_STATUS, byref(temp))
+		self.linked = bool(temp.value)
+		if not self.linked:
+			print(glGetProgramInfoLog(self.shader).decode('unicode_escape'), file=sys.stderr)
+
+	def get_program(self):
+		" Get the OpenGL program id"
+		return self.shader
+
+	def get_uniform_location(self, name):
+		" Get the location of a uniform variable (name - the name of the uniform variable in glsl)"
+		if (name not in self.uniform_locations):
+			self.uniform_locations[name] = glGetUniformLocation(self.shader, name)
+		return self.uniform_locations[name]
+
+	def bind(self, skip_images=False, skip_uniforms=False, skip_buffers=False):
+		" Bind the program and everything stored in it"
+		mach.gl_state.use_program(self.shader)
+
+		if not skip_images:		self.bind_images()
+		if not skip_uniforms:	self.bind_uniforms()
+		if not skip_buffers:	self.bind_storage_buffers()
+
+	def dispatch(self, groups_x, groups_y=1, groups_z=1, barrier=GL_SHADER_STORAGE_BARRIER_BIT):
+		"""
+		Run the shader on a grid of work groups
+
+		Arguments:
+			groups_x, groups_y, groups_z - the number of work groups along each axis (integers)
+			barrier - the glMemoryBarrier bits for how the results are used next, such as GL_VERTEX_ATTRIB_ARRAY_BARRIER_BIT
+				when the buffer is drawn as vertices, or 0 for no barrier. StorageBuffer.read issues its own barrier
+		"""
+		self.bind()
+		glDispatchCompute(groups_x, groups_y, groups_z)
+		if barrier:
+			glMemoryBarrier(barrier)
+
+	def dispatch_invocations(self, x, y=1, z=1, barrier=GL_SHADER_STORAGE_BARRIER_BIT):
+		"""
+		Run the shader at least x by y by z times, in as many work groups of local_size as that takes.
+		The shader should skip invocations past the end of its data, as the last group may run over
+
+		Arguments:
+			x, y, z - the number of invocations along each axis, such as the number of particles (integers)
+			barrier - see dispatch
+		"""
+		groups = [-(-n // size) for n, size in zip((x, y, z), self.local_size)]
+		self.dispatch(*groups, barrier=barrier)
@@ -0,0 +1,119 @@
+import numpy as np
+import mach
+
+def frustum_planes(matrix):
+	"""
+	Extract the six clipping planes (left, right, bottom, top, near, far) from a projection or projection * view
+	matrix, returns a 6 by 4 float32 array of normalized planes (a, b, c, d) with a*x + b*y + c*z + d >= 0 inside
+
+	Arguments:
+		matrix - a glm matrix or a numpy matrix with the translation in the last column (like mach.OrthographicMatrix)
+	"""
+	m = np.array(matrix, dtype=np.float64).reshape(4, 4)
+	planes = np.array([
+		m[3] + m[0],
+		m[3] - m[0],
+		m[3] + m[1],
+		m[3] - m[1],
+		m[3] + m[2],
+		m[3] - m[2]
+	])
+	planes /= np.linalg.norm(planes[:, :3], axis=1)[:, np.newaxis]
+	return planes.astype(np.float32)
+
+def rectangle_planes(left, right, bottom, top):
+	" The four planes of a 2D view rectangle, in the same form as frustum_planes, for cameras that only look down z"
+	return np.array([
+		[1, 0, 0, -left],
+		[-1, 0, 0, right],
+		[0, 1, 0, -bottom],
+		[0, -1, 0, top]
+	], dtype=np.float32)
+
+def spheres_visible(planes, centers, radii):
+	" Returns which spheres (N by 3 centers, N radii) are at least partly inside all planes"
+	distances = centers @ planes[:, :3].T + planes[:, 3]
+	return (distances >= -np.asarray(radii)[:, np.newaxis]).all(axis=1)
+
+def boxes_visible(planes, minimums, maximums):
+	" Returns which axis aligned boxes (N by 3 corners) are at least partly inside all planes"
+	# The corner of every box furthest along each plane's normal is the last one to leave the inside
+	normals = planes[:, :3]
+	farthest = np.where(normals[np.newaxis] >= 0, maximums[:, np.newaxis], minimums[:, np.newaxis])
+	distances = (farthest * normals[np.newaxis]).sum(axis=2) + planes[:, 3]
+	return (distances >= 0).all(axis=1)
+
+class Culler:
+	"""
+	Removes MachObjects that are entirely outside the camera's view before they are drawn.
+
+	Objects are tested by their bounding sphere, and those that pass by their bounding box as well, all objects
+	in one numpy operation. Objects without bounds (see MachObject.set_bounds and compute_bounds) are always kept.
+
+	Statistics for the last call to cull are kept in tested, visible and culled
+	"""
+	def __init__(self):
+		self.planes = None
+
+		self.tested = 0
+		self.visible = 0
+		self.culled = 0
+
+	def set_camera(self, projection, view=None):
+		"""
+		Cull against a camera's view, call this whenever the camera moves
+
+		Arguments:
+			projection - the projection matrix, or a camera with a mat attribute (PerspectiveCamera, OrthographicCamera)
+			view - the view matrix, or a ViewMatrix (optional)
+		"""
+		projection = getattr(projection, 'mat', projection)
+		matrix = np.array(projection, dtype=np.float64).reshape(4, 4)
+		if view is not None:
+			matrix = matrix @ np.array(getattr(view, 'mat', view), dtype=np.float64).reshape(4, 4)
+		self.planes = frustum_planes(matrix)
+
+	def set_rectangle(self, left, right, bottom, top):
+		" Cull against a 2D view rectangle in world units instead of a camera"
+		self.planes = rectangle_planes(left, right, bottom, top)
+
+	def cull(self, objects, transforms=None):
+		"""
+		Returns the objects that may be visible, in their original order
+
+		Arguments:
+			objects - the MachObjects to test (list)
+			transforms - the model matrix of every object, with the translation in the last column like
+						mach.ModelMatrices, if the bounds are not already in world space (N by 4 by 4 array, optional)
+		"""
+		self.tested = len(objects)
+		if self.planes is None or len(objects) == 0:
+			self.visible = self.tested
+			self.culled = 0
+			return list(objects)
+
+		bounded = np.array([o.bounds_center is not None for o in objects], dtype=np.bool_)
+		visible = np.ones(len(objects), dtype=np.bool_)
+
+		indices = np.flatnonzero(bounded)
+		if len(indices) > 0:
+			centers = np.array([objects[i].bounds_center for i in indices], dtype=np.float32)
+			radii = np.array([objects[i].bounds_radius for i in indices], dtype=np.float32)
+
+			if transforms is None:
+				minimums = np.array([objects[i].bounds_min for i in indices], dtype=np.float32)
+				maximums = np.array([objects[i].bounds_max for i in indices], dtype=np.float32)
+				inside = spheres_visible(self.planes, centers, radii)
+				inside[inside] = boxes_visible(self.planes, minimums[inside], maximums[inside])
+			else:
+				# Boxes stop being axis aligned once rotated, so transformed objects are tested by sphere only
+				transforms = np.asarray(transforms, dtype=np.float32)[indices]
+				centers = np.einsum('nij,nj->ni', transforms[:, :3, :3], centers) + transforms[:, :3, 3]
+				radii = radii * np.linalg.norm(transforms[:, :3, :3], axis=1).max(axis=1)
+				inside = spheres_visible(self.planes, centers, radii)
+
+			visible[indices] = inside
+
+		self.visible = int(visible.sum())
+		self.culled = self.tested - self.visible
+		return [o for o, v in zip(objects, visible) if v]
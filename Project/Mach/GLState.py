@@ -0,0 +1,176 @@
+from OpenGL.GL import *
+
+def gl_id(obj):
+	" OpenGL object names come back as numpy integers or ctypes GLuints, turn either into a plain int"
+	return int(getattr(obj, 'value', obj))
+
+class GLState:
+	"""
+	Remembers the OpenGL state Mach has set (program, vertex array, buffers, textures, framebuffer, viewport,
+	blend and depth state) so calls that would not change anything are skipped.
+
+	Everything in Mach binds through the shared gl_state object. Code that changes the same state with raw
+	OpenGL calls should call invalidate() afterwards so the cache does not go stale.
+
+	Statistics are counted per frame, the totals of the last finished frame are in last_frame
+	"""
+	def __init__(self):
+		self.invalidate()
+
+		self.issued = 0
+		self.elided = 0
+		self.last_frame = {'issued': 0, 'elided': 0}
+
+	def invalidate(self):
+		" Forget all remembered state, the next call of every kind goes through to OpenGL"
+		self.state = {}
+
+		# Element array buffer bindings are stored in the vertex array object, so they are tracked per VAO
+		self.element_buffers = {}
+
+	def new_frame(self):
+		" Store this frame's statistics in last_frame and start counting again"
+		self.last_frame = {'issued': self.issued, 'elided': self.elided}
+		self.issued = 0
+		self.elided = 0
+
+	def change(self, key, value):
+		" Record value for key, returns whether it differs from what OpenGL already has"
+		if key in self.state and self.state[key] == value:
+			self.elided += 1
+			return False
+
+		self.state[key] = value
+		self.issued += 1
+		return True
+
+	def use_program(self, program):
+		program = gl_id(program)
+		if self.change('program', program):
+			glUseProgram(program)
+
+	def bind_vertex_array(self, vao):
+		vao = gl_id(vao)
+		if self.change('vertex_array', vao):
+			glBindVertexArray(vao)
+
+	def bind_buffer(self, target, buffer):
+		buffer = gl_id(buffer)
+
+		if target == GL_ELEMENT_ARRAY_BUFFER:
+			vao = self.state.get('vertex_array')
+			if vao is not None and self.element_buffers.get(vao) == buffer:
+				self.elided += 1
+				return
+			self.issued += 1
+			if vao is not None:
+				self.element_buffers[vao] = buffer
+			glBindBuffer(target, buffer)
+			return
+
+		if self.change(('buffer', target), buffer):
+			glBindBuffer(target, buffer)
+
+	def bind_buffer_range(self, target, index, buffer, offset, size):
+		buffer = gl_id(buffer)
+		if self.change(('buffer_index', target, index), (buffer, offset, size)):
+			glBindBufferRange(target, index, buffer, offset, size)
+
+			# Binding a range also binds the buffer to the generic target
+			self.state[('buffer', target)] = buffer
+
+	def bind_buffer_base(self, target, index, buffer):
+		buffer = gl_id(buffer)
+		if self.change(('buffer_index', target, index), (buffer, None, None)):
+			glBindBufferBase(target, index, buffer)
+			self.state[('buffer', target)] = buffer
+
+	def active_texture(self, unit):
+		if self.change('active_texture', unit):
+			glActiveTexture(GL_TEXTURE0 + unit)
+
+	def bind_texture(self, texture, target=GL_TEXTURE_2D, unit=None):
+		"""
+		Bind a texture to a texture unit
+
+		Arguments:
+			texture - the texture id
+			target - the texture target (GL_TEXTURE_2D, etc)
+			unit - the texture unit, defaults to the active one (integer)
+		"""
+		texture = gl_id(texture)
+
+		if unit is None:
+			unit = self.state.get('active_texture')
+			if unit is None:
+				# We do not know which unit is active, so we cannot know what is bound to it
+				self.active_texture(0)
+				unit = 0
+
+		if self.state.get(('texture', unit, target)) == texture:
+			self.elided += 1
+			return
+
+		self.active_texture(unit)
+		self.change(('texture', unit, target), texture)
+		glBindTexture(target, texture)
+
+	def forget_texture(self, texture):
+		" Call this when a texture is deleted, since OpenGL may hand out its id again"
+		texture = gl_id(texture)
+		for key in list(self.state):
+			if isinstance(key, tuple) and key[0] == 'texture' and self.state[key] == texture:
+				del self.state[key]
+
+	def forget_buffer(self, buffer):
+		" Call this when a buffer is deleted, since OpenGL may hand out its id again"
+		buffer = gl_id(buffer)
+		for key in list(self.state):
+			if not isinstance(key, tuple):
+				continue
+			if key[0] == 'buffer' and self.state[key] == buffer:
+				del self.state[key]
+			elif key[0] == 'buffer_index' and self.state[key][0] == buffer:
+				del self.state[key]
+
+		for vao in [v for v in self.element_buffers if self.element_buffers[v] == buffer]:
+			del self.element_buffers[vao]
+
+	def forget_vertex_array(self, vao):
+		" Call this when a vertex array object is deleted, since OpenGL may hand out its id again"
+		vao = gl_id(vao)
+		if self.state.get('vertex_array') == vao:
+			del self.state['vertex_array']
+		self.element_buffers.pop(vao, None)
+
+	def bind_framebuffer(self, framebuffer):
+		framebuffer = gl_id(framebuffer)
+		if self.change('framebuffer', framebuffer):
+			glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+
+	def viewport(self, x, y, width, height):
+		if self.change('viewport', (x, y, width, height)):
+			glViewport(x, y, width, height)
+
+	def enable(self, capability):
+		if self.change(('capability', capability), True):
+			glEnable(capability)
+
+	def disable(self, capability):
+		if self.change(('capability', capability), False):
+			glDisable(capability)
+
+	def blend_func(self, source, destination):
+		if self.change('blend_func', (source, destination)):
+			glBlendFunc(source, destination)
+
+	def depth_func(self, func):
+		if self.change('depth_func', func):
+			glDepthFunc(func)
+
+	def depth_mask(self, flag):
+		if self.change('depth_mask', bool(flag)):
+			glDepthMask(flag)
+
+# The state of the one OpenGL context Mach renders with
+gl_state = GLState()
@@ -1,9 +1,8 @@
 from OpenGL.GL import *
-from PIL import Image
-import numpy
+import numpy as np
 import mach
 
-class MachObject(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage, mach.AttributeStorage):
+class MachObject(mach.UniformBlockStorage, mach.StorageBufferStorage, mach.UniformStorage, mach.ImageStorage, mach.AttributeStorage):
 	"""
 	Organizes the usage of individual uniforms and AttributeObjects,
 
@@ -13,6 +12,7 @@ class MachObject(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorag
 	"""
 	def __init__(self, shader, draw_type=GL_TRIANGLES):
 		mach.UniformBlockStorage.__init__(self)
+		mach.StorageBufferStorage.__init__(self)
 		mach.UniformStorage.__init__(self)
 		mach.ImageStorage.__init__(self)
 		mach.AttributeStorage.__init__(self)
@@ -20,11 +20,51 @@ class MachObject(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorag
 		self.draw_type = draw_type
 		self.shader = shader
 
-	def bind(self, skip_attributes=False, skip_images=False, skip_uniforms=False, skip_blocks=False):
+		# Optional bounding volume in model space, objects without one are never culled
+		self.bounds_min = None
+		self.bounds_max = None
+		self.bounds_center = None
+		self.bounds_radius = None
+
+	def set_bounds(self, minimum, maximum, radius=None):
+		"""
+		Set the axis aligned bounding box used for culling, the bounding sphere is fit around it unless radius is given
+
+		Arguments:
+			minimum - the smallest x, y, z of the object (iterable of size 3)
+			maximum - the largest x, y, z of the object (iterable of size 3)
+			radius - the radius of the bounding sphere around the box's center (float)
+		"""
+		self.bounds_min = np.array(minimum, dtype=np.float32).reshape(3)
+		self.bounds_max = np.array(maximum, dtype=np.float32).reshape(3)
+		self.bounds_center = (self.bounds_min + self.bounds_max) / 2
+		if radius is None:
+			radius = np.linalg.norm(self.bounds_max - self.bounds_center)
+		self.bounds_radius = float(radius)
+
+	def compute_bounds(self, location=0):
+		"""
+		Compute the bounding box and sphere from the vertex positions stored with store_attribute_array,
+		call it again if the positions change
+
+		Arguments:
+			location - the location of the position attribute (integer)
+		"""
+		attribute = next(a for a in self.attributes if a.location == location)
+		positions = np.zeros((attribute.count, 3), dtype=np.float32)
+		columns = min(attribute.size, 3)
+		positions[:, :columns] = attribute.data.reshape(attribute.count, attribute.size)[:, :columns]
+
+		minimum, maximum = positions.min(axis=0), positions.max(axis=0)
+		center = (minimum + maximum) / 2
+		self.set_bounds(minimum, maximum, np.sqrt(((positions - center) ** 2).sum(axis=1).max()))
+
+	def bind(self, skip_attributes=False, skip_images=False, skip_uniforms=False, skip_blocks=False, skip_buffers=False):
 		if not skip_attributes:	self.bind_attributes()
 		if not skip_images:		self.bind_images()
 		if not skip_uniforms:	self.bind_uniforms()
 		if not skip_blocks:		self.bind_uniform_blocks()
+		if not skip_buffers:	self.bind_storage_buffers()
 
 	def draw(self):
 		" Draw our object"
@@ -33,77 +73,39 @@ class MachObject(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorag
 		else:
 			glDrawElements(self.draw_type, self.count, GL_UNSIGNED_INT, None)
 
+	def draw_instanced(self, count=None):
+		"""
+		Draw many copies of our object in one call
+
+		Arguments:
+			count - the number of instances to draw, defaults to the number stored with store_instance_attribute_array
+		"""
+		if count is None:
+			count = self.instance_count
+
+		if (self.IBO is None):
+			glDrawArraysInstanced(self.draw_type, 0, self.count, count)
+		else:
+			glDrawElementsInstanced(self.draw_type, self.count, GL_UNSIGNED_INT, None, count)
+
 	# Passthrough info functions to shader
+	def get_program(self):
+		return self.shader.shader
 	def get_uniform_index(self, name):
 		return self.shader.get_uniform_index(name)
 	def get_uniform_location(self, name):
 		return self.shader.get_uniform_location(name)
+	def get_block_layout(self, blockname):
+		return self.shader.get_block_layout(blockname)
+	def get_block_member(self, blockname, name):
+		return self.shader.get_block_member(blockname, name)
 	def get_block_uniform_info(self, blockname, name):
-		return self.shader.get_uniform_block_size(blockname, name)
+		return self.shader.get_block_uniform_info(blockname, name)
 	def get_struct_uniform_info(self, structname, name):
 		return self.shader.get_struct_uniform_info(structname, name)
 	def get_struct_size(self, structname):
-		return self.shader.get_struct_size(blockname)
+		return self.shader.get_struct_size(structname)
 	def get_uniform_block_size(self, blockname):
 		return self.shader.get_uniform_block_size(blockname)
 	def get_block_location(self, blockname):
 		return self.shader.get_block_location(blockname)
-
-vertex_lists = []
-targets = []
-paths = []
-active_textures = []
-count = 0
-
-widths = None
-heights = None
-images = None
-
-def add_image_to_be_bound(vertex_list, target, path, active_texture=0):
-	"""
-	Adds image data to a list to be bound to its vertex list
-	"""
-
-	global count
-
-	vertex_lists.append(vertex_list)
-	targets.append(target)
-	paths.append((count, path))
-	active_textures.append(active_texture)
-
-	count += 1
-
-def bind_image_to_vertex_list(info):
-	"""
-	Adds an individual image to a vertex list
-	"""
-
-	i = info[0]
-	path = info[1]
-
-	im = Image.open(path, mode='r')
-	width, height, image = im.size[0], im.size[1], im.tobytes()
-
-	return (i, width, height, image)
-
-def bind_images_to_vertex_lists(workers=4):
-	"""
-	Goes through all of the stored images and binds them
-	"""
-
-	length = len(vertex_lists)
-
-	for path in paths:
-		for i, width, height, image in bind_image_to_vertex_list(path):
-			texture_id = glGenTextures(1)
-
-			glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-			glBindTexture(GL_TEXTURE_2D, texture_id)
-			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-
-			glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, image)
-
-			vertex_lists[i].images[texture_id] = (targets[i], active_textures[i])
@@ -108,8 +108,132 @@ def ScaleMatrix(x, y, z):
 						[0.,      0.,      0.,      1.]])
 
 def MatFromArray(arr):
-	return np.matrix([  [arr[0],  arr[1],  arr[2],  arr[3]],
-						[arr[4],  arr[5],  arr[6],  arr[7]],
-						[arr[8],  arr[9],  arr[10], arr[11]],
-						[arr[12], arr[13], arr[14], arr[15]]
-						])
+	return np.matrix(np.reshape(arr, (4, 4)))
+
+
+# Batched versions of the functions above. They take one row per object and return an (N, 4, 4) float32 array in
+# the same (row by row) layout as the single matrix functions, so upload them with transpose=True.
+# With column_major=True every matrix is laid out column by column instead, ready for instance attributes
+# (Attribute with columns=4) and uniform buffers, which have no transpose flag
+
+def matrices(n, column_major):
+	" Returns a new (n, 4, 4) float32 array and a view of it that is always indexed [matrix, row, column]"
+	out = np.zeros((n, 4, 4), dtype=np.float32)
+	return out, (out.transpose(0, 2, 1) if column_major else out)
+
+def QuaternionRotations(quaternions):
+	" Returns an (N, 3, 3) float32 array of the rotations described by (N, 4) quaternions (w, x, y, z), which need not be normalized"
+	return mach.quaternion_matrix_array(quaternions)[:, :3, :3]
+
+def TranslationMatrices(positions, column_major=False):
+	"""
+	Generates a translation matrix for every row of positions
+
+	Arguments:
+		positions - how far to translate along x, y and z (N by 3 array)
+		column_major - lay every matrix out column by column (boolean)
+	"""
+	positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+	out, m = matrices(len(positions), column_major)
+	m[:, [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+	m[:, :3, 3] = positions
+	return out
+
+def RotationMatrices(quaternions, column_major=False):
+	"""
+	Generates a rotation matrix for every row of quaternions
+
+	Arguments:
+		quaternions - the rotations as quaternions (w, x, y, z) (N by 4 array)
+		column_major - lay every matrix out column by column (boolean)
+	"""
+	out = mach.quaternion_matrix_array(quaternions)
+	return np.ascontiguousarray(out.transpose(0, 2, 1)) if column_major else out
+
+def ScaleMatrices(scales, column_major=False):
+	"""
+	Generates a scale matrix for every row of scales
+
+	Arguments:
+		scales - the scale along x, y and z (N by 3 array, or N values to scale uniformly)
+		column_major - lay every matrix out column by column (boolean)
+	"""
+	scales = np.asarray(scales, dtype=np.float32)
+	scales = np.broadcast_to(scales.reshape(-1, 1) if scales.ndim == 1 else scales, (len(scales), 3))
+	out, m = matrices(len(scales), column_major)
+	m[:, [0, 1, 2], [0, 1, 2]] = scales
+	m[:, 3, 3] = 1
+	return out
+
+def ModelMatrices(positions, quaternions=None, scales=None, column_major=False):
+	"""
+	Generates translation * rotation * scale for every object in one pass, without multiplying matrices
+
+	Arguments:
+		positions - the position of every object (N by 3 array)
+		quaternions - the rotation of every object as a quaternion (w, x, y, z) (N by 4 array, optional)
+		scales - the scale of every object (N by 3 array or N values, optional)
+		column_major - lay every matrix out column by column (boolean)
+	"""
+	positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+	count = len(positions)
+	out, m = matrices(count, column_major)
+
+	if quaternions is None:
+		m[:, [0, 1, 2], [0, 1, 2]] = 1
+	else:
+		m[:, :3, :3] = QuaternionRotations(quaternions)
+
+	if scales is not None:
+		scales = np.asarray(scales, dtype=np.float32)
+		scales = np.broadcast_to(scales.reshape(-1, 1) if scales.ndim == 1 else scales, (count, 3))
+		# Scaling first scales the columns of the rotation
+		m[:, :3, :3] *= scales[:, np.newaxis, :]
+
+	m[:, :3, 3] = positions
+	m[:, 3, 3] = 1
+	return out
+
+def gl_matrix(mat, transpose=False):
+	"""
+	Convert a matrix into a contiguous float32 numpy array that can be handed to OpenGL without any per element work.
+	Returns the array and the transpose flag to upload it with
+
+	numpy arrays and matrices are uploaded in the same (row by row) order as before, glm matrices are uploaded
+	straight from their column major memory through the buffer protocol. Arrays laid out column by column are
+	not copied, the transpose flag is flipped instead
+
+	Arguments:
+		mat - a glm matrix, numpy array or numpy matrix
+		transpose - whether OpenGL should transpose the matrix (boolean)
+	"""
+	arr = np.asarray(mat, dtype=np.float32)
+
+	if not arr.flags.c_contiguous:
+		if arr.flags.f_contiguous:
+			if not isinstance(mat, np.ndarray):
+				# glm exposes its column major memory, which is exactly what OpenGL expects
+				return arr.T, transpose
+			return arr.T, not transpose
+		arr = np.ascontiguousarray(arr)
+
+	return arr, transpose
+
+def gl_matrix_data(mat):
+	" Like gl_matrix but for buffers (which have no transpose flag), returns a float32 array in upload order"
+	arr, transpose = gl_matrix(mat)
+	if transpose:
+		arr = np.ascontiguousarray(arr.T)
+	return arr
+
+def gl_matrix_array_data(mats):
+	"""
+	gl_matrix_data for many matrices at once, returns an [N, columns, rows] float32 array in upload order.
+	A numpy array is taken as it is, the glm matrices in a list are read from their column major memory
+
+	Arguments:
+		mats - an [N, columns, rows] array, or an iterable of glm matrices, numpy arrays or numpy matrices
+	"""
+	if isinstance(mats, np.ndarray):
+		return mats.astype(np.float32, copy=False)
+	return np.array([mat if isinstance(mat, np.ndarray) else gl_matrix_data(mat) for mat in mats], dtype=np.float32)
@@ -0,0 +1,212 @@
+from OpenGL.GL import *
+import numpy as np
+
+# The numpy type, rows and columns of every GLSL type a buffer can hold, matrices are matCxR with C columns of R rows
+glsl_types = {
+	'float': ('<f4', 1, 1), 'vec2': ('<f4', 2, 1), 'vec3': ('<f4', 3, 1), 'vec4': ('<f4', 4, 1),
+	'int': ('<i4', 1, 1), 'ivec2': ('<i4', 2, 1), 'ivec3': ('<i4', 3, 1), 'ivec4': ('<i4', 4, 1),
+	'uint': ('<u4', 1, 1), 'uvec2': ('<u4', 2, 1), 'uvec3': ('<u4', 3, 1), 'uvec4': ('<u4', 4, 1),
+	'bool': ('<i4', 1, 1), 'bvec2': ('<i4', 2, 1), 'bvec3': ('<i4', 3, 1), 'bvec4': ('<i4', 4, 1),
+	'mat2': ('<f4', 2, 2), 'mat3': ('<f4', 3, 3), 'mat4': ('<f4', 4, 4),
+	'mat2x3': ('<f4', 3, 2), 'mat2x4': ('<f4', 4, 2), 'mat3x2': ('<f4', 2, 3),
+	'mat3x4': ('<f4', 4, 3), 'mat4x2': ('<f4', 2, 4), 'mat4x3': ('<f4', 3, 4)
+}
+
+# The GLSL type name of the GL type constants the driver reports
+gl_type_names = {
+	GL_FLOAT: 'float', GL_FLOAT_VEC2: 'vec2', GL_FLOAT_VEC3: 'vec3', GL_FLOAT_VEC4: 'vec4',
+	GL_INT: 'int', GL_INT_VEC2: 'ivec2', GL_INT_VEC3: 'ivec3', GL_INT_VEC4: 'ivec4',
+	GL_UNSIGNED_INT: 'uint', GL_UNSIGNED_INT_VEC2: 'uvec2', GL_UNSIGNED_INT_VEC3: 'uvec3', GL_UNSIGNED_INT_VEC4: 'uvec4',
+	GL_BOOL: 'bool', GL_BOOL_VEC2: 'bvec2', GL_BOOL_VEC3: 'bvec3', GL_BOOL_VEC4: 'bvec4',
+	GL_FLOAT_MAT2: 'mat2', GL_FLOAT_MAT3: 'mat3', GL_FLOAT_MAT4: 'mat4',
+	GL_FLOAT_MAT2x3: 'mat2x3', GL_FLOAT_MAT2x4: 'mat2x4', GL_FLOAT_MAT3x2: 'mat3x2',
+	GL_FLOAT_MAT3x4: 'mat3x4', GL_FLOAT_MAT4x2: 'mat4x2', GL_FLOAT_MAT4x3: 'mat4x3'
+}
+
+# Padded elements are wrapped in a structured type with this one field, the name is reserved in GLSL so it never
+# clashes with a variable
+PADDED = '__value'
+
+def round_up(n, alignment):
+	return (n + alignment - 1) // alignment * alignment
+
+def padded(format, itemsize):
+	" A structured type holding format followed by padding up to itemsize bytes"
+	format = np.dtype(format)
+	if format.itemsize == itemsize:
+		return format
+	return np.dtype({'names': [PADDED], 'formats': [format], 'offsets': [0], 'itemsize': itemsize})
+
+def variable_format(type, count=None, array_stride=0, matrix_stride=0, row_major=False):
+	"""
+	The numpy type of a variable stored with the given strides, padding included
+
+	Arguments:
+		type - the GLSL type name, such as vec3 or mat4 (string)
+		count - the number of array elements, None when it is not an array (integer)
+		array_stride - the number of bytes from one array element to the next (integer)
+		matrix_stride - the number of bytes from one matrix column to the next (or row when row major) (integer)
+		row_major - whether the matrix is stored row by row (boolean)
+	"""
+	base, rows, columns = glsl_types[type]
+	if columns > 1:
+		# Matrices are arrays of columns, or of rows when row major
+		vectors, length = (rows, columns) if row_major else (columns, rows)
+		format = np.dtype((padded((base, (length,)), matrix_stride), (vectors,)))
+	elif rows > 1:
+		format = np.dtype((base, (rows,)))
+	else:
+		format = np.dtype(base)
+
+	if count is None:
+		return format
+	return np.dtype((padded(format, array_stride), (count,)))
+
+def glsl_alignment(type, packing):
+	" The base alignment and size of a GLSL type under std140 or std430 rules, with matrices counted as arrays of columns"
+	base, rows, columns = glsl_types[type]
+	alignment = {1: 4, 2: 8, 3: 16, 4: 16}[rows]
+	if columns > 1 and packing == 'std140':
+		alignment = 16
+	size = rows * 4 if columns == 1 else columns * round_up(rows * 4, alignment)
+	return alignment, size
+
+def glsl_dtype(declarations, packing='std140'):
+	"""
+	Build the numpy structured type of a block or struct declared in GLSL, with offsets following the std140 or
+	std430 rules, so whole blocks and arrays of structs can be packed with numpy assignments (see packed_field)
+
+	Arguments:
+		declarations - a list of (type, name) or (type, name, count) for every variable in order. The type is a GLSL
+			type name (vec3, mat4) or a list of declarations for a struct
+		packing - 'std140' (uniform blocks) or 'std430' (storage blocks)
+	"""
+	return glsl_struct(declarations, packing)[0]
+
+def glsl_struct(declarations, packing):
+	" Lay out a struct, returns its numpy type and base alignment"
+	names, formats, offsets = [], [], []
+	offset = 0
+	struct_alignment = 4
+
+	for declaration in declarations:
+		type, name = declaration[:2]
+		count = declaration[2] if len(declaration) > 2 else None
+
+		if isinstance(type, str):
+			alignment, size = glsl_alignment(type, packing)
+			base, rows, columns = glsl_types[type]
+			matrix_stride = round_up(rows * 4, alignment) if columns > 1 else 0
+		else:
+			element, alignment = glsl_struct(type, packing)
+			size = element.itemsize
+
+		# Array elements (and structs under std140) are aligned to at least a vec4
+		if packing == 'std140' and (count is not None or not isinstance(type, str)):
+			alignment = round_up(alignment, 16)
+		stride = round_up(size, alignment)
+
+		if isinstance(type, str):
+			format = variable_format(type, count, stride, matrix_stride)
+		else:
+			format = element if count is None else np.dtype((element, (count,)))
+
+		offset = round_up(offset, alignment)
+		names.append(name)
+		formats.append(format)
+		offsets.append(offset)
+		offset += size if count is None else stride * count
+		struct_alignment = max(struct_alignment, alignment)
+
+	if packing == 'std140':
+		struct_alignment = round_up(struct_alignment, 16)
+
+	itemsize = round_up(offset, struct_alignment)
+	return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': itemsize}), struct_alignment
+
+def block_dtype(layout, prefix='', base=0, itemsize=None):
+	"""
+	Build the numpy structured type of a uniform block from the layout the driver reported (Shader.get_block_layout)
+
+	Arguments:
+		layout - the block's BlockLayout
+		prefix, base, itemsize - used when building the type of a struct within the block
+	"""
+	members = layout.members
+	names, formats, offsets = [], [], []
+
+	for path, member in members.items():
+		if not path.startswith(prefix):
+			continue
+		name = path[len(prefix):]
+		if '.' in name or '[' in name:
+			continue
+
+		if member.type is not None:
+			count = member.count if member.array_stride else None
+			format = variable_format(gl_type_names[member.type], count, member.array_stride, member.matrix_stride, member.row_major)
+		elif path + '[0]' in members:
+			first = members[path + '[0]']
+			stride = member.array_stride or first.size
+			element = block_dtype(layout, path + '[0].', first.offset, stride)
+			format = np.dtype((element, (member.count,)))
+		else:
+			format = block_dtype(layout, path + '.', member.offset, member.size)
+
+		names.append(name)
+		formats.append(format)
+		offsets.append(member.offset - base)
+
+	return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': layout.size if itemsize is None else itemsize})
+
+def packed_view(data, dtype, offset=0):
+	" A structured view of the bytes of data (a numpy byte array), writing to it writes to data"
+	return np.ndarray((), dtype, buffer=data, offset=offset)
+
+def packed_field(view, path):
+	"""
+	A view of one variable of a packed block with the padding left out, ready for a numpy assignment.
+	Arrays of structs are views of shape [count], so packed_field(block, 'lights.color') is an [N, 3] array
+
+	Arguments:
+		view - a packed_view or field of one
+		path - the names of the variable and of the structs it is in, separated by dots (string)
+	"""
+	for name in path.split('.'):
+		view = view[name]
+		if view.dtype.names == (PADDED,):
+			view = view[PADDED]
+	return view
+
+def pad_array(values, components, stride, dtype=np.float32):
+	"""
+	Copy an array of N elements of components values each into an [N, stride] array, zero filling the rest of
+	every row, in one assignment
+
+	Arguments:
+		values - the elements (an [N, components] array or anything that reshapes to one)
+		components - the number of values in one element (integer)
+		stride - the number of values from one element to the next, padding included (integer)
+		dtype - the numpy type of the result
+	"""
+	values = np.asarray(values, dtype=dtype).reshape(-1, components)
+	if stride == components:
+		return values
+	out = np.zeros((len(values), stride), dtype=dtype)
+	out[:, :components] = values
+	return out
+
+def view_byte_range(data, view):
+	" The (start, end) byte range a view covers within data, the byte array it is a view of"
+	start = view.__array_interface__['data'][0] - data.__array_interface__['data'][0]
+	return start, start + view.itemsize + sum((n - 1) * stride for n, stride in zip(view.shape, view.strides))
+
+def merge_ranges(ranges, gap=0):
+	" Sort (start, end) ranges and merge those that overlap or are less than gap apart, returns a list of [start, end]"
+	merged = []
+	for start, end in sorted(ranges):
+		if merged and start <= merged[-1][1] + gap:
+			merged[-1][1] = max(merged[-1][1], end)
+		else:
+			merged.append([start, end])
+	return merged
@@ -0,0 +1,155 @@
+from OpenGL.GL import *
+import numpy as np
+import mach
+
+# Layout of the 64 bit sort keys, from the most significant bits down
+#   opaque:      layer (8) | translucent = 0 (1) | shader (12) | texture set (15) | depth (28, front to back)
+#   translucent: layer (8) | translucent = 1 (1) | depth (28, back to front) | shader (12) | texture set (15)
+KEY_LAYER_BITS = 8
+KEY_SHADER_BITS = 12
+KEY_TEXTURE_BITS = 15
+KEY_DEPTH_BITS = 28
+
+KEY_TRANSLUCENT_SHIFT = KEY_SHADER_BITS + KEY_TEXTURE_BITS + KEY_DEPTH_BITS
+KEY_LAYER_SHIFT = KEY_TRANSLUCENT_SHIFT + 1
+KEY_DEPTH_MAX = (1 << KEY_DEPTH_BITS) - 1
+
+def key_id(ids, key, bits, kind):
+	" The small id given to a shader or texture set, raises once there are more of them than fit in their bits of the key"
+	index = ids.get(key)
+	if index is None:
+		index = len(ids)
+		if index >> bits:
+			raise ValueError("Cannot sort more than %d %s in one frame of a RenderQueue" % (1 << bits, kind))
+		ids[key] = index
+	return index
+
+class RenderQueue:
+	"""
+	Collects draw submissions for a frame, sorts them by a 64 bit key (layer, translucency, shader, texture set, depth)
+	and draws them with as few state changes as possible.
+
+	Layers are drawn in increasing order. Within a layer opaque objects are grouped by shader and textures and drawn
+	front to back, then translucent objects are drawn back to front with depth writes turned off.
+
+	Statistics for the last call to execute are kept in draws, shader_changes and texture_changes
+	"""
+	def __init__(self):
+		self.clear()
+
+		self.draws = 0
+		self.shader_changes = 0
+		self.texture_changes = 0
+
+	def clear(self):
+		" Empty the queue without drawing"
+		self.objects = []
+		self.instances = []
+		self.depths = []
+		self.layers = []
+		self.translucent = []
+		self.shaders = []
+		self.texture_sets = []
+
+		# Shaders and texture sets are given small ids the first time they are seen in a frame, ids only have to be
+		# unique within one sort, and texture ids can be reused once the texture cache deletes a texture
+		self.shader_ids = {}
+		self.texture_set_ids = {}
+
+	def submit(self, obj, depth=0, layer=0, translucent=False, instances=None):
+		"""
+		Queue an object to be drawn this frame
+
+		Arguments:
+			obj - the MachObject to draw
+			depth - the distance from the camera, used to order draws within a layer (float)
+			layer - objects in lower layers are drawn first (integer between 0 and 255)
+			translucent - the object needs to be blended over what is behind it (boolean)
+			instances - draw this many instances with draw_instanced instead of a single draw (integer)
+		"""
+		if not 0 <= layer < 1 << KEY_LAYER_BITS:
+			raise ValueError("layer must be between 0 and %d, not %r" % ((1 << KEY_LAYER_BITS) - 1, layer))
+
+		shader = key_id(self.shader_ids, obj.shader, KEY_SHADER_BITS, 'shaders')
+
+		texture_set = tuple(sorted(obj.images.values()))
+		texture_set = key_id(self.texture_set_ids, texture_set, KEY_TEXTURE_BITS, 'texture sets')
+
+		self.objects.append(obj)
+		self.instances.append(instances)
+		self.depths.append(depth)
+		self.layers.append(layer)
+		self.translucent.append(translucent)
+		self.shaders.append(shader)
+		self.texture_sets.append(texture_set)
+
+	def build_keys(self):
+		" Build the sort key of every submission, returns a uint64 array"
+		depths = np.array(self.depths, dtype=np.float64)
+		layers = np.array(self.layers, dtype=np.uint64)
+		translucent = np.array(self.translucent, dtype=np.bool_)
+		shaders = np.array(self.shaders, dtype=np.uint64)
+		texture_sets = np.array(self.texture_sets, dtype=np.uint64)
+
+		# Quantize the depths of this frame onto the bits available
+		near, far = depths.min(), depths.max()
+		scale = KEY_DEPTH_MAX / (far - near) if far > near else 0
+		quantized = ((depths - near) * scale).astype(np.uint64)
+		inverted = np.uint64(KEY_DEPTH_MAX) - quantized
+
+		keys = layers << np.uint64(KEY_LAYER_SHIFT)
+		keys |= translucent.astype(np.uint64) << np.uint64(KEY_TRANSLUCENT_SHIFT)
+
+		opaque_keys = (shaders << np.uint64(KEY_TEXTURE_BITS + KEY_DEPTH_BITS)) | (texture_sets << np.uint64(KEY_DEPTH_BITS)) | quantized
+		translucent_keys = (inverted << np.uint64(KEY_SHADER_BITS + KEY_TEXTURE_BITS)) | (shaders << np.uint64(KEY_TEXTURE_BITS)) | texture_sets
+		keys |= np.where(translucent, translucent_keys, opaque_keys)
+
+		return keys
+
+	def execute(self):
+		" Draw everything in the queue in sorted order and empty it"
+		self.draws = 0
+		self.shader_changes = 0
+		self.texture_changes = 0
+
+		if len(self.objects) == 0:
+			return
+
+		order = np.argsort(self.build_keys(), kind='stable')
+
+		current_shader = None
+		current_texture_set = None
+		depth_writes = True
+
+		for i in order:
+			obj = self.objects[i]
+
+			if obj.shader is not current_shader:
+				obj.shader.bind()
+				current_shader = obj.shader
+				self.shader_changes += 1
+
+				# The shader's own images may have replaced the object's on a texture unit
+				current_texture_set = None
+
+			# Translucent objects are depth tested but must not hide what is drawn behind them later
+			if self.translucent[i] == depth_writes:
+				depth_writes = not depth_writes
+				mach.gl_state.depth_mask(depth_writes)
+
+			same_textures = self.texture_sets[i] == current_texture_set
+			if not same_textures:
+				current_texture_set = self.texture_sets[i]
+				self.texture_changes += 1
+
+			obj.bind(skip_images=same_textures)
+			if self.instances[i] is None:
+				obj.draw()
+			else:
+				obj.draw_instanced(self.instances[i])
+			self.draws += 1
+
+		if not depth_writes:
+			mach.gl_state.depth_mask(True)
+
+		self.clear()
@@ -5,6 +5,8 @@ from PIL import Image
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
+import mach
+
 possibleErrors = {
 	GL_FRAMEBUFFER_INCOMPLETE_ATTACHMENT : 'Incomplete Attachment',
 	# GL_FRAMEBUFFER_INCOMPLETE_DIMENSIONS : 'Incomplete Dimensions',
@@ -29,10 +31,10 @@ class Texture:
 
 		self.buf = GLuint(0)
 		glGenFramebuffers(1, self.buf)
-		glBindFramebuffer(GL_FRAMEBUFFER, self.buf)
+		mach.gl_state.bind_framebuffer(self.buf)
 
 		self.rendered_texture = glGenTextures(1)
-		glBindTexture(GL_TEXTURE_2D, self.rendered_texture)
+		mach.gl_state.bind_texture(self.rendered_texture)
 		glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
 
 		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
@@ -46,8 +48,8 @@ class Texture:
 
 	def bind(self):
 		" Binds this texture so that it may be rendered to"
-		glBindFramebuffer(GL_FRAMEBUFFER, self.buf)
-		glViewport(0, 0, self.width, self.height)
+		mach.gl_state.bind_framebuffer(self.buf)
+		mach.gl_state.viewport(0, 0, self.width, self.height)
 
 	def save(self, path):
 		"""
@@ -89,10 +91,10 @@ class DepthTexture:
 
 		self.buf = GLuint(0)
 		glGenFramebuffers(1, self.buf)
-		glBindFramebuffer(GL_FRAMEBUFFER, self.buf)
+		mach.gl_state.bind_framebuffer(self.buf)
 
 		self.rendered_texture = glGenTextures(1)
-		glBindTexture(GL_TEXTURE_2D, self.rendered_texture)
+		mach.gl_state.bind_texture(self.rendered_texture)
 		glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT24, self.width, self.height, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
 
 		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
@@ -106,8 +108,8 @@ class DepthTexture:
 
 	def bind(self):
 		" Binds this texture so that it may be rendered to"
-		glBindFramebuffer(GL_FRAMEBUFFER, self.buf)
-		glViewport(0, 0, self.width, self.height)
+		mach.gl_state.bind_framebuffer(self.buf)
+		mach.gl_state.viewport(0, 0, self.width, self.height)
 
 	def save(self, path):
 		"""
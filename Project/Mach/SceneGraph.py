@@ -0,0 +1,226 @@
+import numpy as np
+import mach
+
+class SceneGraph:
+	"""
+	A hierarchy of transforms kept in numpy arrays, one row per node, so world matrices are computed a whole level
+	of the hierarchy at a time.
+
+	Nodes are integer handles into the arrays. Changing a node's position, rotation or scale marks it dirty, and update
+	recomputes the local matrices of dirty nodes and the world matrices of dirty nodes and everything below them,
+	with one batched multiply per level. Matrices use the same row by row layout as mach.ModelMatrices
+
+	Statistics for the last call to update are kept in recomputed (world matrices) and locals_recomputed
+
+	Arguments:
+		capacity - the number of nodes to preallocate room for, the graph grows if more are added (integer)
+	"""
+	def __init__(self, capacity=1024):
+		self.capacity = 0
+		self.count = 0
+		self.free = []
+		self.reserve(capacity)
+
+		# Index arrays of the live nodes at every depth, rebuilt when the hierarchy changes
+		self.levels = []
+		self.structure_changed = False
+
+		self.recomputed = 0
+		self.locals_recomputed = 0
+
+	def reserve(self, capacity):
+		" Grow the node arrays so they can hold at least capacity nodes"
+		if capacity <= self.capacity:
+			return
+
+		capacity = max(capacity, self.capacity * 2)
+		count = self.count
+
+		def grow(name, shape, dtype, fill=0):
+			new = np.full(shape, fill, dtype=dtype)
+			if count > 0: new[:count] = getattr(self, name)[:count]
+			setattr(self, name, new)
+
+		grow('parents', capacity, np.int32, -1)
+		grow('alive', capacity, np.bool_, False)
+		grow('positions', (capacity, 3), np.float32)
+		grow('rotations', (capacity, 4), np.float32)
+		grow('scales', (capacity, 3), np.float32, 1)
+		grow('local', (capacity, 4, 4), np.float32)
+		grow('world', (capacity, 4, 4), np.float32)
+		grow('local_dirty', capacity, np.bool_, False)
+
+		self.capacity = capacity
+
+	def add_node(self, parent=-1, position=(0, 0, 0), rotation=(1, 0, 0, 0), scale=(1, 1, 1)):
+		"""
+		Add a node, returns its handle
+
+		Arguments:
+			parent - the handle of a live parent node, or -1 for a root (integer)
+			position - the position relative to the parent (iterable of size 3)
+			rotation - the rotation relative to the parent as a quaternion (w, x, y, z) (iterable of size 4)
+			scale - the scale relative to the parent (iterable of size 3)
+		"""
+		self.check_parent(parent)
+
+		if self.free:
+			node = self.free.pop()
+		else:
+			self.reserve(self.count + 1)
+			node = self.count
+			self.count += 1
+
+		self.parents[node] = parent
+		self.alive[node] = True
+		self.positions[node] = position
+		self.rotations[node] = rotation
+		self.scales[node] = scale
+		self.local_dirty[node] = True
+		self.structure_changed = True
+		return node
+
+	def remove_node(self, node):
+		" Remove a node and everything below it, their handles may be given to new nodes"
+		self.check_node(node)
+		removed = self.subtree(node)
+		self.alive[removed] = False
+		self.parents[removed] = -1
+		self.local_dirty[removed] = False
+		self.world[removed] = 0
+		self.free.extend(removed.tolist())
+		self.structure_changed = True
+
+	def is_alive(self, node):
+		" Whether a handle belongs to a node that has not been removed"
+		return 0 <= node < self.count and bool(self.alive[node])
+
+	def check_node(self, node):
+		" Raise if node is not a live node, writing to a removed node's slot would change whatever node reuses it"
+		if not self.is_alive(node):
+			raise ValueError('%r is not a node in the graph, it may have been removed' % node)
+
+	def check_nodes(self, nodes):
+		" check_node for an array of handles"
+		nodes = np.asarray(nodes).reshape(-1)
+		valid = (nodes >= 0) & (nodes < self.count)
+		valid[valid] = self.alive[nodes[valid]]
+		if not valid.all():
+			raise ValueError('%s are not nodes in the graph, they may have been removed' % nodes[~valid])
+
+	def check_parent(self, parent):
+		" Raise if parent is neither -1 nor a live node, a node below it would never get a world matrix"
+		if parent != -1 and not self.is_alive(parent):
+			raise ValueError('%r is not a node in the graph, it may have been removed' % parent)
+
+	def set_parent(self, node, parent):
+		" Move a node (and everything below it) under another parent, or make it a root with -1"
+		self.check_node(node)
+		self.check_parent(parent)
+		if parent != -1 and parent in self.subtree(node):
+			raise ValueError('a node cannot be moved below itself')
+		self.parents[node] = parent
+		self.local_dirty[node] = True
+		self.structure_changed = True
+
+	def subtree(self, node):
+		" Returns the handles of a node and everything below it"
+		nodes = [np.array([node])]
+		parents = self.parents[:self.count]
+		while True:
+			children = np.flatnonzero(np.isin(parents, nodes[-1]) & self.alive[:self.count])
+			if len(children) == 0:
+				return np.concatenate(nodes)
+			nodes.append(children)
+
+	def set_position(self, node, position):
+		" Move a node relative to its parent"
+		self.check_node(node)
+		self.positions[node] = position
+		self.local_dirty[node] = True
+
+	def set_rotation(self, node, rotation):
+		" Rotate a node relative to its parent, rotation is a quaternion (w, x, y, z)"
+		self.check_node(node)
+		self.rotations[node] = rotation
+		self.local_dirty[node] = True
+
+	def set_scale(self, node, scale):
+		" Scale a node relative to its parent"
+		self.check_node(node)
+		self.scales[node] = scale
+		self.local_dirty[node] = True
+
+	def set_transforms(self, nodes, positions=None, rotations=None, scales=None):
+		"""
+		Change the transforms of many nodes at once
+
+		Arguments:
+			nodes - the handles of the nodes (integer array)
+			positions - the new positions (N by 3 array, optional)
+			rotations - the new rotations as quaternions (w, x, y, z) (N by 4 array, optional)
+			scales - the new scales (N by 3 array, optional)
+		"""
+		self.check_nodes(nodes)
+		if positions is not None: self.positions[nodes] = positions
+		if rotations is not None: self.rotations[nodes] = rotations
+		if scales is not None: self.scales[nodes] = scales
+		self.local_dirty[nodes] = True
+
+	def build_levels(self):
+		" Sort the live nodes by their depth in the hierarchy"
+		n = self.count
+		parents = self.parents[:n]
+		alive = np.flatnonzero(self.alive[:n])
+
+		# Every pass finds the children of the last level
+		self.levels = []
+		level = alive[parents[alive] == -1]
+		while len(level) > 0:
+			self.levels.append(level)
+			level = alive[np.isin(parents[alive], level)]
+
+		self.structure_changed = False
+
+	def update(self):
+		" Recompute the local and world matrices that changed since the last update"
+		if self.structure_changed:
+			self.build_levels()
+
+		n = self.count
+		dirty = np.flatnonzero(self.local_dirty[:n])
+		self.locals_recomputed = len(dirty)
+		if len(dirty) > 0:
+			self.local[dirty] = mach.ModelMatrices(self.positions[dirty], self.rotations[dirty], self.scales[dirty])
+			self.local_dirty[dirty] = False
+
+		# A world matrix changes when the local matrix or the parent's world matrix changed
+		world_dirty = np.zeros(n, dtype=np.bool_)
+		world_dirty[dirty] = True
+		self.recomputed = 0
+
+		for depth, level in enumerate(self.levels):
+			if depth > 0:
+				world_dirty[level] |= world_dirty[self.parents[level]]
+			changed = level[world_dirty[level]]
+			if len(changed) == 0:
+				continue
+
+			if depth == 0:
+				self.world[changed] = self.local[changed]
+			else:
+				self.world[changed] = np.matmul(self.world[self.parents[changed]], self.local[changed])
+			self.recomputed += len(changed)
+
+	def get_world_matrices(self, column_major=False):
+		"""
+		Returns the world matrix of every node, indexed by handle. The row by row array is the graph's own storage
+		(upload it with transpose=True), column_major=True returns a copy laid out for instance attributes
+
+		Arguments:
+			column_major - lay every matrix out column by column (boolean)
+		"""
+		world = self.world[:self.count]
+		if column_major:
+			return np.ascontiguousarray(world.transpose(0, 2, 1))
+		return world
@@ -2,12 +2,156 @@
 from ctypes import c_int, byref, create_string_buffer
 from OpenGL.GL import *
 from OpenGL.GL.shaders import *
+from OpenGL.error import NullFunctionError
+import numpy as np
 import sys
 import re
 
 import mach
 
-class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
+# The (rows, columns) of every uniform type a block member can have
+uniform_type_shapes = {
+	GL_FLOAT: (1, 1), GL_FLOAT_VEC2: (2, 1), GL_FLOAT_VEC3: (3, 1), GL_FLOAT_VEC4: (4, 1),
+	GL_INT: (1, 1), GL_INT_VEC2: (2, 1), GL_INT_VEC3: (3, 1), GL_INT_VEC4: (4, 1),
+	GL_UNSIGNED_INT: (1, 1), GL_UNSIGNED_INT_VEC2: (2, 1), GL_UNSIGNED_INT_VEC3: (3, 1), GL_UNSIGNED_INT_VEC4: (4, 1),
+	GL_BOOL: (1, 1), GL_BOOL_VEC2: (2, 1), GL_BOOL_VEC3: (3, 1), GL_BOOL_VEC4: (4, 1),
+	GL_FLOAT_MAT2: (2, 2), GL_FLOAT_MAT3: (3, 3), GL_FLOAT_MAT4: (4, 4),
+	GL_FLOAT_MAT2x3: (3, 2), GL_FLOAT_MAT2x4: (4, 2), GL_FLOAT_MAT3x2: (2, 3),
+	GL_FLOAT_MAT3x4: (4, 3), GL_FLOAT_MAT4x2: (2, 4), GL_FLOAT_MAT4x3: (3, 4)
+}
+
+# Layouts read from linked programs, by shader source, so compiling the same source again skips the queries
+block_layout_cache = {}
+
+class BlockMember:
+	"""
+	Where a variable is stored within a uniform block
+
+	Arguments:
+		offset - the byte offset from the start of the block (integer)
+		size - the number of bytes the variable covers, every element and its padding for arrays (integer)
+		count - the number of array elements, 1 when it is not an array (integer)
+		type - the GL type such as GL_FLOAT_VEC3, None for structs and for layouts read from the source
+		array_stride - the number of bytes from one array element to the next, 0 when it is not an array (integer)
+		matrix_stride - the number of bytes from one matrix column to the next (or row when row major), 0 when it is not a matrix (integer)
+		row_major - whether the matrix is stored row by row (boolean)
+	"""
+	def __init__(self, offset, size, count=1, type=None, array_stride=0, matrix_stride=0, row_major=False):
+		self.offset = offset
+		self.size = size
+		self.count = count
+		self.type = type
+		self.array_stride = array_stride
+		self.matrix_stride = matrix_stride
+		self.row_major = row_major
+
+	def __repr__(self):
+		return str((self.offset, self.size))
+
+class BlockLayout:
+	"""
+	The layout of one uniform block as the driver laid it out
+
+	Arguments:
+		name - the name of the block (string)
+		index - the index of the block within the program (integer)
+		size - the size of the block's buffer in bytes (integer)
+		members - a BlockMember for every variable by its name within the block (dictionary). Arrays are listed by
+			their name without brackets, struct members by their full path (lights[1].color) along with every struct
+			and struct array element on the way (lights, lights[1])
+	"""
+	def __init__(self, name, index, size, members):
+		self.name = name
+		self.index = index
+		self.size = size
+		self.members = members
+
+def add_struct_members(members):
+	" Add a member covering every struct and struct array element, from the members inside them"
+	structs = {}
+	for name, member in list(members.items()):
+		for split in re.finditer(r'[\[.]', name):
+			path = name[:split.start()]
+			start, end = structs.get(path, (member.offset, member.offset + member.size))
+			structs[path] = (min(start, member.offset), max(end, member.offset + member.size))
+
+	for path, (start, end) in structs.items():
+		members[path] = BlockMember(start, end - start)
+
+	# Arrays of structs get their element count and stride from their first two elements
+	for path in structs:
+		element = re.match(r'(.*)\[(\d+)\]$', path)
+		if element is None:
+			continue
+		array = members[element.group(1)]
+		array.count = max(array.count, int(element.group(2)) + 1)
+
+	for path, array in members.items():
+		if array.type is None and path + '[1]' in members:
+			array.array_stride = members[path + '[1]'].offset - members[path + '[0]'].offset
+			array.size = array.count * array.array_stride
+
+def read_uniform_block_layouts(program):
+	" Ask the driver how every uniform block of a linked program is laid out, returns a BlockLayout by block name"
+	layouts = {}
+	value = c_int(0)
+	glGetProgramiv(program, GL_ACTIVE_UNIFORM_BLOCKS, byref(value))
+
+	for block in range(value.value):
+		glGetActiveUniformBlockiv(program, block, GL_UNIFORM_BLOCK_NAME_LENGTH, byref(value))
+		name = create_string_buffer(value.value)
+		glGetActiveUniformBlockName(program, block, value.value, None, name)
+		name = name.value.decode()
+
+		glGetActiveUniformBlockiv(program, block, GL_UNIFORM_BLOCK_DATA_SIZE, byref(value))
+		size = value.value
+
+		glGetActiveUniformBlockiv(program, block, GL_UNIFORM_BLOCK_ACTIVE_UNIFORMS, byref(value))
+		count = value.value
+		indices = np.zeros(count, dtype=np.int32)
+		if count > 0:
+			glGetActiveUniformBlockiv(program, block, GL_UNIFORM_BLOCK_ACTIVE_UNIFORM_INDICES, indices)
+
+		# One query per property covers every variable in the block
+		properties = {}
+		for pname in (GL_UNIFORM_OFFSET, GL_UNIFORM_SIZE, GL_UNIFORM_TYPE, GL_UNIFORM_ARRAY_STRIDE, GL_UNIFORM_MATRIX_STRIDE, GL_UNIFORM_IS_ROW_MAJOR, GL_UNIFORM_NAME_LENGTH):
+			properties[pname] = np.zeros(count, dtype=np.int32)
+			if count > 0:
+				glGetActiveUniformsiv(program, count, indices, pname, properties[pname])
+
+		members = {}
+		for i, index in enumerate(indices.tolist()):
+			member_name = create_string_buffer(int(properties[GL_UNIFORM_NAME_LENGTH][i]))
+			glGetActiveUniformName(program, index, len(member_name), None, member_name)
+			member_name = member_name.value.decode()
+
+			# Members of blocks with an instance name are reported as Block.member, and arrays as name[0]
+			if member_name.startswith(name + '.'):
+				member_name = member_name[len(name) + 1:]
+			is_array = member_name.endswith('[0]')
+			if is_array:
+				member_name = member_name[:-3]
+
+			offset, elements, type, array_stride, matrix_stride, row_major = [int(properties[pname][i]) for pname in (
+				GL_UNIFORM_OFFSET, GL_UNIFORM_SIZE, GL_UNIFORM_TYPE, GL_UNIFORM_ARRAY_STRIDE, GL_UNIFORM_MATRIX_STRIDE, GL_UNIFORM_IS_ROW_MAJOR
+			)]
+
+			rows, columns = uniform_type_shapes.get(type, (1, 1))
+			if is_array:
+				member_size = elements * array_stride
+			elif columns > 1:
+				member_size = (rows if row_major else columns) * matrix_stride
+			else:
+				member_size = rows * 4
+
+			members[member_name] = BlockMember(offset, member_size, elements, type, array_stride, matrix_stride, bool(row_major))
+
+		add_struct_members(members)
+		layouts[name] = BlockLayout(name, block, size, members)
+
+	return layouts
+
+class Shader(mach.UniformBlockStorage, mach.StorageBufferStorage, mach.UniformStorage, mach.ImageStorage):
 	"""
 	Manages the creation, usage, and information of variables within a vertex shader and fragment shader
 
@@ -39,34 +183,41 @@ class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
 		vert - a string representing the vertex shader source
 		geom - a string representing the geometry shader source (optional)
 		frag - a string representing the fragment shader source
+		from_source - vert, geom and frag are the source code itself rather than paths to it (boolean)
 	"""
 
 	# vert, frag and geom take arrays of source strings
 	# the arrays will be concattenated into one string by OpenGL
-	def __init__(self, *args):
+	def __init__(self, *args, from_source=False):
 		mach.UniformBlockStorage.__init__(self)
+		mach.StorageBufferStorage.__init__(self)
 		mach.UniformStorage.__init__(self)
 		mach.ImageStorage.__init__(self)
 
+		install = self.install_shader_sources if from_source else self.install_shaders
 		if len(args) == 2:
-			self.install_shaders(args[0], args[1])
+			install(args[0], args[1])
 		else:
-			self.install_shaders(args[0], args[2], geom=args[1])
+			install(args[0], args[2], geom=args[1])
 
 	def install_shaders(self, vert, frag, geom=None):
 		" Initialization with geometry shader"
+		vert = open(vert, 'r').read()
+		if geom is not None: geom = open(geom, 'r').read()
+		frag = open(frag, 'r').read()
+
+		self.install_shader_sources(vert, frag, geom)
+
+	def install_shader_sources(self, vert, frag, geom=None):
+		" Compile and link shader source code that has already been read"
 		# we are not linked yet
 		self.linked = False
 
 		self.VAO = glGenVertexArrays(1)
 
-		glBindVertexArray(self.VAO)
+		mach.gl_state.bind_vertex_array(self.VAO)
 
 		try:
-			vert = open(vert, 'r').read()
-			if geom is not None: geom = open(geom, 'r').read()
-			frag = open(frag, 'r').read()
-
 			VERTEX_SHADER = compileShader(vert, GL_VERTEX_SHADER)
 			if geom is not None: GEOM_SHADER = compileShader(geom, GL_GEOMETRY_SHADER)
 			FRAGMENT_SHADER = compileShader(frag, GL_FRAGMENT_SHADER)
@@ -80,7 +231,7 @@ class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
 			self.link()
 
 			# Use this program
-			glUseProgram(self.shader)
+			mach.gl_state.use_program(self.shader)
 
 		except ShaderCompilationError as e:
 			compile_failure_string = e.args[0].replace("b'", '\n')[:-1]
@@ -93,9 +244,32 @@ class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
 		# Empty uniform locations
 		self.uniform_locations = {}
 
-		self.get_uniform_blocks_and_structs(vert, geom, frag)
+		self.get_uniform_block_layouts(vert, geom, frag)
+
+	def get_uniform_block_layouts(self, vert, geom, frag):
+		"""
+		Read the layout of every uniform block from the linked program. When the driver cannot be asked, the layouts
+		are worked out from the source by get_uniform_blocks_and_structs instead
+		"""
+		self.sources = (vert, geom, frag)
+		self.parsed_sources = False
+
+		# A failed query is not cached, so a later Shader with the same source asks the driver again
+		self.block_layouts = block_layout_cache.get(self.sources)
+		if self.block_layouts is None:
+			try:
+				self.block_layouts = block_layout_cache[self.sources] = read_uniform_block_layouts(self.shader)
+			except (GLError, NullFunctionError):
+				self.block_layouts = None
+
+	def parse_sources(self):
+		" Work out uniform block and struct layouts from the source, only done when they are needed"
+		if not self.parsed_sources:
+			self.get_uniform_blocks_and_structs(*self.sources)
+			self.parsed_sources = True
 
 	def get_uniform_blocks_and_structs(self, vert, geom, frag):
+		" Work out uniform block and struct layouts by scanning the source, assuming std140 packing"
 		# Loop through the vertex, geometry, and fragment source and find all of the uniform blocks
 		if geom is not None: source_content = vert + geom + frag
 		else: source_content = vert + frag
@@ -271,29 +445,58 @@ class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
 			last_byte_count = 0
 
 	def get_uniform_index(self, name):
-		" Gets the order which this uniform block was created (0 if it was the first uniform block created, 1 if the second and so on)"
+		" Gets the index of a uniform block within the program (the order it was declared in when read from the source)"
+		if self.block_layouts is not None:
+			return self.block_layouts[name].index
+		self.parse_sources()
 		return self.uniform_indices[name]
 
+	def get_program(self):
+		" Get the OpenGL program id"
+		return self.shader
+
 	def get_uniform_location(self, name):
 		" Get the location of a uniform variable (name - the name of the uniform variable in glsl)"
 		if (name not in self.uniform_locations):
 			self.uniform_locations[name] = glGetUniformLocation(self.shader, name)
 		return self.uniform_locations[name]
 
+	def get_block_layout(self, blockname):
+		" Get the BlockLayout the driver reported for a uniform block, None when the layouts were read from the source"
+		if self.block_layouts is None:
+			return None
+		return self.block_layouts[blockname]
+
+	def get_block_member(self, blockname, name):
+		" Get the BlockMember of a variable within a uniform block (blockname - the name of the uniform block, name - the name of the variable)"
+		if self.block_layouts is not None:
+			return self.block_layouts[blockname].members[name]
+		self.parse_sources()
+		return BlockMember(*self._uniform_blocks[blockname][name])
+
 	def get_block_uniform_info(self, blockname, name):
 		" Get the offset and size of a variable within a uniform block (blockname - the name of the uniform block the variable is stored in, name - the name of the variable)"
+		if self.block_layouts is not None:
+			member = self.block_layouts[blockname].members[name]
+			return (member.offset, member.size)
+		self.parse_sources()
 		return self._uniform_blocks[blockname][name]
 
 	def get_struct_uniform_info(self, structname, name):
-		" Get the offset and size of a uniform struct"
+		" Get the offset and size of a uniform struct, as worked out from the source"
+		self.parse_sources()
 		return self.glsl_structs[structname][name]
 
 	def get_struct_size(self, structname):
-		" Get the size of a uniform struct (structname - the name of the struct object (not the variable name))"
+		" Get the size of a uniform struct as worked out from the source (structname - the name of the struct object (not the variable name))"
+		self.parse_sources()
 		return self.data_type_to_byte_count[structname]
 
 	def get_uniform_block_size(self, blockname):
 		" Get the size of a uniform block (blockname - the name of the uniform block)"
+		if self.block_layouts is not None:
+			return self.block_layouts[blockname].size
+		self.parse_sources()
 		return self.uniform_block_sizes[blockname]
 
 	def get_block_location(self, blockname):
@@ -307,16 +510,17 @@ class Shader(mach.UniformBlockStorage, mach.UniformStorage, mach.ImageStorage):
 		obj = mach.MachObject(self, drawType)
 		return obj
 
-	def bind(self, skipImages=False, skipUniforms=False, skipBlocks=False):
+	def bind(self, skipImages=False, skipUniforms=False, skipBlocks=False, skipBuffers=False):
 		" Bind the shader"
-		# bind the program
-		glUseProgram(self.shader)
-		glBindVertexArray(self.VAO)
+		# bind the program, the state cache skips this if it is already bound
+		mach.gl_state.use_program(self.shader)
+		mach.gl_state.bind_vertex_array(self.VAO)
 
 		# Bind any images that
 		if not skipImages:		self.bind_images()
 		if not skipUniforms:	self.bind_uniforms()
 		if not skipBlocks:		self.bind_uniform_blocks()
+		if not skipBuffers:		self.bind_storage_buffers()
 
 	def link(self):
 		" Attempt to link the geometry, vertex, and fragment shaders"
@@ -0,0 +1,242 @@
+import numpy as np
+import mach
+
+def cell_keys(cx, cy):
+	" Pack integer cell coordinates into one sortable 64 bit key per cell"
+	return (cx.astype(np.int64) << 32) | (cy.astype(np.int64) & 0xffffffff)
+
+class SpatialHash:
+	"""
+	A uniform grid over 2D axis aligned boxes for point, rectangle, radius and picking queries.
+
+	Every object is listed once for every cell its box touches. The (cell key, object) entries are kept sorted by
+	key, so the objects in a cell are found with a binary search. Moving an object only touches the entries of
+	objects that moved into different cells, and re-sorting is deferred until the next query
+
+	Arguments:
+		cell_size - the width and height of a grid cell in world units, around the size of a typical object (float)
+		capacity - the number of objects to preallocate room for, the hash grows if more are inserted (integer)
+	"""
+	def __init__(self, cell_size, capacity=1024):
+		self.cell_size = float(cell_size)
+
+		self.capacity = 0
+		self.count = 0
+		self.free = []
+		self.reserve(capacity)
+
+		self.entry_keys = np.zeros(0, dtype=np.int64)
+		self.entry_ids = np.zeros(0, dtype=np.int32)
+		self.needs_sort = False
+
+		# The range of cells (x0, y0, x1, y1) that may hold entries, queries never look outside of it
+		self.occupied = np.array([np.inf, np.inf, -np.inf, -np.inf])
+
+	def reserve(self, capacity):
+		" Grow the object arrays so they can hold at least capacity objects"
+		if capacity <= self.capacity:
+			return
+
+		capacity = max(capacity, self.capacity * 2)
+		count = self.count
+
+		def grow(name, shape, dtype, fill=0):
+			new = np.full(shape, fill, dtype=dtype)
+			if count > 0: new[:count] = getattr(self, name)[:count]
+			setattr(self, name, new)
+
+		grow('mins', (capacity, 2), np.float32)
+		grow('maxs', (capacity, 2), np.float32)
+		grow('cells', (capacity, 4), np.int32)
+		grow('alive', capacity, np.bool_, False)
+
+		self.capacity = capacity
+
+	def cell_ranges(self, mins, maxs):
+		" The first and last cell (x0, y0, x1, y1) touched by every box"
+		return np.concatenate((
+			np.floor(mins / self.cell_size),
+			np.floor(maxs / self.cell_size)
+		), axis=1).astype(np.int32)
+
+	def make_entries(self, ids, cells):
+		" Build the (cell key, object) entries of objects touching the given cell ranges"
+		widths = cells[:, 2] - cells[:, 0] + 1
+		heights = cells[:, 3] - cells[:, 1] + 1
+		counts = widths * heights
+
+		entry_ids = np.repeat(ids, counts)
+		starts = np.cumsum(counts) - counts
+		within = np.arange(counts.sum()) - np.repeat(starts, counts)
+
+		cx = np.repeat(cells[:, 0], counts) + within % np.repeat(widths, counts)
+		cy = np.repeat(cells[:, 1], counts) + within // np.repeat(widths, counts)
+		return cell_keys(cx, cy), entry_ids.astype(np.int32)
+
+	def add_entries(self, ids, cells):
+		if len(cells) == 0:
+			return
+		self.occupied[:2] = np.minimum(self.occupied[:2], cells[:, :2].min(axis=0))
+		self.occupied[2:] = np.maximum(self.occupied[2:], cells[:, 2:].max(axis=0))
+
+		keys, entry_ids = self.make_entries(ids, cells)
+		self.entry_keys = np.concatenate((self.entry_keys, keys))
+		self.entry_ids = np.concatenate((self.entry_ids, entry_ids))
+		self.needs_sort = True
+
+	def remove_entries(self, ids):
+		keep = ~np.isin(self.entry_ids, ids)
+		self.entry_keys = self.entry_keys[keep]
+		self.entry_ids = self.entry_ids[keep]
+		if len(self.entry_keys) == 0:
+			self.occupied[:] = np.inf, np.inf, -np.inf, -np.inf
+
+	def check_alive(self, ids):
+		" Raise if any of the ids is not a box in the hash, a removed box would otherwise be listed again"
+		ids = np.asarray(ids, dtype=np.int32).reshape(-1)
+		valid = (ids >= 0) & (ids < self.count)
+		valid[valid] = self.alive[ids[valid]]
+		if not valid.all():
+			raise ValueError('ids %s are not boxes in the hash, they may have been removed' % ids[~valid])
+		return ids
+
+	def insert(self, mins, maxs):
+		"""
+		Add many boxes at once, returns their ids
+
+		Arguments:
+			mins - the lower left corner of every box (N by 2 array)
+			maxs - the upper right corner of every box (N by 2 array)
+		"""
+		mins = np.asarray(mins, dtype=np.float32).reshape(-1, 2)
+		maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 2)
+		n = len(mins)
+
+		reused = self.free[:n]
+		self.free = self.free[n:]
+		new = n - len(reused)
+		self.reserve(self.count + new)
+		ids = np.concatenate((np.array(reused, dtype=np.int32), np.arange(self.count, self.count + new, dtype=np.int32)))
+		self.count += new
+
+		self.mins[ids] = mins
+		self.maxs[ids] = maxs
+		self.cells[ids] = self.cell_ranges(mins, maxs)
+		self.alive[ids] = True
+		self.add_entries(ids, self.cells[ids])
+		return ids
+
+	def update(self, ids, mins, maxs):
+		"""
+		Move many boxes at once, only boxes that moved into different cells have their entries rebuilt
+
+		Arguments:
+			ids - the ids returned from insert (integer array)
+			mins - the new lower left corners (N by 2 array)
+			maxs - the new upper right corners (N by 2 array)
+		"""
+		ids = self.check_alive(ids)
+		mins = np.asarray(mins, dtype=np.float32).reshape(-1, 2)
+		maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 2)
+
+		cells = self.cell_ranges(mins, maxs)
+		moved = (cells != self.cells[ids]).any(axis=1)
+
+		self.mins[ids] = mins
+		self.maxs[ids] = maxs
+		self.cells[ids] = cells
+
+		if moved.any():
+			self.remove_entries(ids[moved])
+			self.add_entries(ids[moved], cells[moved])
+
+	def remove(self, ids):
+		" Remove boxes, their ids may be given to boxes inserted later"
+		ids = self.check_alive(ids)
+		self.remove_entries(ids)
+		self.alive[ids] = False
+		self.free.extend(ids.tolist())
+
+	def sort(self):
+		if not self.needs_sort:
+			return
+		order = np.argsort(self.entry_keys, kind='stable')
+		self.entry_keys = self.entry_keys[order]
+		self.entry_ids = self.entry_ids[order]
+		self.needs_sort = False
+
+	def candidates(self, minimum, maximum):
+		" The ids of every box listed in a cell touched by the rectangle, unfiltered and without duplicates"
+		self.sort()
+
+		# Only occupied cells can hold a box, so a huge rectangle costs no more than one around everything
+		cells = np.concatenate((np.floor(np.float32(minimum) / self.cell_size), np.floor(np.float32(maximum) / self.cell_size)))
+		cells = np.concatenate((np.maximum(cells[:2], self.occupied[:2]), np.minimum(cells[2:], self.occupied[2:])))
+		if (cells[:2] > cells[2:]).any():
+			return np.zeros(0, dtype=np.int32)
+
+		# With more cells to look up than entries it is cheaper to take every box and let the caller filter them
+		cells = cells.astype(np.int64)
+		if (cells[2] - cells[0] + 1) * (cells[3] - cells[1] + 1) > len(self.entry_ids):
+			return np.unique(self.entry_ids)
+
+		cx, cy = np.meshgrid(np.arange(cells[0], cells[2] + 1), np.arange(cells[1], cells[3] + 1))
+		keys = cell_keys(cx.reshape(-1), cy.reshape(-1))
+
+		starts = np.searchsorted(self.entry_keys, keys, side='left')
+		ends = np.searchsorted(self.entry_keys, keys, side='right')
+		lengths = ends - starts
+		total = lengths.sum()
+		if total == 0:
+			return np.zeros(0, dtype=np.int32)
+
+		# Concatenate every [start, end) range of entries without a Python loop
+		offsets = np.cumsum(lengths) - lengths
+		entries = np.repeat(starts - offsets, lengths) + np.arange(total)
+		return np.unique(self.entry_ids[entries])
+
+	def query_rect(self, minimum, maximum):
+		"""
+		Returns the ids of the boxes overlapping a rectangle
+
+		Arguments:
+			minimum - the lower left corner of the rectangle (iterable of size 2)
+			maximum - the upper right corner of the rectangle (iterable of size 2)
+		"""
+		minimum = np.float32(minimum)
+		maximum = np.float32(maximum)
+		ids = self.candidates(minimum, maximum)
+		overlap = (self.mins[ids] <= maximum).all(axis=1) & (self.maxs[ids] >= minimum).all(axis=1)
+		return ids[overlap]
+
+	def query_point(self, point):
+		" Returns the ids of the boxes containing a point"
+		return self.query_rect(point, point)
+
+	def query_radius(self, center, radius):
+		"""
+		Returns the ids of the boxes within radius of a point
+
+		Arguments:
+			center - the center of the circle (iterable of size 2)
+			radius - the radius of the circle (float)
+		"""
+		center = np.float32(center)
+		ids = self.candidates(center - radius, center + radius)
+
+		# Distance from the center to the closest point of every box
+		closest = np.clip(center, self.mins[ids], self.maxs[ids])
+		inside = ((closest - center) ** 2).sum(axis=1) <= radius * radius
+		return ids[inside]
+
+	def pick(self, mouse_pos, window_size, projection, view=None):
+		"""
+		Returns the ids of the boxes under the mouse
+
+		Arguments:
+			mouse_pos - the mouse position in pixels from the top left of the window (Window.get_mouse_pos)
+			window_size - the size of the window in pixels (Window.get_window_size)
+			projection - the projection matrix, or a camera with a mat attribute (OrthographicCamera)
+			view - the view matrix (optional)
+		"""
+		return self.query_point(mach.screen_to_world(mouse_pos, window_size, projection, view)[:2])
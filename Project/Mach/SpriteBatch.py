@@ -0,0 +1,265 @@
+from OpenGL.GL import *
+from ctypes import c_void_p
+import numpy as np
+import mach
+import mach.TextureAtlas
+
+# Each vertex is position (x, y, depth), texture coordinate (u, v) and tint (r, g, b, a)
+SPRITE_VERTEX_FLOATS = 9
+SPRITE_VERTEX_BYTES = SPRITE_VERTEX_FLOATS * 4
+
+# Quad corners relative to the sprite's bottom left, in the order bottom left, bottom right, top right, top left
+SPRITE_QUAD_CORNERS = np.array([
+	[0, 0],
+	[1, 0],
+	[1, 1],
+	[0, 1]
+], dtype=np.float32)
+
+# The same corners within the sprite's atlas image, where y grows downwards
+SPRITE_ATLAS_CORNERS = np.array([
+	[0, 1],
+	[1, 1],
+	[1, 0],
+	[0, 0]
+], dtype=np.float32)
+
+SPRITE_QUAD_INDICES = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+
+class SpriteBatch(mach.UniformStorage, mach.ImageStorage):
+	"""
+	Draws large numbers of sprites from one or more texture atlases with a single draw call per texture.
+	Sprites are submitted every frame, expanded into quads with numpy, sorted back to front and streamed
+	into one dynamic vertex buffer.
+
+	The shader must take the position at location 0 (vec3), the texture coordinate at location 1 (vec2)
+	and the tint at location 2 (vec4), see resources/spritebatchvert.glsl and resources/spritebatchfrag.glsl
+
+	Arguments:
+		shader - the shader object the sprites are drawn with
+		capacity - the number of sprites to preallocate room for, the batch grows if more are submitted (integer)
+		units_per_pixel - the size of one atlas pixel in world units when the scale is 1 (float)
+		active_texture - the texture unit the atlases are bound to while drawing (integer)
+		group_atlases - sort by atlas before depth so every atlas is one draw call, depth order is then only kept
+						within an atlas (boolean)
+	"""
+	def __init__(self, shader, capacity=4096, units_per_pixel=1, active_texture=0, group_atlases=True):
+		mach.UniformStorage.__init__(self)
+		mach.ImageStorage.__init__(self)
+
+		self.shader = shader
+		self.units_per_pixel = units_per_pixel
+		self.active_texture = active_texture
+		self.group_atlases = group_atlases
+
+		# Every atlas is drawn through the one sampler, bound to active_texture before each draw call
+		self.store_int('atlas', [active_texture])
+
+		# Per atlas texture ids and the offset of the atlas within the sprite tables
+		self.textures = []
+		self.atlas_offsets = np.zeros(0, dtype=np.int32)
+
+		# The sprite tables (see mach.TextureAtlas.parse_table) of every atlas, one after the other
+		self.sprite_table = np.zeros((0, mach.TextureAtlas.TABLE_COLUMNS), dtype=np.float32)
+
+		self.VBO = glGenBuffers(1)
+		self.IBO = glGenBuffers(1)
+		self.buffer_capacity = 0
+
+		self.capacity = 0
+		self.count = 0
+		self.reserve(capacity)
+
+		# The vertex layout never changes, so it is captured in a vertex array object once
+		self.VAO = glGenVertexArrays(1)
+		mach.gl_state.bind_vertex_array(self.VAO)
+		mach.gl_state.bind_buffer(GL_ELEMENT_ARRAY_BUFFER, self.IBO)
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
+
+		glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, SPRITE_VERTEX_BYTES, c_void_p(0))
+		glEnableVertexAttribArray(0)
+		glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, SPRITE_VERTEX_BYTES, c_void_p(12))
+		glEnableVertexAttribArray(1)
+		glVertexAttribPointer(2, 4, GL_FLOAT, GL_FALSE, SPRITE_VERTEX_BYTES, c_void_p(20))
+		glEnableVertexAttribArray(2)
+
+		# Statistics for the last call to draw
+		self.sprites_submitted = 0
+		self.draw_calls = 0
+
+	def reserve(self, capacity):
+		" Grow the preallocated submission and vertex buffers so they can hold at least capacity sprites"
+		if capacity <= self.capacity:
+			return
+
+		capacity = max(capacity, self.capacity * 2)
+		count = self.count
+
+		def grow(name, shape, dtype):
+			new = np.zeros(shape, dtype=dtype)
+			if count > 0: new[:count] = getattr(self, name)[:count]
+			setattr(self, name, new)
+
+		grow('positions', (capacity, 2), np.float32)
+		grow('scales', (capacity, 2), np.float32)
+		grow('rotations', capacity, np.float32)
+		grow('sprites', capacity, np.int32)
+		grow('atlases', capacity, np.int32)
+		grow('tints', (capacity, 4), np.float32)
+		grow('depths', capacity, np.float32)
+
+		self.vertices = np.zeros((capacity, 4, SPRITE_VERTEX_FLOATS), dtype=np.float32)
+		self.capacity = capacity
+
+		# The index buffer never changes between frames, so it is only uploaded when the batch grows
+		indices = (np.arange(capacity, dtype=np.uint32)[:, np.newaxis] * 4 + SPRITE_QUAD_INDICES).reshape(-1)
+		mach.gl_state.bind_buffer(GL_COPY_WRITE_BUFFER, self.IBO)
+		glBufferData(GL_COPY_WRITE_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+	def add_atlas(self, sprites, path=None, texture_id=None, filter=GL_NEAREST):
+		"""
+		Add a texture atlas that sprites can be drawn from, returns the atlas index used when submitting sprites
+
+		Arguments:
+			sprites - a sprite table from mach.TextureAtlas.parse_table, or the result of mach.TextureAtlas.parse
+			path - the path to the atlas image (string)
+			texture_id - an already uploaded texture to use instead of loading path (integer)
+			filter - what type of texture filter we want to use (GL_NEAREST, GL_LINEAR, etc)
+		"""
+		# The name only keeps this batch's reference to the cached texture, draw binds it to the atlas sampler itself
+		if texture_id is None:
+			texture_id = self.store_sampler2D_from_path('atlas%d' % len(self.textures), path, self.active_texture, filter=filter)
+
+		if not isinstance(sprites, np.ndarray):
+			sprites = mach.TextureAtlas.sprite_table(sprites)
+
+		self.atlas_offsets = np.append(self.atlas_offsets, len(self.sprite_table)).astype(np.int32)
+		self.sprite_table = np.concatenate((self.sprite_table, sprites))
+		self.textures.append(texture_id)
+
+		return len(self.textures) - 1
+
+	def submit(self, sprite, position, scale=(1, 1), rotation=0, tint=(1, 1, 1, 1), depth=0, atlas=0):
+		"""
+		Queue a single sprite to be drawn this frame
+
+		Arguments:
+			sprite - the index of the sprite within its atlas (integer)
+			position - the world position of the sprite's center (iterable of size 2)
+			scale - multiplier for the sprite's size (iterable of size 2)
+			rotation - counter clockwise rotation in radians (float)
+			tint - color multiplied with the texture (iterable of size 4)
+			depth - larger depths are drawn first (float)
+			atlas - the index returned from add_atlas (integer)
+		"""
+		if self.count == self.capacity:
+			self.reserve(self.count + 1)
+
+		i = self.count
+		self.positions[i] = position
+		self.scales[i] = scale
+		self.rotations[i] = rotation
+		self.sprites[i] = sprite
+		self.atlases[i] = atlas
+		self.tints[i] = tint
+		self.depths[i] = depth
+		self.count += 1
+
+	def submit_array(self, sprites, positions, scales=1, rotations=0, tints=1, depths=0, atlases=0):
+		"""
+		Queue many sprites at once, every argument is either a numpy array with one row per sprite or a value
+		broadcast to all of them (see submit for the meaning of each argument)
+		"""
+		sprites = np.asarray(sprites)
+		n = len(sprites)
+		self.reserve(self.count + n)
+
+		s = slice(self.count, self.count + n)
+		self.positions[s] = positions
+		self.scales[s] = scales
+		self.rotations[s] = rotations
+		self.sprites[s] = sprites
+		self.atlases[s] = atlases
+		self.tints[s] = tints
+		self.depths[s] = depths
+		self.count += n
+
+	def build_vertices(self, order):
+		" Expand the submitted sprites (in the given order) into quads, returns the vertex array"
+		n = len(order)
+		rows = self.atlas_offsets[self.atlases[order]] + self.sprites[order]
+
+		table = self.sprite_table[rows]
+		rotated = table[:, mach.TextureAtlas.TABLE_ROTATED] != 0
+		size = table[:, mach.TextureAtlas.TABLE_W:mach.TextureAtlas.TABLE_H + 1]
+		size[rotated] = size[rotated][:, ::-1]
+		size *= self.scales[order] * self.units_per_pixel
+
+		# Corners centered around the sprite's position
+		local = (SPRITE_QUAD_CORNERS - 0.5)[np.newaxis, :, :] * size[:, np.newaxis, :]
+
+		angle = self.rotations[order]
+		c = np.cos(angle)[:, np.newaxis]
+		s = np.sin(angle)[:, np.newaxis]
+		position = self.positions[order]
+
+		vertices = self.vertices[:n]
+		vertices[:, :, 0] = local[:, :, 0] * c - local[:, :, 1] * s + position[:, 0, np.newaxis]
+		vertices[:, :, 1] = local[:, :, 0] * s + local[:, :, 1] * c + position[:, 1, np.newaxis]
+		vertices[:, :, 2] = self.depths[order][:, np.newaxis]
+
+		# Images are flipped when they are uploaded, so v runs from the bottom of the atlas to the top
+		uv = mach.TextureAtlas.recalc_coords(self.sprite_table, rows, SPRITE_ATLAS_CORNERS)
+		vertices[:, :, 3] = uv[:, :, 0]
+		vertices[:, :, 4] = 1 - uv[:, :, 1]
+		vertices[:, :, 5:9] = self.tints[order][:, np.newaxis, :]
+
+		return vertices
+
+	def bind(self):
+		" Binds the shader's program, the sprite buffers and uniforms for drawing"
+		mach.gl_state.use_program(self.get_program())
+		mach.gl_state.bind_vertex_array(self.VAO)
+		self.bind_uniforms()
+
+	def draw(self):
+		" Draw every sprite submitted since the last draw and empty the batch"
+		n = self.count
+		self.sprites_submitted = n
+		self.draw_calls = 0
+		if n == 0:
+			return
+
+		# Back to front so alpha blending works, equal depths keep their submission order
+		if self.group_atlases:
+			order = np.lexsort((-self.depths[:n], self.atlases[:n]))
+		else:
+			order = np.argsort(-self.depths[:n], kind='stable')
+		vertices = self.build_vertices(order)
+
+		# Orphan the old storage whenever it is too small so the driver never waits on last frame's draw
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
+		if vertices.nbytes > self.buffer_capacity:
+			self.buffer_capacity = self.capacity * 4 * SPRITE_VERTEX_BYTES
+		glBufferData(GL_ARRAY_BUFFER, self.buffer_capacity, None, GL_STREAM_DRAW)
+		glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+
+		self.bind()
+
+		# Consecutive sprites sharing an atlas are drawn together
+		atlases = self.atlases[order]
+		starts = np.flatnonzero(np.diff(atlases)) + 1
+		starts = np.concatenate(([0], starts, [n]))
+
+		for start, end in zip(starts[:-1], starts[1:]):
+			mach.gl_state.bind_texture(self.textures[atlases[start]], GL_TEXTURE_2D, self.active_texture)
+			glDrawElements(GL_TRIANGLES, int(end - start) * 6, GL_UNSIGNED_INT, c_void_p(int(start) * 6 * 4))
+			self.draw_calls += 1
+
+		self.count = 0
+
+	# Passthrough info functions to shader
+	def get_program(self):
+		return self.shader.get_program()
+	def get_uniform_location(self, name):
+		return self.shader.get_uniform_location(name)
@@ -1,6 +1,62 @@
 from OpenGL.GL import *
 from ctypes import c_void_p
 import numpy as np
+import mach
+
+def pack_planar(attributes):
+	"""
+	Lay the attributes out one after another in a single array, returns a uint8 array
+
+	Each attribute is copied exactly once, and a lone attribute is handed to OpenGL without copying at all
+	"""
+	if len(attributes) == 1:
+		attributes[0].set_offset(0)
+		return attributes[0].data.view(np.uint8)
+
+	data = np.empty(sum(attr.data.nbytes for attr in attributes), dtype=np.uint8)
+	offset = 0
+	for attr in attributes:
+		attr.set_offset(offset)
+		data[offset:offset + attr.data.nbytes] = attr.data.view(np.uint8)
+		offset += attr.data.nbytes
+
+	return data
+
+def pack_interleaved(attributes):
+	"""
+	Lay the attributes out vertex by vertex in a numpy structured array so all of a vertex's data is fetched
+	together, returns the structured array (one field per attribute, named by the attribute's index)
+	"""
+	names, formats, offsets = [], [], []
+	offset = 0
+	for i, attr in enumerate(attributes):
+		names.append(str(i))
+		formats.append((attr.data.dtype, (attr.size,)))
+		offsets.append(offset)
+
+		# Keep every attribute four byte aligned
+		offset += -(-attr.size * attr.data.itemsize // 4) * 4
+
+	dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+	data = np.zeros(attributes[0].count, dtype=dtype)
+
+	for i, attr in enumerate(attributes):
+		data[str(i)] = attr.data.reshape(attr.count, attr.size)
+		attr.set_offset(offsets[i], stride=dtype.itemsize)
+
+	return data
+
+def attribute_layout(attributes):
+	" Everything about a list of attributes that a vertex array object records"
+	return tuple((attr.location, attr.columns, attr.column_size, attr.type, attr.normalized, attr.stride, attr.offset, attr.divisor) for attr in attributes)
+
+def layout_locations(layout):
+	" The attribute locations used by a layout from attribute_layout"
+	return set(location + column for location, columns, *rest in layout for column in range(columns))
+
+# Vertex array objects keyed by their buffers and attribute layouts, so objects sharing geometry share one VAO
+# Each entry is [VAO, number of objects using it]
+vertex_array_cache = {}
 
 class AttributeStorage:
 	def __init__(self):
@@ -8,57 +64,224 @@ class AttributeStorage:
 		self.VBO = glGenBuffers(1)
 		self.IBO = None
 		self.IBOSize = 0
+		self.VBOSize = 0
+		self.usage = GL_STATIC_DRAW
 		self.count = 0
 
+		# Interleaved vertex data is kept so single attributes can be rewritten in place
+		self.interleaved = False
+		self.vertex_data = None
+
+		# Per instance attributes live in their own buffer since they are usually rewritten every frame
+		self.instance_attributes = []
+		self.instance_VBO = None
+		self.instance_count = 0
+
+		# The vertex array object capturing our buffers and attribute layout, and the key it is cached under
+		self.VAO = None
+		self.vao_key = None
+
 	def bind_attributes(self):
 		" Binds all of the user defined attributes for drawing"
-		glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+		if self.VAO is not None:
+			mach.gl_state.bind_vertex_array(self.VAO)
+
+	def vertex_array_key(self):
+		return (
+			mach.gl_id(self.VBO),
+			None if self.IBO is None else mach.gl_id(self.IBO),
+			None if self.instance_VBO is None else mach.gl_id(self.instance_VBO),
+			attribute_layout(self.attributes),
+			attribute_layout(self.instance_attributes)
+		)
+
+	def release_vertex_array(self):
+		" Stop using our vertex array object, deleting it if no other object uses it"
+		if self.vao_key is None:
+			return
+
+		entry = vertex_array_cache[self.vao_key]
+		entry[1] -= 1
+		if entry[1] == 0:
+			del vertex_array_cache[self.vao_key]
+			glDeleteVertexArrays(1, [entry[0]])
+			mach.gl_state.forget_vertex_array(entry[0])
+
+		self.VAO = None
+		self.vao_key = None
+
+	def configure_vertex_array(self):
+		" Capture our buffers and attribute pointers in a vertex array object, reusing one with the same setup if it exists"
+		key = self.vertex_array_key()
+		if key == self.vao_key:
+			return
+
+		if key in vertex_array_cache:
+			self.release_vertex_array()
+			entry = vertex_array_cache[key]
+			entry[1] += 1
+			self.VAO = entry[0]
+			self.vao_key = key
+			return
+
+		if self.vao_key is not None and vertex_array_cache[self.vao_key][1] == 1:
+			# Nobody else uses our VAO, so update it in place instead of creating another one
+			del vertex_array_cache[self.vao_key]
+			old_locations = layout_locations(self.vao_key[3]) | layout_locations(self.vao_key[4])
+		else:
+			self.release_vertex_array()
+			self.VAO = glGenVertexArrays(1)
+			old_locations = set()
+
+		mach.gl_state.bind_vertex_array(self.VAO)
 
-		# Check if indexing is enabled
 		if self.IBO is not None:
-			glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.IBO)
+			mach.gl_state.bind_buffer(GL_ELEMENT_ARRAY_BUFFER, self.IBO)
+
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
+		locations = self.enable_attributes(self.attributes)
 
-		for attr in self.attributes:
-			glVertexAttribPointer(
-						attr.location,
-						attr.size,
-						attr.type,
-						attr.normalized,
-						attr.stride,
-						c_void_p(attr.offset))
+		if self.instance_VBO is not None:
+			mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.instance_VBO)
+			locations |= self.enable_attributes(self.instance_attributes)
 
-			glEnableVertexAttribArray(attr.location)
+		for location in old_locations - locations:
+			glDisableVertexAttribArray(location)
 
-	def store_attribute_array(self, attributes):
+		vertex_array_cache[key] = [self.VAO, 1]
+		self.vao_key = key
+
+	def share_attributes(self, other):
 		"""
-		Converts attributes to bytes and stores them, only happens once
+		Draw the same geometry as another object without uploading it again, the vertex array object is shared too
+
+		Arguments:
+			other - the AttributeStorage (MachObject) whose buffers and attributes should be used
+		"""
+		self.VBO = other.VBO
+		self.VBOSize = other.VBOSize
+		self.IBO = other.IBO
+		self.IBOSize = other.IBOSize
+		self.usage = other.usage
+		self.count = other.count
+		self.attributes = other.attributes
+		self.interleaved = other.interleaved
+		self.vertex_data = other.vertex_data
+
+		self.configure_vertex_array()
+
+	def enable_attributes(self, attributes):
+		" Points each attribute at its data within the currently bound array buffer, returns the locations used"
+		locations = set()
+		for attr in attributes:
+			for column in range(attr.columns):
+				location = attr.location + column
+				glVertexAttribPointer(
+							location,
+							attr.column_size,
+							attr.type,
+							attr.normalized,
+							attr.stride,
+							c_void_p(attr.offset + column * attr.column_size * attr.data.itemsize))
+
+				glEnableVertexAttribArray(location)
+				glVertexAttribDivisor(location, attr.divisor)
+				locations.add(location)
+
+		return locations
+
+	def store_attribute_array(self, attributes, usage=GL_STATIC_DRAW, interleaved=False):
+		"""
+		Packs attributes into one buffer and uploads it
 
 		Arguments:
 			attributes - A list of Attribute objects
+			usage - how often the data is expected to change (GL_STATIC_DRAW, GL_DYNAMIC_DRAW, GL_STREAM_DRAW)
+			interleaved - store the attributes vertex by vertex instead of one attribute after another (boolean)
 		"""
 		self.attributes = attributes
+		self.usage = usage
+		self.interleaved = interleaved
 
-		# Combine all of the attribute data into one data array
-		data = bytearray()
-		offset = 0
-		for attr in attributes:
-			attr.set_offset(offset)
-			offset += attr.data.nbytes
-			data.extend(attr.data.tobytes())
+		data = self.pack_attributes(attributes)
+		self.VBOSize = data.nbytes
 
 		# Store the count for the vertices if we are not using indexing
 		if (self.IBO is None):
 			self.count = attributes[0].count
 
-		glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
 
 		glBufferData(
 					GL_ARRAY_BUFFER,
-					offset,
-					bytes(data),
-					GL_STATIC_DRAW
+					data.nbytes,
+					data,
+					usage
 					)
 
+		self.configure_vertex_array()
+
+	def pack_attributes(self, attributes):
+		" Combine all of the attribute data into one array that can be handed straight to OpenGL"
+		if self.interleaved:
+			self.vertex_data = pack_interleaved(attributes)
+			return self.vertex_data
+
+		self.vertex_data = None
+		return pack_planar(attributes)
+
+	def update_attribute(self, attr, data, start=0):
+		"""
+		Overwrite part of one stored attribute without touching the rest of the buffer
+
+		Arguments:
+			attr - one of the Attribute objects passed to store_attribute_array
+			data - numpy array with one row per vertex to overwrite
+			start - the first vertex to overwrite (integer)
+		"""
+		data = np.ascontiguousarray(data, dtype=attr.data.dtype).reshape(-1)
+		first = start * attr.size
+
+		# Keep our copy in sync so a later full rewrite uploads the new values
+		attr.data[first:first + data.size] = data
+
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
+
+		if self.interleaved:
+			# The attribute is spread across every vertex, so upload the rows it touches
+			rows = data.size // attr.size
+			field = self.vertex_data[str(self.attributes.index(attr))]
+			field[start:start + rows] = data.reshape(rows, attr.size)
+
+			changed = self.vertex_data[start:start + rows]
+			glBufferSubData(GL_ARRAY_BUFFER, start * attr.stride, changed.nbytes, changed)
+		else:
+			glBufferSubData(GL_ARRAY_BUFFER, attr.offset + first * attr.data.itemsize, data.nbytes, data)
+
+	def update_attribute_array(self, attributes=None, orphan=True):
+		"""
+		Rewrite the whole vertex buffer, use this for data that changes every frame
+
+		Arguments:
+			attributes - A list of Attribute objects with the same layout as the stored ones, defaults to the stored ones
+			orphan - give the driver a fresh block of memory first so it does not have to wait for draws
+						still using the old data (boolean)
+		"""
+		if attributes is not None:
+			self.attributes = attributes
+
+		data = self.pack_attributes(self.attributes)
+
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.VBO)
+		if orphan or data.nbytes != self.VBOSize:
+			glBufferData(GL_ARRAY_BUFFER, data.nbytes, None, self.usage)
+			self.VBOSize = data.nbytes
+
+		glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+		# Attribute offsets move if the amount of data changed
+		self.configure_vertex_array()
+
 	def store_element_index_array(self, indices):
 		"""
 		Stores and enables an array of indices for element drawing
@@ -66,15 +289,40 @@ class AttributeStorage:
 		Arguments:
 			indices - 1D numpy array of integers
 		"""
-
-		self.IBO = glGenBuffers(1)
+		if self.IBO is None:
+			self.IBO = glGenBuffers(1)
 		self.IBOSize = indices.nbytes
 		self.count = len(indices)
 
-		glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.IBO)
+		# The element array binding belongs to whichever VAO is bound, so upload through a target that does not
+		mach.gl_state.bind_buffer(GL_COPY_WRITE_BUFFER, self.IBO)
 		glBufferData(
-			GL_ELEMENT_ARRAY_BUFFER,
+			GL_COPY_WRITE_BUFFER,
 			indices.nbytes,
-			indices.tobytes(),
+			np.ascontiguousarray(indices),
 			GL_STATIC_DRAW
 		)
+
+		self.configure_vertex_array()
+
+	def store_instance_attribute_array(self, attributes, usage=GL_STREAM_DRAW):
+		"""
+		Stores per instance attributes (Attributes with a divisor) in one upload, call this again whenever the
+		instance data changes
+
+		Arguments:
+			attributes - A list of Attribute objects with a divisor greater than 0
+			usage - how often the data is expected to change (GL_STATIC_DRAW, GL_DYNAMIC_DRAW, GL_STREAM_DRAW)
+		"""
+		self.instance_attributes = attributes
+		self.instance_count = attributes[0].count * attributes[0].divisor
+
+		if self.instance_VBO is None:
+			self.instance_VBO = glGenBuffers(1)
+
+		data = pack_planar(attributes)
+
+		mach.gl_state.bind_buffer(GL_ARRAY_BUFFER, self.instance_VBO)
+		glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, usage)
+
+		self.configure_vertex_array()
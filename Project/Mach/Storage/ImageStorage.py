@@ -1,6 +1,9 @@
 from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_filter_anisotropic import GL_TEXTURE_MAX_ANISOTROPY_EXT, GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT
 from PIL import Image
 import numpy as np
+import os
+import mach
 
 numpy_type_to_gl_type = {
 	np.dtype(np.uint8): GL_UNSIGNED_BYTE,
@@ -13,15 +16,152 @@ numpy_type_to_gl_type = {
 	np.dtype(np.float32): GL_FLOAT
 }
 
+# Immutable texture storage needs a sized internal format, picked from the image's format and numpy type
+sized_texture_formats = {
+	(GL_RED, np.dtype(np.uint8)): GL_R8,
+	(GL_RG, np.dtype(np.uint8)): GL_RG8,
+	(GL_RGB, np.dtype(np.uint8)): GL_RGB8,
+	(GL_RGBA, np.dtype(np.uint8)): GL_RGBA8,
+	(GL_RED, np.dtype(np.uint16)): GL_R16,
+	(GL_RG, np.dtype(np.uint16)): GL_RG16,
+	(GL_RGB, np.dtype(np.uint16)): GL_RGB16,
+	(GL_RGBA, np.dtype(np.uint16)): GL_RGBA16,
+	(GL_RED, np.dtype(np.float16)): GL_R16F,
+	(GL_RG, np.dtype(np.float16)): GL_RG16F,
+	(GL_RGB, np.dtype(np.float16)): GL_RGB16F,
+	(GL_RGBA, np.dtype(np.float16)): GL_RGBA16F,
+	(GL_RED, np.dtype(np.float32)): GL_R32F,
+	(GL_RG, np.dtype(np.float32)): GL_RG32F,
+	(GL_RGB, np.dtype(np.float32)): GL_RGB32F,
+	(GL_RGBA, np.dtype(np.float32)): GL_RGBA32F
+}
+
+# The minification filter used with mipmaps, blending between the two closest levels (trilinear filtering with GL_LINEAR)
+mipmap_filters = {
+	GL_NEAREST: GL_NEAREST_MIPMAP_LINEAR,
+	GL_LINEAR: GL_LINEAR_MIPMAP_LINEAR
+}
+
+def load_image(path, convert="RGBA"):
+	"""
+	Decode an image into a numpy array ready for store_sampler2D_from_numpy (flipped so the first row is the bottom),
+	this does not touch OpenGL so it can be run on any thread
+
+	Arguments:
+		path - the path to the image (string)
+		convert - the PIL mode to convert the image to, or None to keep the image's own mode (string)
+	"""
+	im = Image.open(path, mode='r')
+
+	# Some images aren't done in RGBA so we convert it, if the user wants to save RAM or image upload times they can specify their own format or None
+	if convert: im = im.convert(convert)
+	mat = np.array(im)
+	if mat.ndim == 2: mat = mat[:, :, np.newaxis]
+	return np.ascontiguousarray(mat[::-1, :, :])
+
+def texture_key(path, convert="RGBA", filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
+	" The key a texture loaded from path is shared under in mach.texture_cache"
+	return (os.path.normcase(os.path.abspath(path)), convert, filter, format, mipmaps, anisotropy)
+
+def mipmap_levels(width, height):
+	" The number of levels in a full mip chain, down to 1x1"
+	return max(int(width), int(height)).bit_length()
+
+def box_filter_pyramid(mat):
+	"""
+	Build a full mip chain on the CPU by averaging 2x2 blocks of texels, returns a list of images starting with mat.
+	Each level is half the size of the one before rounded down, like OpenGL's, so odd rows and columns are dropped
+
+	Arguments:
+		mat - numpy matrix with shape [height, width, byte_depth]
+	"""
+	levels = [mat]
+	level = mat.astype(np.float32)
+
+	while level.shape[0] > 1 or level.shape[1] > 1:
+		height, width = level.shape[:2]
+		step_y, step_x = min(height, 2), min(width, 2)
+		height, width = height // step_y, width // step_x
+
+		level = level[:height * step_y, :width * step_x]
+		level = level.reshape(height, step_y, width, step_x, -1).mean(axis=(1, 3))
+
+		if np.issubdtype(mat.dtype, np.integer):
+			levels.append(np.rint(level).astype(mat.dtype))
+		else:
+			levels.append(level.astype(mat.dtype))
+
+	return levels
+
+def texture_bytes(mat, mipmaps=None):
+	" Estimate how much video memory an image takes once uploaded, a full mip chain adds a third"
+	return mat.nbytes * 4 // 3 if mipmaps else mat.nbytes
+
+max_anisotropy = None
+
+def create_texture(mat, filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
+	"""
+	Upload an image to a new texture, returns the texture id
+
+	Arguments:
+		mat - numpy matrix with shape [height, width, byte_depth]
+		filter - what type of texture filter we want to use (GL_NEAREST, GL_LINEAR, etc)
+		format - the OpenGL format of the image (GL_RGBA, GL_RGB, etc)
+		mipmaps - None for a single level texture, 'gpu' to allocate immutable storage for a full mip chain and let
+					OpenGL generate it or 'cpu' to upload a mip chain built with box_filter_pyramid (string)
+		anisotropy - the maximum anisotropic filtering ratio, clamped to what the driver supports (float)
+	"""
+	global max_anisotropy
+
+	if mipmaps not in (None, 'gpu', 'cpu'):
+		raise ValueError("mipmaps must be None, 'gpu' or 'cpu'")
+
+	width, height = mat.shape[1], mat.shape[0]
+	gl_type = numpy_type_to_gl_type[mat.dtype]
+
+	texture_id = glGenTextures(1)
+
+	glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+	mach.gl_state.bind_texture(texture_id)
+	glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+	glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+	glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter)
+
+	if mipmaps is None:
+		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter)
+		glTexImage2D(GL_TEXTURE_2D, 0, format, width, height, 0, format, gl_type, mat.tobytes())
+	else:
+		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, mipmap_filters.get(filter, filter))
+
+		# Immutable storage allocates every level up front, so the driver never has to reallocate or check completeness
+		glTexStorage2D(GL_TEXTURE_2D, mipmap_levels(width, height), sized_texture_formats[(format, mat.dtype)], width, height)
+
+		levels = box_filter_pyramid(mat) if mipmaps == 'cpu' else [mat]
+		for level, image in enumerate(levels):
+			glTexSubImage2D(GL_TEXTURE_2D, level, 0, 0, image.shape[1], image.shape[0], format, gl_type, image.tobytes())
+
+		if mipmaps == 'gpu':
+			glGenerateMipmap(GL_TEXTURE_2D)
+
+	if anisotropy:
+		if max_anisotropy is None:
+			max_anisotropy = float(glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT))
+		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, min(anisotropy, max_anisotropy))
+
+	return texture_id
+
 class ImageStorage:
 	def __init__(self):
+		# Uniform name -> (texture id, active texture)
 		self.images = {}
 
+		# Uniform names of the textures this object holds a reference to in mach.texture_cache
+		self.cached_images = {}
+
 	def bind_images(self):
 		" Binds all user defined images and textures for drawing"
-		for texture_id, (name, active_texture) in self.images.items():
-			glActiveTexture(GL_TEXTURE0 + active_texture)
-			glBindTexture(GL_TEXTURE_2D, texture_id)
+		for texture_id, active_texture in self.images.values():
+			mach.gl_state.bind_texture(texture_id, GL_TEXTURE_2D, active_texture)
 
 	def store_sampler2D_from_texture(self, name, tex, active_texture=0, filter=GL_NEAREST):
 		"""
@@ -34,17 +174,19 @@ class ImageStorage:
 			filter - what type of texture filter we want to use (GL_NEAREST, GL_LINEAR, etc)
 		"""
 		glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-		glBindTexture(GL_TEXTURE_2D, tex.renderedTexture)
+		mach.gl_state.bind_texture(tex.rendered_texture)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter)
 
-		self.images[tex.renderedTexture] = (name, active_texture)
+		self.release_image(name)
+		self.images[name] = (tex.rendered_texture, active_texture)
 
-	def store_sampler2D_from_path(self, name, path, active_texture=0, convert="RGBA", filter=GL_NEAREST, format=GL_RGBA):
+	def store_sampler2D_from_path(self, name, path, active_texture=0, convert="RGBA", filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
 		"""
-		Store an image in a sampler2D object
+		Store an image in a sampler2D object. The texture is shared through mach.texture_cache with everything else
+		that loaded the same file with the same settings. Returns the texture id
 
 		Arguments:
 			name - the name of the uniform variable (string)
@@ -52,17 +194,51 @@ class ImageStorage:
 			active_texture - the offset for the active texture (integer)
 			filter - what type of texture filter we want to use (GL_NEAREST for a pixely effect, good for low resolution images
 						or GL_LINEAR for blurrier, smoother look)
+			(see create_texture for mipmaps and anisotropy)
+		"""
+		key = texture_key(path, convert, filter, format, mipmaps, anisotropy)
+		return self.store_sampler2D_from_cache(name, key, lambda: load_image(path, convert), active_texture, filter, format, mipmaps, anisotropy)
+
+	def store_sampler2D_from_cache(self, name, key, load, active_texture=0, filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
+		"""
+		Store a texture shared through mach.texture_cache in a sampler2D object, replacing any cached texture
+		already stored under name. Returns the texture id
+
+		Arguments:
+			name - the name of the uniform variable (string)
+			key - the key of the texture in the cache (see texture_key)
+			load - called on a cache miss, returns the image as a numpy matrix
+			(see store_sampler2D_from_numpy for the other arguments)
 		"""
-		im = Image.open(path, mode='r')
+		def create():
+			mat = load()
+			return create_texture(mat, filter, format, mipmaps, anisotropy), texture_bytes(mat, mipmaps)
 
-		# Some images aren't done in RGBA so we convert it, if the user wants to save RAM or image upload times they can specify their own format or None
-		if convert: im = im.convert(convert)
-		mat = np.array(im)[::-1, :, :]
-		self.store_sampler2D_from_numpy(name, mat, active_texture, filter, format)
+		texture_id = mach.texture_cache.acquire(key, create)
+		self.release_image(name)
 
-	def store_sampler2D_from_numpy(self, name, mat, active_texture=0, filter=GL_NEAREST, format=GL_RGBA):
+		self.images[name] = (texture_id, active_texture)
+		self.cached_images[name] = texture_id
+		return texture_id
+
+	def release_image(self, name):
+		" Stop using the cached texture stored under name, letting the cache delete it once nothing else uses it"
+		texture_id = self.cached_images.pop(name, None)
+		if texture_id is None:
+			return
+
+		del self.images[name]
+		mach.texture_cache.release(texture_id)
+
+	def release_images(self):
+		" Stop using every cached texture this object holds, call this when the object is no longer drawn"
+		for name in list(self.cached_images):
+			self.release_image(name)
+
+	def store_sampler2D_from_numpy(self, name, mat, active_texture=0, filter=GL_NEAREST, format=GL_RGBA, mipmaps=None, anisotropy=None):
 		"""
 		Store an image in a sampler2D object. The texture unit is defined by the order in which this texture was added
+		Returns the id of the new texture
 
 		Arguments:
 			name - the name of the uniform variable (string)
@@ -70,18 +246,10 @@ class ImageStorage:
 			active_texture - the offset for the active texture (integer)
 			filter - what type of texture filter we want to use (GL_NEAREST for a pixely effect, good for low resolution images
 						or GL_LINEAR for blurrier, smoother look)
+			(see create_texture for mipmaps and anisotropy)
 		"""
-		width, height, image = mat.shape[1], mat.shape[0], mat.tobytes()
-
-		texture_id = glGenTextures(1)
-
-		glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-		glBindTexture(GL_TEXTURE_2D, texture_id)
-		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter)
-		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter)
-
-		glTexImage2D(GL_TEXTURE_2D, 0, format, width, height, 0, format, numpy_type_to_gl_type[mat.dtype], image)
+		texture_id = create_texture(mat, filter, format, mipmaps, anisotropy)
 
-		self.images[texture_id] = (name, active_texture)
\ No newline at end of file
+		self.release_image(name)
+		self.images[name] = (texture_id, active_texture)
+		return texture_id
\ No newline at end of file
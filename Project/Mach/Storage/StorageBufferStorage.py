@@ -0,0 +1,24 @@
+from OpenGL.GL import *
+
+class StorageBufferStorage:
+	def __init__(self):
+		self.storage_buffers = {}
+
+	def bind_storage_buffers(self):
+		" Uploads whatever changed in the storage buffers and binds them to their binding points"
+		for sb in self.storage_buffers:
+			self.storage_buffers[sb].flush()
+			self.storage_buffers[sb].bind()
+
+	def store_storage_buffer(self, storage_buffer, block_name=None):
+		"""
+		Stores a storage buffer to be bound
+
+		Arguments:
+			storage_buffer - A StorageBuffer from Mach.StorageBuffer
+			block_name - the name of the buffer block in glsl, only needed when the glsl does not give the block a binding itself (string)
+		"""
+		if block_name is not None:
+			storage_buffer.bind_block(self.get_program(), block_name)
+
+		self.storage_buffers[storage_buffer.binding] = storage_buffer
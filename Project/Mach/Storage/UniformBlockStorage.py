@@ -5,8 +5,9 @@ class UniformBlockStorage:
 		self.blocks = {}
 
 	def bind_uniform_blocks(self):
-		" Binds all of the uniform buffer objects from the uniformBlocks"
+		" Uploads whatever changed in the uniformBlocks and binds their uniform buffer objects"
 		for ub in self.blocks:
+			self.blocks[ub].flush()
 			self.blocks[ub].autoBind()
 
 	def store_uniform_block(self, uniform_block):
@@ -1,6 +1,6 @@
 from OpenGL.GL import *
 import numpy as np
-from ctypes import c_float
+import mach
 
 float_functions = {
 	1: glUniform1f,
@@ -16,15 +16,75 @@ int_functions = {
 	4: glUniform4i
 }
 
+# Programs keep their uniform values, so remember the function and a copy of the arguments last uploaded to each
+# (program, location). A copy, because the stored arguments may be arrays the caller keeps changing in place
+uploaded_uniforms = {}
+
+uniform_upload_stats = {
+	'performed': 0,
+	'skipped': 0
+}
+
+def get_uniform_upload_stats():
+	" Returns the number of uniform uploads performed and skipped since the last reset"
+	return dict(uniform_upload_stats)
+
+def reset_uniform_upload_stats():
+	uniform_upload_stats['performed'] = 0
+	uniform_upload_stats['skipped'] = 0
+
+def forget_uploaded_uniforms(program=None):
+	" Forget what was uploaded (to one program or all of them), use this if uniforms are set outside of UniformStorage"
+	for key in [k for k in uploaded_uniforms if program is None or k[0] == program]:
+		del uploaded_uniforms[key]
+
+def same_uniform_args(a, b):
+	" Compare two sets of uniform arguments, including any arrays within them"
+	if len(a) != len(b):
+		return False
+	for x, y in zip(a, b):
+		if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+			if not np.array_equal(x, y):
+				return False
+		elif x != y:
+			return False
+	return True
+
+def copy_uniform_args(args):
+	" Copy the arrays within a set of uniform arguments, so later changes to them can be detected"
+	return tuple(np.array(x) if isinstance(x, np.ndarray) else x for x in args)
+
 class UniformStorage:
 	def __init__(self):
 		self.uniforms = {}
 
 	def bind_uniforms(self):
-		" Binds all of the object specific uniforms"
+		" Binds the object specific uniforms that the program does not already hold"
+		program = self.get_program()
 		for name in self.uniforms:
 			args, func = self.uniforms[name]
+
+			key = (program, args[0])
+			uploaded = uploaded_uniforms.get(key)
+			if uploaded is not None and uploaded[0] is func and same_uniform_args(uploaded[1], args):
+				uniform_upload_stats['skipped'] += 1
+				continue
+
 			func(*args)
+			uploaded_uniforms[key] = (func, copy_uniform_args(args))
+			uniform_upload_stats['performed'] += 1
+
+	def store_uniform(self, name, args, func):
+		"""
+		Store the arguments for a glUniform call, bind_uniforms only uploads them when they differ from what the program
+		last received at that location
+
+		Arguments:
+			name - the name of the uniform variable (string)
+			args - the arguments passed to func, starting with the uniform location
+			func - the glUniform function used to upload the uniform
+		"""
+		self.uniforms[name] = (args, func)
 
 	def store_float(self, name, vals):
 		"""
@@ -38,7 +98,7 @@ class UniformStorage:
 			print("Cannot store more than four values for " + name)
 			return
 		loc = self.get_uniform_location(name)
-		self.uniforms[name] = ((loc, *vals), float_functions[len(vals)])
+		self.store_uniform(name, (loc, *vals), float_functions[len(vals)])
 
 	def store_int(self, name, vals):
 		"""
@@ -52,30 +112,46 @@ class UniformStorage:
 			print("Cannot store more than four values for " + name)
 			return
 		loc = self.get_uniform_location(name)
-		self.uniforms[name] = ((loc, *vals), int_functions[len(vals)])
+		self.store_uniform(name, (loc, *vals), int_functions[len(vals)])
 
-	def store_matrix3(self, name, mat):
+	def store_matrix3(self, name, mat, transpose=False):
 		"""
 		Store a mat3
 
 		Arguments:
 			name - the name of the uniform variable (string)
-			mat - a numpy matrix
+			mat - a glm matrix, numpy array or numpy matrix
+			transpose - whether OpenGL should transpose the matrix (boolean)
 		"""
-		value = np.array(mat).flatten()
+		value, transpose = mach.gl_matrix(mat, transpose)
 
 		loc = self.get_uniform_location(name)
-		self.uniforms[name] = ((loc, (c_float * 9)(*value)), glUniformMatrix3fv)
+		self.store_uniform(name, (loc, 1, transpose, value), glUniformMatrix3fv)
 
-	def store_matrix4(self, name, mat):
+	def store_matrix4(self, name, mat, transpose=False):
 		"""
 		Store a mat4
 
 		Arguments:
 			name - the name of the uniform variable (string)
-			mat - a numpy matrix
+			mat - a glm matrix, numpy array or numpy matrix
+			transpose - whether OpenGL should transpose the matrix (boolean)
+		"""
+		value, transpose = mach.gl_matrix(mat, transpose)
+
+		loc = self.get_uniform_location(name)
+		self.store_uniform(name, (loc, 1, transpose, value), glUniformMatrix4fv)
+
+	def store_matrix4_array(self, name, mats, transpose=False):
+		"""
+		Store an array of mat4 in one call, such as the result of mach.ModelMatrices
+
+		Arguments:
+			name - the name of the uniform array (string)
+			mats - the matrices (N by 4 by 4 array)
+			transpose - whether OpenGL should transpose the matrices (boolean)
 		"""
-		value = np.array(mat).flatten()
+		value = np.ascontiguousarray(mats, dtype=np.float32).reshape(-1, 4, 4)
 
 		loc = self.get_uniform_location(name)
-		self.uniforms[name] = ((loc, 1, False, (c_float * 16)(*value)), glUniformMatrix4fv)
+		self.store_uniform(name, (loc, len(value), transpose, value), glUniformMatrix4fv)
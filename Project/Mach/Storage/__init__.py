@@ -1,4 +1,5 @@
 from mach.Storage.AttributeStorage import *
 from mach.Storage.ImageStorage import *
 from mach.Storage.UniformBlockStorage import *
-from mach.Storage.UniformStorage import *
\ No newline at end of file
+from mach.Storage.UniformStorage import *
+from mach.Storage.StorageBufferStorage import *
\ No newline at end of file
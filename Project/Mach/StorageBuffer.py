@@ -0,0 +1,132 @@
+from ctypes import pointer
+from OpenGL.GL import *
+import numpy as np
+import mach
+
+class StorageBuffer:
+	"""
+	A shader storage buffer object holding an array of elements in the std430 layout, for tables too big for a
+	uniform block (per instance data, particles, lights) that graphics and compute shaders can both read and write.
+
+	Like UniformBlock, a copy of the buffer is kept in a numpy byte array. set writes whole columns of elements
+	into it and flush uploads the changed bytes. After a compute shader writes the buffer, read copies it back.
+
+	In glsl the buffer is declared as
+		layout(std430, binding = 0) buffer Name {
+			(the header declarations)
+			Element elements[];
+		};
+
+	Arguments:
+		element - the type of one element, a GLSL type name (vec4) or a list of struct declarations (see mach.glsl_dtype)
+		count - the number of elements (integer)
+		binding - the binding point, the binding given in glsl or any unused one when using store_storage_buffer with a block name (integer)
+		header - declarations of the variables before the array in the buffer block (list, optional)
+		usage - the usage hint given to glBufferData
+	"""
+	def __init__(self, element, count, binding=0, header=None, usage=GL_DYNAMIC_DRAW):
+		self.element = element
+		self.header = [] if header is None else header
+		self.binding = binding
+		self.usage = usage
+
+		self.ssbo = GLuint()
+		glGenBuffers(1, pointer(self.ssbo))
+
+		self.count = 0
+		self.data = np.zeros(0, dtype=np.uint8)
+		self.resize(count)
+
+		# Dirty ranges closer than this many bytes are uploaded together
+		self.merge_gap = 64
+
+		# Statistics for the last flush
+		self.flushed_bytes = 0
+		self.flushed_ranges = 0
+
+	def resize(self, count):
+		" Change the number of elements, keeping the contents of those that are left, and upload the whole buffer"
+		self.dtype = mach.glsl_dtype(self.header + [(self.element, 'elements', count)], 'std430')
+
+		data = np.zeros(self.dtype.itemsize, dtype=np.uint8)
+		kept = min(len(data), len(self.data))
+		data[:kept] = self.data[:kept]
+
+		self.data = data
+		self.count = count
+		self.packed = mach.packed_view(self.data, self.dtype)
+		self.elements = mach.packed_field(self.packed, 'elements')
+		self.dirty = []
+
+		mach.gl_state.bind_buffer(GL_SHADER_STORAGE_BUFFER, self.ssbo)
+		glBufferData(GL_SHADER_STORAGE_BUFFER, self.data.nbytes, self.data, self.usage)
+
+	def set(self, values, member=None, start=0):
+		"""
+		Store values into consecutive elements
+
+		Arguments:
+			values - an array with one row per element, [N, 3] for N vec3 for example
+			member - the name of the struct member to store, None when the elements are not structs (string)
+			start - the first element to store (integer)
+		"""
+		values = np.asarray(values)
+		target = self.elements[start:start + len(values)]
+		if member is not None:
+			target = mach.packed_field(target, member)
+
+		target[...] = values
+		self.dirty.append(mach.view_byte_range(self.data, target))
+
+	def set_header(self, name, *data):
+		" Store a variable declared before the array (name - its name, data - its value)"
+		target = mach.packed_field(self.packed, name)
+		target[...] = data if len(data) > 1 else data[0]
+		self.dirty.append(mach.view_byte_range(self.data, target))
+
+	def flush(self):
+		" Upload every dirty byte range, merging ranges that touch or nearly touch, returns the number of bytes uploaded"
+		self.flushed_bytes = 0
+		self.flushed_ranges = 0
+		if not self.dirty:
+			return 0
+
+		ranges = mach.merge_ranges(self.dirty, self.merge_gap)
+		self.dirty = []
+
+		mach.gl_state.bind_buffer(GL_SHADER_STORAGE_BUFFER, self.ssbo)
+		for start, end in ranges:
+			glBufferSubData(GL_SHADER_STORAGE_BUFFER, start, end - start, self.data[start:end])
+			self.flushed_bytes += end - start
+
+		self.flushed_ranges = len(ranges)
+		return self.flushed_bytes
+
+	def read(self, member=None):
+		"""
+		Copy the buffer back from the GPU after a shader wrote to it, returns the elements (or one member of them).
+		Values set since the last flush are uploaded first, so they are part of what is read back
+
+		Arguments:
+			member - the name of the struct member to return (string, optional)
+		"""
+		self.flush()
+
+		# Shader writes are only guaranteed to be visible to glGetBufferSubData after this barrier
+		glMemoryBarrier(GL_BUFFER_UPDATE_BARRIER_BIT)
+
+		mach.gl_state.bind_buffer(GL_SHADER_STORAGE_BUFFER, self.ssbo)
+		self.data[:] = np.frombuffer(glGetBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, self.data.nbytes), dtype=np.uint8)
+
+		if member is None:
+			return self.elements
+		return mach.packed_field(self.elements, member)
+
+	def bind(self):
+		" Bind this buffer to its binding point"
+		mach.gl_state.bind_buffer_base(GL_SHADER_STORAGE_BUFFER, self.binding, self.ssbo)
+
+	def bind_block(self, program, name):
+		" Connect a buffer block of a program to this buffer's binding point, for glsl that does not give the block a binding"
+		index = glGetProgramResourceIndex(program, GL_SHADER_STORAGE_BLOCK, name)
+		glShaderStorageBlockBinding(program, index, self.binding)
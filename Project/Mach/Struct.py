@@ -1,4 +1,5 @@
 import numpy as np
+import mach
 from OpenGL.GL import *
 
 class Struct:
@@ -18,18 +19,37 @@ class Struct:
 		self.shader = uniform.shader
 		self.index = index
 
+		# The path of this struct within the block, such as lights[2]
+		self.path = variableName if index < 0 else '%s[%d]' % (variableName, index)
+
 		self.uoffset, self.usize = self.uniform.GetBlockUniformInfo(variableName)
-		self.structSize = self.shader.GetStructSize(self.name)
+		if self.uniform.layout is None:
+			self.structSize = self.shader.get_struct_size(self.name)
 
 	def GetUniformInfo(self, name):
 		" Gets the offset and size of the struct object"
-		if (self.index < 0):
-			offset, size = self.shader.GetStructUniformInfo(self.name, name)
+		if self.uniform.layout is not None:
+			# The driver reported every member of every element, so no arithmetic is needed
+			return self.uniform.GetBlockUniformInfo(self.path + '.' + name)
+		elif (self.index < 0):
+			offset, size = self.shader.get_struct_uniform_info(self.name, name)
 			return (self.uoffset + offset, size)
 		else:
-			offset, size = self.shader.GetStructUniformInfo(self.name, name)
+			offset, size = self.shader.get_struct_uniform_info(self.name, name)
 			return (self.uoffset + offset + (self.structSize * self.index), size)
 
+	def GetArrayStride(self, name):
+		" Get the bytes from one element of an array to the next, std140's 16 when the layout was read from the source"
+		if self.uniform.layout is not None:
+			return self.uniform.GetBlockMember(self.path + '.' + name).array_stride or 16
+		return 16
+
+	def GetMatrixStride(self, name):
+		" Get the bytes from one matrix column to the next, std140's 16 when the layout was read from the source"
+		if self.uniform.layout is not None:
+			return self.uniform.GetBlockMember(self.path + '.' + name).matrix_stride or 16
+		return 16
+
 	def autoBind(self):
 		" Automatically bind the parent uniform if it is not already bound"
 		self.uniform.autoBind()
@@ -40,13 +60,12 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - a numpy matrix
+			data - a glm matrix, numpy array or numpy matrix
 		"""
-		self.autoBind()
-		data = np.array(data.flatten(), dtype=np.float32)[0]
+		data = mach.gl_matrix_data(data)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.uniform.write(offset, size, data)
 
 	def storeMatrix3(self, name, data):
 		"""
@@ -54,13 +73,15 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - a numpy matrix
+			data - a glm matrix, numpy array or numpy matrix
 		"""
-		self.autoBind()
-		arr = np.array([[m[0, 0], m[0, 1], m[0, 2], 0] for m in data], dtype=np.float32).flatten()
+
+		# Every column of a mat3 is padded to a vec4
+		arr = np.zeros((3, 4), dtype=np.float32)
+		arr[:, :3] = mach.gl_matrix_data(data)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, arr)
+		self.uniform.write(offset, size, arr)
 
 	def storeMatrix3Array(self, name, data):
 		"""
@@ -68,18 +89,13 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of numpy matrices
+			data - an iterable of glm or numpy matrices, or an [N, columns, rows] array, each matrix given column by column
 		"""
-		self.autoBind()
-		flattenedData = []
-		for mat in data:
-			arr = [[m[0, 0], m[0, 1], m[0, 2], 0] for m in mat]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		# Every column of a mat3 is padded to a vec4
+		data = mach.pad_array(mach.gl_matrix_array_data(data), 3, self.GetMatrixStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.uniform.write(offset, size, data)
 
 	def storeMatrix4Array(self, name, data):
 		"""
@@ -87,16 +103,12 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of numpy matrices
+			data - an iterable of glm or numpy matrices, or an [N, columns, rows] array, each matrix given column by column
 		"""
-		self.autoBind()
-		flattenedData = np.array([], dtype=np.float32)
-		for d in data:
-			flattenedData = np.append(flattenedData, d.flatten())
-		flattenedData = np.array(flattenedData, dtype=np.float32)
+		data = mach.pad_array(mach.gl_matrix_array_data(data), 4, self.GetMatrixStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.uniform.write(offset, size, data)
 
 	def storeFloat(self, name, *data):
 		"""
@@ -106,11 +118,10 @@ class Struct:
 			name - name of the variable within the uniform block (string)
 			data - a set of float arguments
 		"""
-		self.autoBind()
 		data = np.array(data, dtype=np.float32)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.uniform.write(offset, size, data)
 
 	def storeVec2Array(self, name, data):
 		"""
@@ -118,17 +129,12 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 2)
+			data - an iterable of (iterables of size 2) or an [N, 2] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], 0 , 0]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 2, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.uniform.write(offset, size, data)
 
 	def storeVec3Array(self, name, data):
 		"""
@@ -136,17 +142,12 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 3)
+			data - an iterable of (iterables of size 3) or an [N, 3] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], vec[2] , 0]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 3, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.uniform.write(offset, size, data)
 
 	def storeVec4Array(self, name, data):
 		"""
@@ -154,17 +155,12 @@ class Struct:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 4)
+			data - an iterable of (iterables of size 4) or an [N, 4] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], vec[2] , vec[3]]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 4, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.uniform.write(offset, size, data)
 
 	def storeFloatArray(self, name, data):
 		"""
@@ -174,13 +170,10 @@ class Struct:
 			name - name of the variable within the uniform block (string)
 			data - an iterable of floats
 		"""
-		self.autoBind()
-		data = [[n, 0, 0, 0] for n in data]
-		data = np.array(data, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 1, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetUniformInfo(name)
-
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.uniform.write(offset, size, data)
 
 	def storeInt(self, name, *data):
 		"""
@@ -190,11 +183,10 @@ class Struct:
 			name - name of the variable within the uniform block (string)
 			data - set of integer arguments
 		"""
-		self.autoBind()
 		data = np.array(data, dtype=np.int32)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.uniform.write(offset, size, data)
 
 	def storeIntArray(self, name, data):
 		"""
@@ -204,9 +196,7 @@ class Struct:
 			name - name of the variable within the uniform block (string)
 			data - an iterable of integers
 		"""
-		self.autoBind()
-		data = [[n, 0, 0, 0] for n in data]
-		data = np.array(data, dtype=np.int32).flatten()
+		data = mach.pad_array(data, 1, self.GetArrayStride(name) // 4, np.int32)
 
 		offset, size = self.GetUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.uniform.write(offset, size, data)
@@ -1,5 +1,14 @@
 from lxml import etree
 import numpy as np
+import hashlib
+import tempfile
+import sys
+import os
+
+# Columns of a sprite table, one float32 row per sprite. Texture coordinates are in atlas space (0 to 1, v growing
+# downwards like the XML), the pivot is relative to the sprite's size and x, y, w, h are in pixels
+TABLE_U0, TABLE_V0, TABLE_U1, TABLE_V1, TABLE_PIVOT_X, TABLE_PIVOT_Y, TABLE_ROTATED, TABLE_X, TABLE_Y, TABLE_W, TABLE_H = range(11)
+TABLE_COLUMNS = 11
 
 class Sprite:
 	def __init__(self, n, x, y, w, h, px, py, pw, ph, r):
@@ -15,24 +24,9 @@ class Sprite:
 		self.r = r
 
 	def recalcCoords(self, coords):
-		xvals = [coords[i] for i in range(0, len(coords), 2)]
-		yvals = [coords[i] for i in range(1, len(coords), 2)]
-
-		xvals = np.array(xvals, dtype=np.float32)
-		yvals = np.array(yvals, dtype=np.float32)
-
-		xvals *= self.w
-		xvals += self.x
-
-		yvals *= self.h
-		yvals += self.y
-
-		result = []
-		for i in range(len(xvals)):
-			result.append(xvals[i])
-			result.append(yvals[i])
-
-		return result
+		" Map flat (x, y, x, y, ...) coordinates within the sprite to atlas coordinates, returns a list (see recalc_coords for many sprites)"
+		coords = np.asarray(coords, dtype=np.float32).reshape(-1, 2)
+		return (coords * (self.w, self.h) + (self.x, self.y)).astype(np.float32).reshape(-1).tolist()
 
 	def __repr__(self):
 		return str((self.x, self.y, self.w, self.h))
@@ -47,28 +41,106 @@ def toInt(s):
 		return int(s)
 	return 0
 
-def parse(filename):
+def toRotated(s):
+	# TexturePacker writes r="y" for sprites stored sideways
+	return 1 if s is not None and s.lower() in ('y', 'yes', 'true', '1') else 0
+
+def recalc_coords(table, rows, coords):
+	"""
+	Map coordinates within sprites (0 to 1, y growing downwards) to atlas texture coordinates for many sprites at once.
+	Sprites stored rotated in the atlas are turned back. Returns a float32 array of shape [len(rows), K, 2]
+
+	Arguments:
+		table - a sprite table from parse_table or sprite_table
+		rows - the rows of the sprites in the table (integer array)
+		coords - the coordinates within the sprites, either shape [K, 2] shared by all sprites or [len(rows), K, 2]
+	"""
+	sprites = table[rows]
+	coords = np.asarray(coords, dtype=np.float32)
+	if coords.ndim == 2:
+		coords = np.broadcast_to(coords, (len(sprites),) + coords.shape)
+
+	x, y = coords[..., 0], coords[..., 1]
+	rotated = sprites[:, TABLE_ROTATED, np.newaxis] != 0
+	fx = np.where(rotated, 1 - y, x)
+	fy = np.where(rotated, x, y)
+
+	u0, v0 = sprites[:, TABLE_U0, np.newaxis], sprites[:, TABLE_V0, np.newaxis]
+	u1, v1 = sprites[:, TABLE_U1, np.newaxis], sprites[:, TABLE_V1, np.newaxis]
+
+	result = np.empty(coords.shape, dtype=np.float32)
+	result[..., 0] = u0 + fx * (u1 - u0)
+	result[..., 1] = v0 + fy * (v1 - v0)
+	return result
+
+def sprite_table(sprites):
+	" Build a sprite table from a dictionary of Sprite objects, in the order of their keys"
+	ordered = [sprites[n] for n in sorted(sprites)]
+	table = np.array([(s.x, s.y, s.x + s.w, s.y + s.h, 0, 0, bool(s.r), s.px, s.py, s.pw, s.ph) for s in ordered], dtype=np.float32)
+	return table.reshape(-1, TABLE_COLUMNS)
+
+def sprites_from_table(table):
+	" Build the dictionary of Sprite objects parse returns from a sprite table"
 	sprites = {}
+	for n, row in enumerate(table.tolist()):
+		u0, v0, u1, v1, pivot_x, pivot_y, r, px, py, pw, ph = row
+		sprites[n] = Sprite(n, u0, v0, u1 - u0, v1 - v0, int(px), int(py), int(pw), int(ph), r)
+	return sprites
 
-	tree = etree.parse(filename)
-
-	TA = tree.xpath('/TextureAtlas')[0]
-	width = toFloat(TA.get('width'))
-	height = toFloat(TA.get('height'))
-
-	for n, sprite in enumerate(tree.xpath('/TextureAtlas/sprite')):
-		x = toFloat(sprite.get('x')) / width
-		y = toFloat(sprite.get('y')) / height
-		w = toFloat(sprite.get('w')) / width
-		h = toFloat(sprite.get('h')) / height
-
-		px = toInt(sprite.get('x'))
-		py = toInt(sprite.get('y'))
-		pw = toInt(sprite.get('w'))
-		ph = toInt(sprite.get('h'))
-
-		r = toFloat(sprite.get('r'))
-
-		sprites[n] = Sprite(n, x, y, w, h, px, py, pw, ph, r)
+def table_cache_path(filename, cache_dir=None):
+	" Where the sprite table of an XML atlas is cached, named after a hash of the XML file's absolute path"
+	if cache_dir is None:
+		cache_dir = os.path.join(tempfile.gettempdir(), 'mach_atlas_cache')
+	key = hashlib.sha1(os.path.normcase(os.path.abspath(filename)).encode()).hexdigest()
+	return os.path.join(cache_dir, key + '.table.npy')
+
+def parse_table(filename, cache=True, cache_dir=None):
+	"""
+	Read a TexturePacker XML atlas into a sprite table (see the TABLE_ columns).
+
+	The table is saved in cache_dir and loaded from there while it is newer than the XML, so the XML only has to be
+	parsed again when the atlas changes
+
+	Arguments:
+		filename - the path to the XML file (string)
+		cache - read and write the binary cache (boolean)
+		cache_dir - where the table is saved, defaults to the same directory in the system's temporary directory as
+					mach.pack_atlas (string)
+	"""
+	cache_path = table_cache_path(filename, cache_dir)
+	if cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(filename):
+		table = np.load(cache_path)
+		if table.ndim == 2 and table.shape[1] == TABLE_COLUMNS and table.dtype == np.float32:
+			return table
+
+	root = etree.parse(filename).getroot()
+	width = toFloat(root.get('width'))
+	height = toFloat(root.get('height'))
+
+	rows = [(s.get('x'), s.get('y'), s.get('w'), s.get('h'), s.get('pX'), s.get('pY'), s.get('r')) for s in root.iter('sprite')]
+	pixels = np.array([[toInt(x), toInt(y), toInt(w), toInt(h)] for x, y, w, h, px, py, r in rows], dtype=np.float32).reshape(-1, 4)
+
+	table = np.empty((len(rows), TABLE_COLUMNS), dtype=np.float32)
+	table[:, TABLE_U0] = pixels[:, 0] / width
+	table[:, TABLE_V0] = pixels[:, 1] / height
+	table[:, TABLE_U1] = (pixels[:, 0] + pixels[:, 2]) / width
+	table[:, TABLE_V1] = (pixels[:, 1] + pixels[:, 3]) / height
+	table[:, TABLE_PIVOT_X] = [toFloat(px) for x, y, w, h, px, py, r in rows]
+	table[:, TABLE_PIVOT_Y] = [toFloat(py) for x, y, w, h, px, py, r in rows]
+	table[:, TABLE_ROTATED] = [toRotated(r) for x, y, w, h, px, py, r in rows]
+	table[:, TABLE_X:TABLE_H + 1] = pixels
+
+	if cache:
+		try:
+			# Written under another name first so a half written cache is never read
+			os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+			with open(cache_path + '.tmp', 'wb') as f:
+				np.save(f, table)
+			os.replace(cache_path + '.tmp', cache_path)
+		except OSError as e:
+			print("Could not cache the sprite table of %s: %s" % (filename, e), file=sys.stderr)
+
+	return table
 
-	return sprites
+def parse(filename):
+	return sprites_from_table(parse_table(filename))
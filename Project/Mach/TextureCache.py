@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from OpenGL.GL import *
+import mach
+
+class TextureCache:
+	"""
+	Shares textures loaded from files between everything that stores them, so an image used by many objects is
+	only uploaded once.
+
+	Textures are reference counted. Once a texture is no longer referenced it stays resident so it can be picked up
+	again for free, until the estimated memory of all cached textures goes over the budget, then the least recently
+	used unreferenced textures are deleted. Referenced textures are never deleted, so the budget can be exceeded
+	if everything cached is in use
+
+	Arguments:
+		budget - the estimated number of bytes of video memory all cached textures may use, referenced or not, before
+					unreferenced ones are deleted (integer)
+	"""
+	def __init__(self, budget=256 * 1024 * 1024):
+		self.budget = budget
+
+		# key -> [texture id, estimated bytes, reference count], least recently used first
+		self.entries = OrderedDict()
+		self.keys = {}
+
+		self.resident_bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def acquire(self, key, create):
+		"""
+		Returns the texture cached under key, adding a reference to it
+
+		Arguments:
+			key - anything hashable describing the texture, see texture_key
+			create - called on a miss, it must upload the texture and return (texture id, estimated bytes)
+		"""
+		entry = self.entries.get(key)
+		if entry is None:
+			self.misses += 1
+			texture_id, size = create()
+			entry = [mach.gl_id(texture_id), size, 0]
+			self.entries[key] = entry
+			self.keys[entry[0]] = key
+			self.resident_bytes += size
+		else:
+			self.hits += 1
+			self.entries.move_to_end(key)
+
+		entry[2] += 1
+		self.evict()
+		return entry[0]
+
+	def release(self, texture_id):
+		" Drop a reference to a cached texture, textures that did not come from the cache are ignored"
+		key = self.keys.get(mach.gl_id(texture_id))
+		if key is None:
+			return
+
+		entry = self.entries[key]
+		entry[2] = max(entry[2] - 1, 0)
+		self.evict()
+
+	def evict(self, budget=None):
+		" Delete unreferenced textures, least recently used first, until the resident bytes fit in the budget"
+		budget = self.budget if budget is None else budget
+
+		for key in list(self.entries):
+			if self.resident_bytes <= budget:
+				break
+			if self.entries[key][2] == 0:
+				self.delete(key)
+
+	def delete(self, key):
+		texture_id, size, refs = self.entries.pop(key)
+		del self.keys[texture_id]
+		self.resident_bytes -= size
+		self.evictions += 1
+
+		glDeleteTextures([texture_id])
+		mach.gl_state.forget_texture(texture_id)
+
+	def set_budget(self, budget):
+		" Change the budget, evicting straight away if the cache is over it"
+		self.budget = budget
+		self.evict()
+
+	def clear(self):
+		" Delete every unreferenced texture"
+		self.evict(0)
+
+	def get_stats(self):
+		" Returns the hit and miss counts and how much memory the cached textures are estimated to use"
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'textures': len(self.entries),
+			'referenced': sum(1 for entry in self.entries.values() if entry[2] > 0),
+			'resident_bytes': self.resident_bytes,
+			'budget': self.budget
+		}
+
+# Textures loaded from files are shared through this cache
+texture_cache = TextureCache()
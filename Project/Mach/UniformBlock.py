@@ -1,12 +1,16 @@
 from ctypes import pointer
 from OpenGL.GL import *
 import numpy as np
+import mach
 
-uniformBound = -1
 class UniformBlock:
 	"""
 	Organizes the usage of uniform blocks in glsl
 
+	The store methods write into a copy of the block kept in a numpy byte array and only remember which bytes changed.
+	flush uploads the changed bytes with as few glBufferSubData calls as possible, and is called by
+	bind_uniform_blocks, so filling a block costs one upload per frame however many variables were stored
+
 	Arguments:
 		shader - the shader object that the uniform block should be bound to
 		name - the name of the uniform block
@@ -14,37 +18,108 @@ class UniformBlock:
 	"""
 	def __init__(self, shader, name):
 		self.name = name
-		self.size = shader.GetUniformBlockSize(name)
+		self.size = shader.get_uniform_block_size(name)
 		self.shader = shader
-		self.index = self.shader.GetUniformIndex(name)
+		self.index = self.shader.get_uniform_index(name)
+
+		# The offsets the driver reported, None when they were worked out from the source
+		self.layout = self.shader.get_block_layout(name)
 
-		loc = self.shader.GetBlockLocation(self.name)
+		loc = self.shader.get_block_location(self.name)
 
-		glUniformBlockBinding(self.shader.shader, loc, self.index)
+		glUniformBlockBinding(self.shader.get_program(), loc, self.index)
 
 		self.ubo = GLuint()
 		glGenBuffers(1, pointer(self.ubo))
 
 		self.bind()
 		glBufferData(GL_UNIFORM_BUFFER, self.size, None, GL_STATIC_DRAW)
-		glBindBufferRange(GL_UNIFORM_BUFFER, self.index, self.ubo, 0, self.size);
+		mach.gl_state.bind_buffer_range(GL_UNIFORM_BUFFER, self.index, self.ubo, 0, self.size)
+
+		# The CPU copy of the block and the (start, end) byte ranges of it that changed since the last flush
+		self.data = np.zeros(self.size, dtype=np.uint8)
+		self.dirty = []
+
+		# Dirty ranges closer than this many bytes are uploaded together, as one call costs more than a few extra bytes
+		self.merge_gap = 16
+
+		# Statistics for the last flush
+		self.flushed_bytes = 0
+		self.flushed_ranges = 0
+
+		# The numpy structured type of the whole block, for packed, may be set from mach.glsl_dtype when the driver did not report the layout
+		self.dtype = None if self.layout is None else mach.block_dtype(self.layout)
+
+	def write(self, offset, size, data):
+		"""
+		Copy data into the CPU copy of the block, marking the bytes dirty if they changed
+
+		Arguments:
+			offset - the byte offset within the block (integer)
+			size - the number of bytes to write (integer)
+			data - a numpy array holding at least size bytes
+		"""
+		data = np.ascontiguousarray(data).reshape(-1).view(np.uint8)[:size]
+		end = offset + len(data)
+		if not np.array_equal(self.data[offset:end], data):
+			self.data[offset:end] = data
+			self.dirty.append((offset, end))
+
+	def mark_dirty(self, view):
+		" Mark the bytes under a view of packed (such as one returned by mach.packed_field) as changed"
+		self.dirty.append(mach.view_byte_range(self.data, view))
+
+	def packed(self):
+		" A numpy structured view of the CPU copy of the block, see mach.packed_field. Mark what is written through it with mark_dirty"
+		if self.dtype is None:
+			raise ValueError('the layout of %s was not reported by the driver, set its dtype with mach.glsl_dtype' % self.name)
+		return mach.packed_view(self.data, self.dtype)
+
+	def flush(self):
+		" Upload every dirty byte range, merging ranges that touch or nearly touch, returns the number of bytes uploaded"
+		self.flushed_bytes = 0
+		self.flushed_ranges = 0
+		if not self.dirty:
+			return 0
+
+		ranges = mach.merge_ranges(self.dirty, self.merge_gap)
+		self.dirty = []
+
+		self.bind()
+		for start, end in ranges:
+			glBufferSubData(GL_UNIFORM_BUFFER, start, end - start, self.data[start:end])
+			self.flushed_bytes += end - start
+
+		self.flushed_ranges = len(ranges)
+		return self.flushed_bytes
 
 	def GetBlockUniformInfo(self, name):
 		" Get a variable's offset and size"
-		return self.shader.GetBlockUniformInfo(self.name, name)
+		return self.shader.get_block_uniform_info(self.name, name)
+
+	def GetBlockMember(self, name):
+		" Get a variable's BlockMember, with its array and matrix strides"
+		return self.shader.get_block_member(self.name, name)
 
 	def GetStructSize(self, name):
 		" Refers to shader for struct size"
-		return self.shader.GetStructSize(name)
+		return self.shader.get_struct_size(name)
+
+	def GetArrayStride(self, name):
+		" Get the bytes from one element of an array to the next, std140's 16 when the layout was read from the source"
+		return self.GetBlockMember(name).array_stride or 16
+
+	def GetMatrixStride(self, name):
+		" Get the bytes from one matrix column to the next, std140's 16 when the layout was read from the source"
+		return self.GetBlockMember(name).matrix_stride or 16
 
 	def bind(self):
 		" Bind this buffer"
-		glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+		mach.gl_state.bind_buffer(GL_UNIFORM_BUFFER, self.ubo)
 
 	def autoBind(self):
-		" Automatically bind this buffer if it is not already bound"
-		if (uniformBound != self.ubo):
-			self.bind()
+		" Automatically bind this buffer if it is not already bound (the state cache skips redundant binds)"
+		self.bind()
 
 	def storeMatrix4(self, name, data):
 		"""
@@ -52,13 +127,12 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - a numpy matrix
+			data - a glm matrix, numpy array or numpy matrix
 		"""
-		self.autoBind()
-		data = np.array(data.flatten(), dtype=np.float32)[0]
+		data = mach.gl_matrix_data(data)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.write(offset, size, data)
 
 	def storeMatrix3(self, name, data):
 		"""
@@ -66,13 +140,15 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - a numpy matrix
+			data - a glm matrix, numpy array or numpy matrix
 		"""
-		self.autoBind()
-		arr = np.array([[m[0, 0], m[0, 1], m[0, 2], 0] for m in data], dtype=np.float32).flatten()
+
+		# Every column of a mat3 is padded to a vec4
+		arr = np.zeros((3, 4), dtype=np.float32)
+		arr[:, :3] = mach.gl_matrix_data(data)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, arr)
+		self.write(offset, size, arr)
 
 	def storeMatrix3Array(self, name, data):
 		"""
@@ -80,18 +156,13 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of numpy matrices
+			data - an iterable of glm or numpy matrices, or an [N, columns, rows] array, each matrix given column by column
 		"""
-		self.autoBind()
-		flattenedData = []
-		for mat in data:
-			arr = [[m[0, 0], m[0, 1], m[0, 2], 0] for m in mat]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		# Every column of a mat3 is padded to a vec4
+		data = mach.pad_array(mach.gl_matrix_array_data(data), 3, self.GetMatrixStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.write(offset, size, data)
 
 	def storeMatrix4Array(self, name, data):
 		"""
@@ -99,16 +170,12 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of numpy matrices
+			data - an iterable of glm or numpy matrices, or an [N, columns, rows] array, each matrix given column by column
 		"""
-		self.autoBind()
-		flattenedData = np.array([], dtype=np.float32)
-		for d in data:
-			flattenedData = np.append(flattenedData, d.flatten())
-		flattenedData = np.array(flattenedData, dtype=np.float32)
+		data = mach.pad_array(mach.gl_matrix_array_data(data), 4, self.GetMatrixStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.write(offset, size, data)
 
 	def storeFloat(self, name, *data):
 		"""
@@ -118,11 +185,10 @@ class UniformBlock:
 			name - name of the variable within the uniform block (string)
 			data - a set of float arguments
 		"""
-		self.autoBind()
 		data = np.array(data, dtype=np.float32)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.write(offset, size, data)
 
 	def storeVec2Array(self, name, data):
 		"""
@@ -130,17 +196,12 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 2)
+			data - an iterable of (iterables of size 2) or an [N, 2] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], 0 , 0]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 2, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.write(offset, size, data)
 
 	def storeVec3Array(self, name, data):
 		"""
@@ -148,17 +209,12 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 3)
+			data - an iterable of (iterables of size 3) or an [N, 3] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], vec[2] , 0]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 3, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.write(offset, size, data)
 
 	def storeVec4Array(self, name, data):
 		"""
@@ -166,17 +222,12 @@ class UniformBlock:
 
 		Arguments:
 			name - name of the variable within the uniform block (string)
-			data - an iterable of (iterables of size 4)
+			data - an iterable of (iterables of size 4) or an [N, 4] array
 		"""
-		flattenedData = []
-		for vec in data:
-			arr = [vec[0], vec[1], vec[2] , vec[3]]
-			flattenedData.append(arr)
-
-		flattenedData = np.array(flattenedData, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 4, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, flattenedData)
+		self.write(offset, size, data)
 
 	def storeFloatArray(self, name, data):
 		"""
@@ -186,13 +237,10 @@ class UniformBlock:
 			name - name of the variable within the uniform block (string)
 			data - an iterable of floats
 		"""
-		self.autoBind()
-		data = [[n, 0, 0, 0] for n in data]
-		data = np.array(data, dtype=np.float32).flatten()
+		data = mach.pad_array(data, 1, self.GetArrayStride(name) // 4)
 
 		offset, size = self.GetBlockUniformInfo(name)
-
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.write(offset, size, data)
 
 	def storeInt(self, name, *data):
 		"""
@@ -202,11 +250,10 @@ class UniformBlock:
 			name - name of the variable within the uniform block (string)
 			data - set of integer arguments
 		"""
-		self.autoBind()
 		data = np.array(data, dtype=np.int32)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.write(offset, size, data)
 
 	def storeIntArray(self, name, data):
 		"""
@@ -216,9 +263,26 @@ class UniformBlock:
 			name - name of the variable within the uniform block (string)
 			data - an iterable of integers
 		"""
-		self.autoBind()
-		data = [[n, 0, 0, 0] for n in data]
-		data = np.array(data, dtype=np.int32).flatten()
+		data = mach.pad_array(data, 1, self.GetArrayStride(name) // 4, np.int32)
 
 		offset, size = self.GetBlockUniformInfo(name)
-		glBufferSubData(GL_UNIFORM_BUFFER, offset, size, data)
+		self.write(offset, size, data)
+
+	def storeStructArray(self, name, start=0, **columns):
+		"""
+		Store members of many elements of an array of structs at once, each member from one array
+		(storeStructArray('lights', color=colors, power=powers) with colors an [N, 3] and powers an [N] array)
+
+		Arguments:
+			name - name of the struct array within the uniform block (string)
+			start - the first element to store (integer)
+			columns - an array for every member to store by the member's name, N elements long
+		"""
+		elements = mach.packed_field(self.packed(), name)
+		count = max(len(values) for values in columns.values())
+		elements = elements[start:start + count]
+
+		for member, values in columns.items():
+			mach.packed_field(elements, member)[:len(values)] = values
+
+		self.mark_dirty(elements)
@@ -66,13 +66,13 @@ class Window(QWindow):
 		self.make_current()
 
 		# OpenGL settings
-		glEnable(GL_DEPTH_TEST)
-		glEnable(GL_CULL_FACE)
-		glDepthMask(GL_TRUE)
-		glDepthFunc(GL_LEQUAL)
+		mach.gl_state.enable(GL_DEPTH_TEST)
+		mach.gl_state.enable(GL_CULL_FACE)
+		mach.gl_state.depth_mask(GL_TRUE)
+		mach.gl_state.depth_func(GL_LEQUAL)
 
-		glEnable(GL_BLEND)
-		glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+		mach.gl_state.enable(GL_BLEND)
+		mach.gl_state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
 		# A list of keys that are currently being pressed
 		self.keys_pressed = dict(mach.master_key_dict)
@@ -114,18 +114,18 @@ class Window(QWindow):
 		self.update_timer.start(1 / self.FPS * 1000)
 
 	def get_mouse_pos(self):
-		return np.array((self.cursor.pos().x(), self.cursor.pos().y()), dtype=np.int) - self.pos
+		return np.array((self.cursor.pos().x(), self.cursor.pos().y()), dtype=int) - self.pos
 
 	def set_mouse_pos(self, pos):
 		self.cursor.setPos(*(self.pos + pos))
 
 	def get_window_size(self):
 		geom = self.get_geometry()
-		return np.array((geom.width, geom.height), dtype=np.int)
+		return np.array((geom.width, geom.height), dtype=int)
 
 	def get_window_pos(self):
 		geom = self.get_geometry()
-		return np.array((geom.x, geom.y), dtype=np.int)
+		return np.array((geom.x, geom.y), dtype=int)
 
 	# Make the opengl context held in this window current
 	def make_current(self):
@@ -141,6 +141,9 @@ class Window(QWindow):
 		self.frame_times.append(delta_time / 1000)
 		del self.frame_times[0]
 
+		# Statistics on how many GL calls the state cache saved are kept per frame
+		mach.gl_state.new_frame()
+
 		self.draw(delta_time)
 
 	def draw(self, delta_time):
@@ -419,13 +422,13 @@ class Window(QWindow):
 		height = self.size[1]
 
 		# Bind any frame buffers
-		glBindFramebuffer(GL_FRAMEBUFFER, 0)
+		mach.gl_state.bind_framebuffer(0)
 		if sys.platform == 'win32':
-			glViewport(8, 8, width, height) # Windows is stupid and shifts the viewport by 8 pixels in both axes
+			mach.gl_state.viewport(8, 8, width, height) # Windows is stupid and shifts the viewport by 8 pixels in both axes
 		elif sys.platform == 'darwin':
-			glViewport(0, 0, width, height)
+			mach.gl_state.viewport(0, 0, width, height)
 		elif sys.platform == 'linux':
-			glViewport(0, 0, width, height)
+			mach.gl_state.viewport(0, 0, width, height)
 
 	def get_geometry(self):
 		geom = self.geometry()
@@ -1,10 +1,26 @@
 from mach.Event import *
+from mach.GLState import *
+from mach.TextureCache import *
 from mach.Window import Window, resource_path, run_app_with_window
 from mach.Storage import *
+from mach.Packing import *
 from mach.Shader import *
+from mach.UniformBlock import *
+from mach.Struct import *
+from mach.StorageBuffer import *
+from mach.ComputeShader import *
 from mach.Camera import *
 from mach.Matrix import *
 from mach.Attribute import *
 from mach.MachObject import *
 from mach.transformations import *
 from mach.Rendered import *
+from mach.SpriteBatch import *
+from mach.RenderQueue import *
+from mach.AssetLoader import *
+from mach.AtlasPacker import *
+from mach.SceneGraph import *
+from mach.Animation import *
+from mach.Culling import *
+from mach.SpatialHash import *
+from mach.Collision import *
\ No newline at end of file
@@ -1887,6 +1887,345 @@ def is_same_quaternion(q0, q1):
     return numpy.allclose(q0, q1) or numpy.allclose(q0, -q1)
 
 
+def quaternion_multiply_array(quaternion1, quaternion0):
+    """Return the products of two arrays of quaternions, row by row.
+
+    Array version of quaternion_multiply for (N, 4) inputs, returns float32.
+
+    >>> q1 = numpy.array([random_quaternion() for i in range(16)])
+    >>> q0 = numpy.array([random_quaternion() for i in range(16)])
+    >>> q = quaternion_multiply_array(q1, q0)
+    >>> q.shape, q.dtype
+    ((16, 4), dtype('float32'))
+    >>> numpy.allclose(q, [quaternion_multiply(a, b) for a, b in zip(q1, q0)],
+    ...                atol=1e-6)
+    True
+    >>> q = quaternion_multiply_array([4, 1, -2, 3], [[8, -5, 6, 7]])
+    >>> numpy.allclose(q, [[28, -44, -14, 48]])
+    True
+
+    """
+    q0 = numpy.asarray(quaternion0, dtype=numpy.float32)
+    q1 = numpy.asarray(quaternion1, dtype=numpy.float32)
+    w0, x0, y0, z0 = q0[..., 0], q0[..., 1], q0[..., 2], q0[..., 3]
+    w1, x1, y1, z1 = q1[..., 0], q1[..., 1], q1[..., 2], q1[..., 3]
+    return numpy.stack([
+        -x1*x0 - y1*y0 - z1*z0 + w1*w0,
+        x1*w0 + y1*z0 - z1*y0 + w1*x0,
+        -x1*z0 + y1*w0 + z1*x0 + w1*y0,
+        x1*y0 - y1*x0 + z1*w0 + w1*z0], axis=-1)
+
+
+def quaternion_slerp_array(quat0, quat1, fraction, shortestpath=True):
+    """Return spherical linear interpolations between two arrays of quaternions.
+
+    Array version of quaternion_slerp for (N, 4) inputs, returns float32.
+    fraction is a single value or one value per row.
+
+    >>> q0 = numpy.array([random_quaternion() for i in range(16)])
+    >>> q1 = numpy.array([random_quaternion() for i in range(16)])
+    >>> f = numpy.random.random(16)
+    >>> q = quaternion_slerp_array(q0, q1, f)
+    >>> numpy.allclose(q, [quaternion_slerp(a, b, t) for a, b, t in
+    ...                    zip(q0, q1, f)], atol=1e-5)
+    True
+    >>> numpy.allclose(quaternion_slerp_array(q0, q1, 0), q0, atol=1e-6)
+    True
+    >>> numpy.allclose(quaternion_slerp_array(q0, q1, 1), q1, atol=1e-6)
+    True
+    >>> q = quaternion_slerp_array(q0, q0, 0.5)
+    >>> numpy.allclose(q, q0, atol=1e-6)
+    True
+
+    """
+    q0 = unit_vector(numpy.asarray(quat0, dtype=numpy.float32)[..., :4],
+                     axis=-1)
+    q1 = unit_vector(numpy.asarray(quat1, dtype=numpy.float32)[..., :4],
+                     axis=-1)
+    fraction = numpy.asarray(fraction, dtype=numpy.float32)[..., numpy.newaxis]
+    d = numpy.sum(q0 * q1, axis=-1, keepdims=True)
+    if shortestpath:
+        # invert rotations
+        q1 = numpy.where(d < 0.0, -q1, q1)
+        d = numpy.abs(d)
+    angle = numpy.arccos(numpy.clip(d, -1.0, 1.0))
+    # like quaternion_slerp, q0 is returned when q1 is q0 or -q0, which also
+    # avoids dividing by sin(angle) ~ 0
+    small = numpy.abs(numpy.sin(angle)) < 1e-6
+    isin = 1.0 / numpy.where(small, 1.0, numpy.sin(angle))
+    s0 = numpy.where(small, 1.0,
+                     numpy.sin((1.0 - fraction) * angle) * isin)
+    s1 = numpy.where(small, 0.0, numpy.sin(fraction * angle) * isin)
+    q = q0 * s0 + q1 * s1
+    # like quaternion_slerp, the ends are returned as they are
+    q = numpy.where(fraction == 0.0, q0, q)
+    q = numpy.where(fraction == 1.0,
+                    unit_vector(numpy.asarray(quat1, dtype=numpy.float32)[..., :4],
+                                axis=-1), q)
+    return q.astype(numpy.float32)
+
+
+def quaternion_matrix_array(quaternions):
+    """Return homogeneous rotation matrices from an array of quaternions.
+
+    Array version of quaternion_matrix for (N, 4) inputs, returns (N, 4, 4)
+    float32.
+
+    >>> q = numpy.array([random_quaternion() for i in range(16)])
+    >>> q[0] = 0
+    >>> M = quaternion_matrix_array(q)
+    >>> M.shape, M.dtype
+    ((16, 4, 4), dtype('float32'))
+    >>> numpy.allclose(M, [quaternion_matrix(a) for a in q], atol=1e-6)
+    True
+
+    """
+    q = numpy.array(quaternions, dtype=numpy.float32).reshape(-1, 4)
+    n = numpy.sum(q * q, axis=-1)
+    # zero quaternions give the identity, like quaternion_matrix
+    with numpy.errstate(divide='ignore'):
+        q *= numpy.where(n < _EPS, 0.0, numpy.sqrt(2.0 / n))[:, numpy.newaxis]
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    M = numpy.zeros((len(q), 4, 4), dtype=numpy.float32)
+    M[:, 0, 0] = 1.0 - y*y - z*z
+    M[:, 0, 1] = x*y - z*w
+    M[:, 0, 2] = x*z + y*w
+    M[:, 1, 0] = x*y + z*w
+    M[:, 1, 1] = 1.0 - x*x - z*z
+    M[:, 1, 2] = y*z - x*w
+    M[:, 2, 0] = x*z - y*w
+    M[:, 2, 1] = y*z + x*w
+    M[:, 2, 2] = 1.0 - x*x - y*y
+    M[:, 3, 3] = 1.0
+    return M
+
+
+def _euler_axes(axes):
+    try:
+        return _AXES2TUPLE[axes.lower()]
+    except (AttributeError, KeyError):
+        _TUPLE2AXES[axes]  # validation
+        return axes
+
+
+def euler_matrix_array(angles, axes='sxyz'):
+    """Return homogeneous rotation matrices from an array of Euler angles.
+
+    Array version of euler_matrix for (N, 3) inputs, returns (N, 4, 4)
+    float32.
+
+    >>> a = (4*math.pi) * (numpy.random.random((16, 3)) - 0.5)
+    >>> for axes in _AXES2TUPLE.keys():
+    ...    M = euler_matrix_array(a, axes)
+    ...    assert numpy.allclose(M, [euler_matrix(*b, axes=axes) for b in a],
+    ...                          atol=1e-6), axes
+
+    """
+    firstaxis, parity, repetition, frame = _euler_axes(axes)
+
+    i = firstaxis
+    j = _NEXT_AXIS[i+parity]
+    k = _NEXT_AXIS[i-parity+1]
+
+    a = numpy.asarray(angles, dtype=numpy.float32).reshape(-1, 3)
+    ai, aj, ak = a[:, 0], a[:, 1], a[:, 2]
+    if frame:
+        ai, ak = ak, ai
+    if parity:
+        ai, aj, ak = -ai, -aj, -ak
+
+    si, sj, sk = numpy.sin(ai), numpy.sin(aj), numpy.sin(ak)
+    ci, cj, ck = numpy.cos(ai), numpy.cos(aj), numpy.cos(ak)
+    cc, cs = ci*ck, ci*sk
+    sc, ss = si*ck, si*sk
+
+    M = numpy.zeros((len(a), 4, 4), dtype=numpy.float32)
+    if repetition:
+        M[:, i, i] = cj
+        M[:, i, j] = sj*si
+        M[:, i, k] = sj*ci
+        M[:, j, i] = sj*sk
+        M[:, j, j] = -cj*ss+cc
+        M[:, j, k] = -cj*cs-sc
+        M[:, k, i] = -sj*ck
+        M[:, k, j] = cj*sc+cs
+        M[:, k, k] = cj*cc-ss
+    else:
+        M[:, i, i] = cj*ck
+        M[:, i, j] = sj*sc-cs
+        M[:, i, k] = sj*cc+ss
+        M[:, j, i] = cj*sk
+        M[:, j, j] = sj*ss+cc
+        M[:, j, k] = sj*cs-sc
+        M[:, k, i] = -sj
+        M[:, k, j] = cj*si
+        M[:, k, k] = cj*ci
+    M[:, 3, 3] = 1.0
+    return M
+
+
+def quaternion_from_euler_array(angles, axes='sxyz'):
+    """Return quaternions from an array of Euler angles.
+
+    Array version of quaternion_from_euler for (N, 3) inputs, returns (N, 4)
+    float32.
+
+    >>> a = (4*math.pi) * (numpy.random.random((16, 3)) - 0.5)
+    >>> for axes in _AXES2TUPLE.keys():
+    ...    q = quaternion_from_euler_array(a, axes)
+    ...    assert numpy.allclose(q, [quaternion_from_euler(*b, axes=axes)
+    ...                              for b in a], atol=1e-6), axes
+
+    """
+    firstaxis, parity, repetition, frame = _euler_axes(axes)
+
+    i = firstaxis + 1
+    j = _NEXT_AXIS[i+parity-1] + 1
+    k = _NEXT_AXIS[i-parity] + 1
+
+    a = numpy.asarray(angles, dtype=numpy.float32).reshape(-1, 3) / 2.0
+    ai, aj, ak = a[:, 0], a[:, 1], a[:, 2]
+    if frame:
+        ai, ak = ak, ai
+    if parity:
+        aj = -aj
+
+    ci, si = numpy.cos(ai), numpy.sin(ai)
+    cj, sj = numpy.cos(aj), numpy.sin(aj)
+    ck, sk = numpy.cos(ak), numpy.sin(ak)
+    cc, cs = ci*ck, ci*sk
+    sc, ss = si*ck, si*sk
+
+    q = numpy.empty((len(a), 4), dtype=numpy.float32)
+    if repetition:
+        q[:, 0] = cj*(cc - ss)
+        q[:, i] = cj*(cs + sc)
+        q[:, j] = sj*(cc + ss)
+        q[:, k] = sj*(cs - sc)
+    else:
+        q[:, 0] = cj*cc + sj*ss
+        q[:, i] = cj*sc - sj*cs
+        q[:, j] = cj*ss + sj*cc
+        q[:, k] = cj*cs - sj*sc
+    if parity:
+        q[:, j] *= -1.0
+
+    return q
+
+
+def compose_matrix_array(scale=None, shear=None, angles=None, translate=None,
+                         perspective=None):
+    """Return transformation matrices from arrays of transformations.
+
+    Array version of compose_matrix, every argument has one row per matrix
+    ((N, 3) scales, shears, angles and translations, (N, 4) perspectives).
+    Returns (N, 4, 4) float32.
+
+    >>> scale = numpy.random.random((16, 3)) - 0.5
+    >>> shear = numpy.random.random((16, 3)) - 0.5
+    >>> angles = (numpy.random.random((16, 3)) - 0.5) * (2*math.pi)
+    >>> trans = numpy.random.random((16, 3)) - 0.5
+    >>> M = compose_matrix_array(scale, shear, angles, trans)
+    >>> numpy.allclose(M, [compose_matrix(*a) for a in
+    ...                    zip(scale, shear, angles, trans)], atol=1e-5)
+    True
+    >>> M = compose_matrix_array(translate=trans, angles=angles)
+    >>> numpy.allclose(M, [compose_matrix(angles=a, translate=t) for a, t in
+    ...                    zip(angles, trans)], atol=1e-5)
+    True
+
+    """
+    given = [a for a in (scale, shear, angles, translate, perspective)
+             if a is not None]
+    count = len(given[0]) if given else 1
+    M = numpy.tile(numpy.identity(4, dtype=numpy.float32), (count, 1, 1))
+    if perspective is not None:
+        P = M.copy()
+        P[:, 3, :] = numpy.asarray(perspective, dtype=numpy.float32)[:, :4]
+        M = P
+    if translate is not None:
+        translate = numpy.asarray(translate, dtype=numpy.float32)[:, :3]
+        # M times a translation only changes the last column
+        M[:, :, 3] += numpy.einsum('nij,nj->ni', M[:, :, :3], translate)
+    if angles is not None:
+        M = numpy.matmul(M, euler_matrix_array(angles, 'sxyz'))
+    if shear is not None:
+        shear = numpy.asarray(shear, dtype=numpy.float32)
+        Z = numpy.tile(numpy.identity(4, dtype=numpy.float32), (count, 1, 1))
+        Z[:, 1, 2] = shear[:, 2]
+        Z[:, 0, 2] = shear[:, 1]
+        Z[:, 0, 1] = shear[:, 0]
+        M = numpy.matmul(M, Z)
+    if scale is not None:
+        # M times a scale matrix scales its first three columns
+        M[:, :, :3] *= numpy.asarray(scale, dtype=numpy.float32)[:, numpy.newaxis, :3]
+    M /= M[:, 3:, 3:]
+    return M
+
+
+def _test_array_functions(count=1000, seed=0):
+    """Compare every *_array function with its scalar version.
+
+    Random inputs, including zero quaternions, identical and opposite
+    quaternion pairs, the ends of slerp and every Euler axis sequence, are
+    converted one at a time with the scalar function and all at once with
+    the array function. Raises AssertionError on the first mismatch.
+
+    >>> _test_array_functions(64)
+
+    """
+    rand = numpy.random.RandomState(seed)
+
+    def check(name, array, scalar, atol=1e-5):
+        scalar = numpy.asarray(scalar)
+        assert array.shape == scalar.shape, (name, array.shape)
+        assert array.dtype == numpy.float32, (name, array.dtype)
+        for i, (a, b) in enumerate(zip(array, scalar)):
+            assert numpy.allclose(a, b, rtol=1e-4, atol=atol), (name, i, a, b)
+
+    q0 = numpy.array([random_quaternion(rand.rand(3)) for i in range(count)])
+    q1 = numpy.array([random_quaternion(rand.rand(3)) for i in range(count)])
+    q0[0] = 0.0
+    q1[1] = q0[1]
+    q1[2] = -q0[2]
+    fraction = rand.rand(count)
+    fraction[3:5] = 0.0, 1.0
+    angles = (4*math.pi) * (rand.rand(count, 3) - 0.5)
+
+    check('quaternion_multiply_array', quaternion_multiply_array(q1, q0),
+          [quaternion_multiply(a, b) for a, b in zip(q1, q0)])
+    check('quaternion_matrix_array', quaternion_matrix_array(q0),
+          [quaternion_matrix(q) for q in q0])
+
+    q0[0] = q1[0]
+    for shortestpath in (True, False):
+        check('quaternion_slerp_array',
+              quaternion_slerp_array(q0, q1, fraction, shortestpath=shortestpath),
+              [quaternion_slerp(a, b, t, shortestpath=shortestpath)
+               for a, b, t in zip(q0, q1, fraction)])
+
+    for axes in _AXES2TUPLE.keys():
+        check('euler_matrix_array ' + axes, euler_matrix_array(angles, axes),
+              [euler_matrix(*a, axes=axes) for a in angles])
+        check('quaternion_from_euler_array ' + axes,
+              quaternion_from_euler_array(angles, axes),
+              [quaternion_from_euler(*a, axes=axes) for a in angles])
+
+    scale = rand.rand(count, 3) + 0.5
+    shear = rand.rand(count, 3) - 0.5
+    translate = rand.rand(count, 3) - 0.5
+    perspective = numpy.hstack([(rand.rand(count, 3) - 0.5) * 0.1,
+                                rand.rand(count, 1) + 0.5])
+    check('compose_matrix_array',
+          compose_matrix_array(scale, shear, angles, translate, perspective),
+          [compose_matrix(*a) for a in
+           zip(scale, shear, angles, translate, perspective)], atol=1e-4)
+    check('compose_matrix_array (translate and angles)',
+          compose_matrix_array(angles=angles, translate=translate),
+          [compose_matrix(angles=a, translate=t)
+           for a, t in zip(angles, translate)])
+
+
 def _import_module(name, package=None, warn=True, prefix='_py_', ignore='_'):
     """Try import all public attributes from module into global namespace.
 
@@ -1923,3 +2262,4 @@ if __name__ == "__main__":
     import random  # noqa: used in doctests
     numpy.set_printoptions(suppress=True, precision=5)
     doctest.testmod()
+    _test_array_functions()
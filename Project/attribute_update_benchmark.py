@@ -0,0 +1,63 @@
+import mach
+from OpenGL.GL import *
+import numpy as np
+import time
+
+# Compares re-uploading every attribute against updating a single attribute in place
+VERTEX_COUNT = 100000
+ITERATIONS = 100
+
+class Benchmark(mach.Window):
+	finished = False
+
+	def start(self):
+		self.shader = mach.Shader(
+			mach.resource_path('spritebatchvert.glsl'),
+			mach.resource_path('spritebatchfrag.glsl')
+		)
+		self.shader.store_matrix4('projection_matrix', mach.Identity())
+
+		positions = np.random.rand(VERTEX_COUNT, 3).astype(np.float32) * 2 - 1
+		tex_coords = np.random.rand(VERTEX_COUNT, 2).astype(np.float32)
+		self.colors = np.random.rand(VERTEX_COUNT, 4).astype(np.float32)
+
+		self.attributes = [
+			mach.Attribute(positions, 0),
+			mach.Attribute(tex_coords, 1),
+			mach.Attribute(self.colors, 2)
+		]
+
+		self.points = self.shader.create_new_mach_object(GL_POINTS)
+		self.points.store_attribute_array(self.attributes, usage=GL_DYNAMIC_DRAW)
+
+	def time_updates(self, name, update):
+		" Alternate updates and draws so the driver has to deal with buffers that are still in use"
+		glFinish()
+		start = time.perf_counter()
+		for i in range(ITERATIONS):
+			update()
+			self.points.bind()
+			self.points.draw()
+		glFinish()
+		elapsed = (time.perf_counter() - start) / ITERATIONS
+		print('%-45s %8.3f ms / frame' % (name, elapsed * 1000))
+
+	def draw(self, delta_time):
+		if self.finished:
+			return
+		self.finished = True
+
+		self.clear()
+		self.shader.bind()
+
+		print('%d vertices, %d frames' % (VERTEX_COUNT, ITERATIONS))
+		self.time_updates('full update (store_attribute_array)', lambda: self.points.store_attribute_array(self.attributes, usage=GL_DYNAMIC_DRAW))
+		self.time_updates('full update (update_attribute_array, orphan)', lambda: self.points.update_attribute_array(orphan=True))
+		self.time_updates('full update (update_attribute_array)', lambda: self.points.update_attribute_array(orphan=False))
+		self.time_updates('partial update (update_attribute, colors)', lambda: self.points.update_attribute(self.attributes[2], self.colors))
+		self.time_updates('partial update (update_attribute, 1000 rows)', lambda: self.points.update_attribute(self.attributes[2], self.colors[:1000], 5000))
+
+		self.close()
+
+if __name__ == "__main__":
+	mach.run_app_with_window(Benchmark, 640, 480)
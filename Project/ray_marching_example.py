@@ -24,7 +24,7 @@ class Game(mach.Window):
 	mouse_captured = False
 
 	def start(self):
-		glDisable(GL_CULL_FACE)
+		mach.gl_state.disable(GL_CULL_FACE)
 
 		self.view = mach.ViewMatrix()
 		self.view.pos = glm.vec3(0, 0, 3)
@@ -0,0 +1,11 @@
+#version 440 core
+layout(location = 0) out vec4 fColor;
+
+uniform sampler2D atlas;
+
+in vec2 tex_coords;
+in vec4 tint;
+
+void main() {
+	fColor = texture(atlas, tex_coords) * tint;
+}
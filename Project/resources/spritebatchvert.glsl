@@ -0,0 +1,16 @@
+#version 440 core
+
+layout(location = 0) in vec3 a_position;
+layout(location = 1) in vec2 a_tex_coords;
+layout(location = 2) in vec4 a_tint;
+
+uniform mat4 projection_matrix;
+
+out vec2 tex_coords;
+out vec4 tint;
+
+void main() {
+	gl_Position = projection_matrix * vec4(a_position, 1);
+	tex_coords = a_tex_coords;
+	tint = a_tint;
+}
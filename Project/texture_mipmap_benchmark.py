@@ -0,0 +1,66 @@
+import mach
+import mach.TextureAtlas
+from OpenGL.GL import *
+import numpy as np
+import time
+
+# Draws many heavily minified copies of a large noisy texture, which is bound by texture fetches unless mipmaps are used
+TEXTURE_SIZE = 2048
+SPRITE_COUNT = 20000
+SPRITE_PIXELS = 16
+ITERATIONS = 50
+WIDTH, HEIGHT = 1280, 720
+
+class Benchmark(mach.Window):
+	finished = False
+
+	def start(self):
+		self.shader = mach.Shader(
+			mach.resource_path('spritebatchvert.glsl'),
+			mach.resource_path('spritebatchfrag.glsl')
+		)
+
+		self.batch = mach.SpriteBatch(self.shader, SPRITE_COUNT)
+		self.batch.store_matrix4('projection_matrix', mach.OrthographicMatrix(0, WIDTH, 0, HEIGHT, -1, 1), transpose=True)
+
+		noise = (np.random.rand(TEXTURE_SIZE, TEXTURE_SIZE, 4) * 255).astype(np.uint8)
+		sprite = {'noise': mach.TextureAtlas.Sprite(0, 0, 0, 1, 1, 0, 0, SPRITE_PIXELS, SPRITE_PIXELS, 0)}
+
+		self.atlases = []
+		for name, mipmaps, anisotropy in [
+			('no mipmaps', None, None),
+			('mipmaps generated on the GPU', 'gpu', None),
+			('mipmaps built on the CPU', 'cpu', None),
+			('mipmaps generated on the GPU, 16x anisotropic', 'gpu', 16)
+		]:
+			start = time.perf_counter()
+			texture_id = mach.create_texture(noise, GL_LINEAR, GL_RGBA, mipmaps, anisotropy)
+			glFinish()
+			upload = time.perf_counter() - start
+			self.atlases.append((name, upload, self.batch.add_atlas(sprite, texture_id=texture_id)))
+
+		self.positions = np.random.rand(SPRITE_COUNT, 2).astype(np.float32) * (WIDTH, HEIGHT)
+
+	def draw(self, delta_time):
+		if self.finished:
+			return
+		self.finished = True
+
+		print('%d sprites of %dx%d pixels from a %dx%d texture, %d frames' % (SPRITE_COUNT, SPRITE_PIXELS, SPRITE_PIXELS, TEXTURE_SIZE, TEXTURE_SIZE, ITERATIONS))
+		self.shader.bind()
+
+		for name, upload, atlas in self.atlases:
+			glFinish()
+			start = time.perf_counter()
+			for i in range(ITERATIONS):
+				self.clear()
+				self.batch.submit_array(np.zeros(SPRITE_COUNT, dtype=np.int32), self.positions, atlases=atlas)
+				self.batch.draw()
+			glFinish()
+			elapsed = (time.perf_counter() - start) / ITERATIONS
+			print('%-50s %8.3f ms / frame (upload %.1f ms)' % (name, elapsed * 1000, upload * 1000))
+
+		self.close()
+
+if __name__ == "__main__":
+	mach.run_app_with_window(Benchmark, WIDTH, HEIGHT)
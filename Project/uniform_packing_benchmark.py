@@ -0,0 +1,91 @@
+import mach
+import numpy as np
+import time
+
+# Compares the old list building store*Array packing against mach.pad_array and mach.glsl_dtype, without OpenGL
+SIZES = (16, 256, 4096)
+ITERATIONS = 20
+
+LIGHT = [('vec3', 'color'), ('float', 'power'), ('mat3', 'basis'), ('vec2', 'position')]
+
+def old_vec3_array(data):
+	flattenedData = []
+	for vec in data:
+		arr = [vec[0], vec[1], vec[2] , 0]
+		flattenedData.append(arr)
+	return np.array(flattenedData, dtype=np.float32).flatten()
+
+def old_float_array(data):
+	data = [[n, 0, 0, 0] for n in data]
+	return np.array(data, dtype=np.float32).flatten()
+
+def old_matrix3_array(data):
+	flattenedData = []
+	for mat in data:
+		arr = [[m[0, 0], m[0, 1], m[0, 2], 0] for m in mat]
+		flattenedData.append(arr)
+	return np.array(flattenedData, dtype=np.float32).flatten()
+
+def old_matrix4_array(data):
+	flattenedData = np.array([], dtype=np.float32)
+	for d in data:
+		flattenedData = np.append(flattenedData, d.flatten())
+	return np.array(flattenedData, dtype=np.float32)
+
+def old_struct_array(dtype, colors, powers, bases, positions):
+	" One write per member of every struct, as Struct does, into a bytes buffer"
+	data = np.zeros(dtype.itemsize, dtype=np.uint8)
+	stride = dtype.fields['lights'][0].subdtype[0].itemsize
+	fields = dtype.fields['lights'][0].subdtype[0].fields
+	for i in range(len(colors)):
+		for name, values in (('color', colors[i]), ('power', [powers[i]]), ('basis', old_matrix3_array([bases[i]])), ('position', positions[i])):
+			offset = i * stride + fields[name][1]
+			values = np.asarray(values, dtype=np.float32).view(np.uint8)
+			data[offset:offset + len(values)] = values
+	return data
+
+def new_struct_array(dtype, colors, powers, bases, positions):
+	data = np.zeros(dtype.itemsize, dtype=np.uint8)
+	lights = mach.packed_field(mach.packed_view(data, dtype), 'lights')
+	mach.packed_field(lights, 'color')[:] = colors
+	mach.packed_field(lights, 'power')[:] = powers
+	mach.packed_field(lights, 'basis')[:] = bases
+	mach.packed_field(lights, 'position')[:] = positions
+	return data
+
+def time_packing(name, n, pack):
+	start = time.perf_counter()
+	for i in range(ITERATIONS):
+		result = pack()
+	elapsed = (time.perf_counter() - start) / ITERATIONS
+	print('%-30s N=%-5d %10.3f ms' % (name, n, elapsed * 1000))
+	return result
+
+if __name__ == "__main__":
+	for n in SIZES:
+		vectors = np.random.rand(n, 3).astype(np.float32)
+		floats = np.random.rand(n).astype(np.float32)
+		matrices3 = [np.matrix(m) for m in np.random.rand(n, 3, 3).astype(np.float32)]
+		matrices4 = np.random.rand(n, 4, 4).astype(np.float32)
+		dtype = mach.glsl_dtype([(LIGHT, 'lights', n)])
+
+		old = time_packing('vec3 array (old)', n, lambda: old_vec3_array(vectors))
+		new = time_packing('vec3 array (pad_array)', n, lambda: mach.pad_array(vectors, 3, 4))
+		assert np.array_equal(old, new.reshape(-1))
+
+		old = time_packing('float array (old)', n, lambda: old_float_array(floats))
+		new = time_packing('float array (pad_array)', n, lambda: mach.pad_array(floats, 1, 4))
+		assert np.array_equal(old, new.reshape(-1))
+
+		old = time_packing('mat3 array (old)', n, lambda: old_matrix3_array(matrices3))
+		new = time_packing('mat3 array (pad_array)', n, lambda: mach.pad_array(matrices3, 3, 4))
+		assert np.array_equal(old, new.reshape(-1))
+
+		old = time_packing('mat4 array (old)', n, lambda: old_matrix4_array(matrices4))
+		new = time_packing('mat4 array (pad_array)', n, lambda: mach.pad_array(matrices4, 4, 4))
+		assert np.array_equal(old, new.reshape(-1))
+
+		old = time_packing('struct array (per member)', n, lambda: old_struct_array(dtype, vectors, floats, matrices3, vectors[:, :2]))
+		new = time_packing('struct array (glsl_dtype)', n, lambda: new_struct_array(dtype, vectors, floats, np.asarray(matrices3), vectors[:, :2]))
+		assert np.array_equal(old, new)
+		print()